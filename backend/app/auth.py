@@ -1,12 +1,21 @@
+import asyncio
+import ipaddress
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_db, SessionLocal
 from .models.user import User
+from .utils.cache import LRUCache
 import os
 
 # JWT Configuration
@@ -14,12 +23,42 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (hashes with a different cost are upgraded on the next successful login)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt runs on its own small thread pool so a login burst cannot starve
+# the threads that serve every other sync route (check-in, guest list...)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+# Login rate limits: failed logins (and registrations) per client IP, failed logins per account
+LOGIN_RATE_LIMIT_PER_IP = int(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "60"))
+LOGIN_RATE_LIMIT_PER_ACCOUNT = int(os.getenv("LOGIN_RATE_LIMIT_PER_ACCOUNT", "5"))
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("LOGIN_RATE_LIMIT_WINDOW_SECONDS", "300"))
+# Reverse proxies (addresses or networks, comma-separated) whose X-Forwarded-For/X-Real-IP headers are trusted.
+# Requests from any other peer are keyed by their own address, so the headers cannot be spoofed
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(value.strip(), strict=False)
+    for value in os.getenv("TRUSTED_PROXIES", "").split(",") if value.strip()
+]
 
 # HTTP Bearer token
 security = HTTPBearer()
 
+# Verified token / user snapshot cache (0 disables it)
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "2048"))
+
+_token_cache = LRUCache(maxsize=AUTH_CACHE_SIZE)  # token -> email
+_user_cache = LRUCache(maxsize=AUTH_CACHE_SIZE)  # email -> user column values
+
+# Checked for unknown accounts, so a missing user costs the same bcrypt time as a wrong password
+_DUMMY_PASSWORD_HASH = pwd_context.hash(secrets.token_urlsafe(16))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,6 +67,104 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def _run_password_task(func, *args):
+    """Run a bcrypt call on the dedicated executor, rejecting work once the backlog is full"""
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_slots.release()
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password off the event loop; also returns a new hash if the stored one is outdated"""
+    return await _run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def hash_password(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await _run_password_task(pwd_context.hash, password)
+
+
+class AttemptLimiter:
+    """Fixed-window attempt counter per key (client IP, account email)"""
+
+    def __init__(self, limit: int, window_seconds: int, maxsize: int = 10000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._windows = LRUCache(maxsize=maxsize)  # key -> (count, window start)
+        self._lock = threading.Lock()
+
+    def retry_after(self, key: str) -> int:
+        """Seconds until the key may try again, 0 if it is allowed now"""
+        if self.limit <= 0:
+            return 0
+        count, started_at = self._windows.get(key, (0, 0.0))
+        if count < self.limit:
+            return 0
+        return max(int(started_at + self.window_seconds - time.monotonic()) + 1, 1)
+
+    def hit(self, key: str) -> None:
+        if self.limit <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            count, started_at = self._windows.get(key, (0, now))
+            remaining = started_at + self.window_seconds - now
+            if remaining <= 0:
+                count, started_at, remaining = 0, now, self.window_seconds
+            self._windows.set(key, (count + 1, started_at), ttl=remaining)
+
+    def reset(self, key: str) -> None:
+        self._windows.delete(key)
+
+
+ip_limiter = AttemptLimiter(LOGIN_RATE_LIMIT_PER_IP, LOGIN_RATE_LIMIT_WINDOW_SECONDS)
+account_limiter = AttemptLimiter(LOGIN_RATE_LIMIT_PER_ACCOUNT, LOGIN_RATE_LIMIT_WINDOW_SECONDS)
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def get_client_ip(request: Request) -> str:
+    """
+    Client address for rate limiting. Behind trusted proxies, X-Forwarded-For is read from the right
+    and the first address not in TRUSTED_PROXIES is the client (entries further left are client-supplied).
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+    forwarded_for = [value.strip() for value in request.headers.get("x-forwarded-for", "").split(",") if value.strip()]
+    for address in reversed(forwarded_for):
+        if not _is_trusted_proxy(address):
+            return address
+    real_ip = request.headers.get("x-real-ip")
+    return real_ip.strip() if real_ip else peer
+
+def check_rate_limit(request: Request, account: Optional[str] = None) -> None:
+    """Reject the request if the client or account is over its limit"""
+    ip = get_client_ip(request)
+    retry_after = max(
+        ip_limiter.retry_after(ip),
+        account_limiter.retry_after(account.lower()) if account else 0,
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+def record_attempt(request: Request) -> None:
+    """Count an attempt against the client's IP limit (failed logins, registrations)"""
+    ip_limiter.hit(get_client_ip(request))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -44,31 +181,100 @@ def authenticate_user(db: Session, email: str, password: str):
     """Authenticate a user with email and password"""
     user = db.query(User).filter(User.email == email).first()
     if not user:
+        verify_password(password, _DUMMY_PASSWORD_HASH)
         return False
     if not verify_password(password, user.hashed_password):
         return False
     return user
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    """Get current authenticated user from JWT token"""
+def _decode_token_email(token: str) -> Optional[str]:
+    """Verify a JWT and return its subject, caching the result until the token expires"""
+    email = _token_cache.get(token)
+    if email is not None:
+        return email
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+
+    if AUTH_CACHE_TTL_SECONDS > 0:
+        ttl = AUTH_CACHE_TTL_SECONDS
+        if payload.get("exp") is not None:
+            ttl = min(ttl, payload["exp"] - datetime.utcnow().timestamp())
+        if ttl > 0:
+            _token_cache.set(token, email, ttl)
+    return email
+
+def _load_user_snapshot(email: str) -> Optional[dict]:
+    """Column values of a user, served from cache when possible"""
+    snapshot = _user_cache.get(email)
+    if snapshot is not None:
+        return snapshot
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            return None
+        snapshot = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+    finally:
+        db.close()
+
+    if AUTH_CACHE_TTL_SECONDS > 0:
+        _user_cache.set(email, snapshot, AUTH_CACHE_TTL_SECONDS)
+    return snapshot
+
+def invalidate_user_cache(email: Optional[str] = None) -> None:
+    """Drop the cached snapshot of a user (or of every user)"""
+    if email is None:
+        _token_cache.clear()
+        _user_cache.clear()
+    else:
+        _user_cache.delete(email)
+
+async def authenticate_user_async(db: Session, email: str, password: str):
+    """
+    Authenticate a user without blocking the event loop.
+    Failed attempts count against the account; an outdated hash is replaced (saved by the caller's commit).
+    """
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.email == email).first())
+    if user:
+        verified, new_hash = await verify_and_update_password(password, user.hashed_password)
+    else:
+        await _run_password_task(verify_password, password, _DUMMY_PASSWORD_HASH)
+        verified, new_hash = False, None
+    if not verified:
+        account_limiter.hit(email.lower())
+        return False
+
+    account_limiter.reset(email.lower())
+    if new_hash:
+        user.hashed_password = new_hash
+    return user
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Get current authenticated user from JWT token.
+    Returns a detached snapshot of the user row; load the user in your own session to modify it.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+    email = _decode_token_email(credentials.credentials)
+    if email is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    snapshot = _load_user_snapshot(email)
+    if snapshot is None:
         raise credentials_exception
-    return user
+    return User(**snapshot)
 
 def get_current_active_user(current_user: User = Depends(get_current_user)):
     """Get current active user"""
@@ -76,3 +282,23 @@ def get_current_active_user(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+
+def _collect_changed_users(session, flush_context, instances):
+    """Remember users changed or deleted in this transaction"""
+    changed = session.info.setdefault("changed_user_emails", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.email)
+            # Email changed: the old address must not resolve anymore
+            changed.update(inspect(obj).attrs.email.history.deleted or ())
+
+def _invalidate_changed_users(session):
+    for email in session.info.pop("changed_user_emails", ()):
+        invalidate_user_cache(email)
+
+def _discard_changed_users(session, previous_transaction):
+    session.info.pop("changed_user_emails", None)
+
+event.listen(Session, "before_flush", _collect_changed_users)
+event.listen(Session, "after_commit", _invalidate_changed_users)
+event.listen(Session, "after_soft_rollback", _discard_changed_users)
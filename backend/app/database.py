@@ -1,17 +1,57 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+import threading
 
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./guest_management.db")
 
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite production profile: WAL (đọc không chặn ghi), fsync ít hơn, cache/mmap lớn hơn
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "10"))
+# Ghi nóng (check-in, RSVP, checkpoint/heartbeat của job thiệp mời) qua một writer duy nhất,
+# commit theo lô tối đa SQLITE_WRITE_BATCH thao tác. Các thao tác ghi khác (thêm/import khách mời,
+# gửi email...) vẫn ghi trực tiếp và chờ khoá theo busy_timeout.
+# Mặc định tắt; docker-compose.sqlite.yml bật cho profile SQLite production
+SQLITE_WRITER = os.getenv("SQLITE_WRITER", "false").lower() == "true"
+SQLITE_WRITE_BATCH = int(os.getenv("SQLITE_WRITE_BATCH", "256"))
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Thiết lập PRAGMA cho mỗi connection SQLite mới (dùng cho cả engine sync và async)
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # NORMAL chỉ an toàn với WAL: mất tối đa các commit cuối khi mất điện, không hỏng database
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def _is_memory_sqlite(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
 # Create engine
-if DATABASE_URL.startswith("sqlite"):
+if IS_SQLITE:
     engine = create_engine(
         DATABASE_URL, 
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=SQLITE_POOL_SIZE
     )
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 else:
     # Enable connection health checks and recycling to avoid stale connections
     engine = create_engine(
@@ -37,3 +77,113 @@ def get_db():
         db.close()
 
 
+# Async engine cho các route nóng (danh sách khách mời, check-in, thống kê, thiệp mời công khai):
+# request chờ I/O database mà không giữ thread của threadpool
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "30"))
+
+# Driver async tương ứng với từng loại database
+_ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """
+    Đổi URL database sync sang driver async (sqlite -> aiosqlite, postgresql -> asyncpg)
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"Không hỗ trợ async cho database: {backend}")
+    return parsed.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+_async_engine = None
+_async_session_factory = None
+_async_lock = threading.Lock()
+
+def get_async_engine():
+    """
+    Tạo async engine khi cần lần đầu (để script chỉ dùng engine sync không cần driver async)
+    """
+    global _async_engine, _async_session_factory
+    with _async_lock:
+        if _async_engine is None:
+            url = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+            if url.startswith("sqlite"):
+                # aiosqlite mặc định mở connection mới cho mỗi lần dùng (NullPool): giữ một pool connection đọc
+                pool_options = {} if _is_memory_sqlite(url) else {
+                    "poolclass": AsyncAdaptedQueuePool, "pool_size": SQLITE_POOL_SIZE
+                }
+                _async_engine = create_async_engine(url, **pool_options)
+                event.listen(_async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+            else:
+                _async_engine = create_async_engine(
+                    url,
+                    pool_pre_ping=True,
+                    pool_recycle=1800,
+                    pool_size=ASYNC_DB_POOL_SIZE,
+                    max_overflow=ASYNC_DB_MAX_OVERFLOW
+                )
+            # expire_on_commit=False: đối tượng vẫn đọc được sau commit mà không cần lazy load (không hỗ trợ trong async)
+            _async_session_factory = async_sessionmaker(
+                _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+        return _async_engine
+
+async def dispose_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
+# Dependency to get async DB session
+async def get_async_db():
+    get_async_engine()
+    async with _async_session_factory() as db:
+        yield db
+
+
+_sqlite_writer = None
+
+def _bump_written_event_versions(connection, context: dict) -> None:
+    from .models.event_version import bump_event_versions
+    if context.get("changed_event_ids"):
+        bump_event_versions(connection, context["changed_event_ids"])
+
+def _invalidate_written_events(context: dict) -> None:
+    from .utils.shared_cache import shared_cache
+    if context.get("changed_event_ids"):
+        shared_cache.invalidate_events(context["changed_event_ids"])
+
+def get_sqlite_writer():
+    """
+    Writer dùng chung cho các thao tác ghi nóng trên SQLite (check-in, RSVP, tiến độ job); None nếu không dùng SQLite
+    hoặc đã tắt SQLITE_WRITER. Thao tác ghi thêm event_id vào write_context(connection)["changed_event_ids"]
+    để phiên bản dữ liệu của sự kiện được tăng trong cùng transaction.
+    """
+    global _sqlite_writer
+    if not (IS_SQLITE and SQLITE_WRITER):
+        return None
+    with _async_lock:
+        if _sqlite_writer is None:
+            from .utils.sqlite_writer import SQLiteWriter
+            _sqlite_writer = SQLiteWriter(
+                engine, SQLITE_WRITE_BATCH,
+                before_commit=_bump_written_event_versions, after_commit=_invalidate_written_events,
+            )
+        return _sqlite_writer
+
+def close_sqlite_writer():
+    """
+    Dừng writer và checkpoint WAL vào file database (để file .db đầy đủ khi tắt server)
+    """
+    global _sqlite_writer
+    if _sqlite_writer is not None:
+        _sqlite_writer.close()
+        _sqlite_writer = None
+    if IS_SQLITE and SQLITE_WAL:
+        with engine.connect() as connection:
+            connection.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
@@ -4,11 +4,14 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
 import logging
-from .database import engine, Base
-from .routes import guests, events, invitations, auth
+from .routes import guests, events, invitations, auth, public
+from .utils.compression import PrecompressedStaticFiles
 
 logger = logging.getLogger(__name__)
 
+# Tự chạy migration database khi khởi động (tắt nếu muốn chạy tay: python -m app.migrate)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+
 # Tạo thư mục static
 os.makedirs("static", exist_ok=True)
 os.makedirs("qr_images", exist_ok=True)
@@ -34,14 +37,16 @@ app.add_middleware(
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/qr_images", StaticFiles(directory="qr_images"), name="qr_images")
-app.mount("/invitations", StaticFiles(directory="templates/invitations"), name="invitations")
+# Thiệp mời và ảnh QR: trả bản nén sẵn (.br/.gz) nếu có và client chấp nhận
+app.mount("/qr_images", PrecompressedStaticFiles(directory="qr_images"), name="qr_images")
+app.mount("/invitations", PrecompressedStaticFiles(directory="templates/invitations"), name="invitations")
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(guests.router, prefix="/api")
 app.include_router(events.router, prefix="/api")
 app.include_router(invitations.router, prefix="/api")
+app.include_router(public.router)
 
 @app.get("/")
 def read_root():
@@ -78,12 +83,16 @@ async def startup_event():
         from .services.qr_service import QRService
         import json
         
-        # Tạo database tables trước
+        # Tạo/nâng cấp database tables trước (Alembic, xem app/migrate.py)
         try:
-            Base.metadata.create_all(bind=engine)
-            print("✅ Đã tạo database tables")
+            if AUTO_MIGRATE:
+                from .migrate import upgrade_database
+                upgrade_database()
+                print("✅ Database đã ở phiên bản mới nhất")
+            else:
+                print("ℹ️ Bỏ qua migration (AUTO_MIGRATE=false), chạy: python -m app.migrate")
         except Exception as e:
-            print(f"⚠️ Lỗi tạo database tables: {e}")
+            print(f"⚠️ Lỗi migration database: {e}")
             return
         
         db = SessionLocal()
@@ -166,9 +175,35 @@ async def startup_event():
         
         db.close()
         
+        # Chuyển manifest thiệp mời cũ (nếu có) vào bảng invitations
+        from .services.invitation_service import InvitationIndex
+        imported = InvitationIndex().import_manifest("templates/invitations")
+        if imported:
+            print(f"✅ Đã chuyển {imported} thiệp mời từ manifest vào database")
+        
+        # Tiếp tục các job tạo thiệp mời còn dang dở trước khi server dừng
+        from .services.invitation_job_service import job_runner
+        resumed = job_runner.resume_pending()
+        if resumed:
+            print(f"✅ Tiếp tục {len(resumed)} job tạo thiệp mời")
+        
+        # Tiếp tục gửi các email thiệp mời còn trong hàng đợi
+        from .services.email_service import email_delivery_service
+        if email_delivery_service.resume_pending():
+            print("✅ Tiếp tục gửi email thiệp mời trong hàng đợi")
+        
     except Exception as e:
         print(f"⚠️ Lỗi khởi tạo dữ liệu: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Đóng các kết nối database (async engine, writer SQLite)
+    """
+    from .database import dispose_async_engine, close_sqlite_writer
+    await dispose_async_engine()
+    close_sqlite_writer()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
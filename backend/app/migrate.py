@@ -0,0 +1,58 @@
+"""
+Migration database bằng Alembic (cấu hình ở backend/alembic.ini, các bản migration ở backend/migrations).
+
+    python -m app.migrate                       # nâng cấp lên phiên bản mới nhất
+    python -m app.migrate current               # phiên bản hiện tại của database
+    python -m app.migrate history               # danh sách migration
+    python -m app.migrate revision -m "mô tả"   # tạo migration mới (autogenerate từ models)
+    python -m app.migrate downgrade <revision>
+"""
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def get_config(configure_logger: bool = True) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = configure_logger
+    return config
+
+
+def upgrade_database(revision: str = "head") -> None:
+    """
+    Đưa database lên phiên bản mới nhất (chạy khi server khởi động).
+    Database cũ tạo bằng create_all được baseline tự nhận và bổ sung phần còn thiếu.
+    """
+    command.upgrade(get_config(configure_logger=False), revision)
+
+
+def main(argv=None) -> None:
+    args = list(sys.argv[1:] if argv is None else argv)
+    action = args.pop(0) if args else "upgrade"
+    config = get_config()
+
+    if action == "upgrade":
+        command.upgrade(config, args[0] if args else "head")
+    elif action == "downgrade":
+        if not args:
+            sys.exit("Cần chỉ định revision: python -m app.migrate downgrade <revision>")
+        command.downgrade(config, args[0])
+    elif action == "current":
+        command.current(config, verbose=True)
+    elif action == "history":
+        command.history(config)
+    elif action == "revision":
+        message = args[args.index("-m") + 1] if "-m" in args else None
+        command.revision(config, message=message, autogenerate=True)
+    elif action == "stamp":
+        command.stamp(config, args[0] if args else "head")
+    else:
+        sys.exit(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 from .base import Base
 from .guest import Guest
 from .event import Event
+from .event_version import EventVersion
+from .invitation_job import InvitationJob, InvitationJobItem
+from .email_delivery import EmailDelivery
+from .invitation import Invitation
+from .invite_link import InviteLink
 
-__all__ = ["Base", "Guest", "Event"]
\ No newline at end of file
+__all__ = ["Base", "Guest", "Event", "EventVersion", "InvitationJob", "InvitationJobItem", "EmailDelivery", "Invitation", "InviteLink"]
\ No newline at end of file
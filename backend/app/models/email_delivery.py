@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from .base import Base
+
+class EmailDelivery(Base):
+    """
+    Trạng thái gửi email thiệp mời cho từng khách mời của một sự kiện
+    """
+    __tablename__ = "email_deliveries"
+    __table_args__ = (
+        UniqueConstraint("guest_id", "event_id", name="uq_email_deliveries_guest_event"),
+        # Hàng đợi lấy bản ghi đến hạn gửi theo trạng thái và thời điểm thử lại
+        Index("ix_email_deliveries_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    guest_id = Column(Integer, nullable=False, index=True)
+    event_id = Column(Integer, nullable=True, index=True)
+    email = Column(String(100), nullable=False)
+    template = Column(String(20), default="elegant")
+
+    # Trạng thái: queued, sending, sent, failed
+    status = Column(String(20), default="queued")
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    message_id = Column(String(255), nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)  # Thời điểm được thử lại (backoff)
+
+    # Lô gửi đang giữ bản ghi và thời điểm nhận (để phát hiện bản ghi bị bỏ dở)
+    owner = Column(String(80), nullable=True, index=True)
+    claimed_at = Column(DateTime, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EmailDelivery(guest_id={self.guest_id}, email='{self.email}', status='{self.status}')>"
@@ -0,0 +1,161 @@
+from sqlalchemy import Column, Integer, DateTime, event, func, inspect, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .base import Base
+from .event import Event
+from .guest import Guest
+from ..utils.shared_cache import shared_cache
+
+class EventVersion(Base):
+    """
+    Phiên bản dữ liệu của một sự kiện, tăng mỗi khi khách mời hoặc sự kiện thay đổi.
+    Dùng làm khoá cho các cache (export, thiệp mời...).
+    """
+    __tablename__ = "event_versions"
+    
+    event_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<EventVersion(event_id={self.event_id}, version={self.version})>"
+
+
+# Dòng phiên bản cho thay đổi không thuộc sự kiện nào (khách mời chưa gán sự kiện),
+# để tổng phiên bản (export "tất cả khách mời") vẫn đổi theo
+UNSCOPED_EVENT_ID = 0
+
+
+def bump_event_versions(connection, event_ids) -> None:
+    """
+    Tăng phiên bản dữ liệu cho các sự kiện (chạy trong transaction hiện tại).
+    event_id None được tính vào dòng UNSCOPED_EVENT_ID.
+    """
+    table = EventVersion.__table__
+    for event_id in sorted({UNSCOPED_EVENT_ID if i is None else i for i in event_ids}):
+        result = connection.execute(
+            table.update()
+            .where(table.c.event_id == event_id)
+            .values(version=table.c.version + 1, updated_at=func.now())
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                table.insert().values(event_id=event_id, version=1, updated_at=func.now())
+            )
+
+
+def _data_version_query(event_id: int = None):
+    if event_id:
+        return select(EventVersion.version).where(EventVersion.event_id == event_id)
+    return select(func.sum(EventVersion.version))
+
+
+def get_data_version(db: Session, event_id: int = None) -> int:
+    """
+    Lấy phiên bản dữ liệu của một sự kiện.
+    Không truyền event_id thì trả về tổng phiên bản của mọi sự kiện (đổi khi bất kỳ sự kiện nào đổi).
+    """
+    return db.execute(_data_version_query(event_id)).scalar() or 0
+
+
+async def get_data_version_async(db: AsyncSession, event_id: int = None) -> int:
+    """
+    Như get_data_version, dùng với AsyncSession
+    """
+    return (await db.execute(_data_version_query(event_id))).scalar() or 0
+
+
+def _collect_changed_event_ids(session, flush_context, instances):
+    """
+    Ghi nhận các sự kiện bị ảnh hưởng bởi thay đổi khách mời/sự kiện trước khi flush
+    """
+    changed = session.info.setdefault("changed_event_ids", set())
+    
+    for obj in session.new:
+        if isinstance(obj, Guest):
+            changed.add(obj.event_id)
+        elif isinstance(obj, Event):
+            # Sự kiện mới chưa có id: chỉ làm đổi danh sách sự kiện (tag "event:all")
+            changed.add(None)
+    
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, Guest):
+            changed.add(obj.event_id)
+            # Khách mời chuyển sự kiện: sự kiện cũ cũng đổi
+            changed.update(inspect(obj).attrs.event_id.history.deleted or ())
+        elif isinstance(obj, Event):
+            changed.add(obj.id)
+    
+    for obj in session.deleted:
+        if isinstance(obj, Guest):
+            changed.add(obj.event_id)
+        elif isinstance(obj, Event):
+            changed.add(obj.id)
+
+
+def _bump_changed_event_versions(session, flush_context):
+    changed = session.info.pop("changed_event_ids", None)
+    if changed:
+        bump_event_versions(session.connection(), changed)
+        # Cache dùng chung chỉ được xoá khi transaction đã commit
+        session.info.setdefault("uncommitted_event_ids", set()).update(changed)
+
+
+def _updated_value(statement, column: str):
+    """
+    Giá trị gán cho cột trong câu UPDATE (None nếu câu lệnh không gán cột đó)
+    """
+    for key, value in (getattr(statement, "_values", None) or {}).items():
+        if getattr(key, "key", key) == column:
+            return True, getattr(value, "value", value)
+    return False, None
+
+
+def _bump_bulk_changed_event_versions(orm_execute_state):
+    """
+    UPDATE/DELETE hàng loạt (query.update(), session.execute(update(Guest)...)) không đi qua flush:
+    tìm các sự kiện bị ảnh hưởng trước khi chạy câu lệnh rồi tăng phiên bản trong cùng transaction
+    """
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    entity = mapper.class_ if mapper is not None else None
+    if entity not in (Guest, Event):
+        return None
+    
+    statement = orm_execute_state.statement
+    column = Guest.event_id if entity is Guest else Event.id
+    where = statement.whereclause if statement.whereclause is not None else true()
+    session = orm_execute_state.session
+    changed = set(session.execute(select(column).distinct().where(where)).scalars())
+    
+    if entity is Guest and orm_execute_state.is_update:
+        # Khách mời được chuyển sang sự kiện khác: sự kiện mới cũng đổi
+        assigned, new_event_id = _updated_value(statement, "event_id")
+        if assigned:
+            changed.add(new_event_id)
+    
+    result = orm_execute_state.invoke_statement()
+    if changed:
+        bump_event_versions(session.connection(), changed)
+        session.info.setdefault("uncommitted_event_ids", set()).update(changed)
+    return result
+
+
+def _invalidate_committed_events(session):
+    changed = session.info.pop("uncommitted_event_ids", None)
+    if changed:
+        shared_cache.invalidate_events(changed)
+
+
+def _discard_uncommitted_events(session, previous_transaction):
+    session.info.pop("uncommitted_event_ids", None)
+
+
+event.listen(Session, "before_flush", _collect_changed_event_ids)
+event.listen(Session, "after_flush", _bump_changed_event_versions)
+event.listen(Session, "do_orm_execute", _bump_bulk_changed_event_versions)
+event.listen(Session, "after_commit", _invalidate_committed_events)
+event.listen(Session, "after_soft_rollback", _discard_uncommitted_events)
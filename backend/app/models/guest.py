@@ -1,10 +1,21 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base import Base
 
 class Guest(Base):
     __tablename__ = "guests"
+    # Index cho các truy vấn theo sự kiện (migration 0002_guest_query_indexes)
+    __table_args__ = (
+        Index("ix_guests_event_id_id", "event_id", "id"),
+        Index("ix_guests_event_rsvp", "event_id", "rsvp_status"),
+        Index("ix_guests_event_checkin_rsvp", "event_id", "checked_in", "rsvp_status"),
+        Index("ix_guests_event_organization", "event_id", "organization"),
+        Index("ix_guests_event_tag", "event_id", "tag"),
+        Index("ix_guests_event_name", "event_id", "name"),
+        Index("ix_guests_event_email", "event_id", "email"),
+        Index("ix_guests_event_check_in_time", "event_id", "check_in_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(20), nullable=True)  # Mr, Mrs, Dr, Prof. Dr.
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class Invitation(Base):
+    """
+    Chỉ mục các file thiệp mời đã tạo (thay cho việc quét thư mục)
+    """
+    __tablename__ = "invitations"
+    __table_args__ = (
+        # Danh sách thiệp mời theo sự kiện, mới nhất trước
+        Index("ix_invitations_event_updated", "event_id", "updated_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    guest_id = Column(Integer, nullable=False, index=True)
+    event_id = Column(Integer, nullable=True)
+    template = Column(String(20), default="elegant", index=True)
+    content_hash = Column(String(64), nullable=False)  # Hash dữ liệu đầu vào khi render
+    filename = Column(String(255), nullable=False, unique=True)
+    file_path = Column(String(500), nullable=False)
+    size = Column(Integer, default=0)  # Kích thước file HTML (byte)
+
+    # Timestamps
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<Invitation(filename='{self.filename}', guest_id={self.guest_id}, template='{self.template}')>"
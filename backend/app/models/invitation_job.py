@@ -0,0 +1,62 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class InvitationJob(Base):
+    """
+    Job chạy nền tạo thiệp mời hàng loạt, lưu tiến độ và checkpoint theo guest id
+    """
+    __tablename__ = "invitation_jobs"
+    
+    id = Column(String(36), primary_key=True)
+    kind = Column(String(30), default="generate_all")
+    event_id = Column(Integer, nullable=True, index=True)
+    template = Column(String(20), default="elegant")
+    force = Column(Boolean, default=False)  # Render lại cả thiệp mời không đổi
+    options = Column(Text, nullable=True)  # Tuỳ chọn riêng theo loại job (JSON)
+    
+    # Trạng thái: queued, running, completed, partial (xong nhưng có thiệp mời lỗi), failed, cancelled
+    status = Column(String(20), default="queued", index=True)
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    last_guest_id = Column(Integer, default=0)  # Checkpoint: guest id lớn nhất đã xử lý
+    rendered = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    failed = Column(Integer, default=0)  # Thiệp mời render lỗi (xuất PDF)
+    removed = Column(Integer, default=0)
+    cancel_requested = Column(Boolean, default=False)
+    error = Column(Text, nullable=True)
+    
+    # Process đang giữ job và lần cập nhật gần nhất (để phát hiện job bị bỏ dở)
+    owner = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<InvitationJob(id='{self.id}', status='{self.status}', processed={self.processed}/{self.total})>"
+
+
+class InvitationJobItem(Base):
+    """
+    Kết quả theo từng khách mời của một job (để trả về theo trang)
+    """
+    __tablename__ = "invitation_job_items"
+    __table_args__ = (
+        Index("ix_invitation_job_items_job_id_id", "job_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(36), nullable=False)
+    guest_id = Column(Integer, nullable=True)
+    filename = Column(String(100), nullable=True)
+    status = Column(String(20), nullable=False)  # rendered, skipped, removed, failed
+    error = Column(Text, nullable=True)  # Lý do lỗi khi status là failed
+    created_at = Column(DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f"<InvitationJobItem(job_id='{self.job_id}', guest_id={self.guest_id}, status='{self.status}')>"
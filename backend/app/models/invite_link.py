@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy.sql import func
+from .base import Base
+
+class InviteLink(Base):
+    """
+    Mã ngắn ngẫu nhiên cho link thiệp mời công khai (/i/{code}), có thể thu hồi
+    """
+    __tablename__ = "invite_links"
+
+    id = Column(Integer, primary_key=True, index=True)
+    code = Column(String(32), nullable=False, unique=True, index=True)
+    guest_id = Column(Integer, nullable=False, index=True)
+    event_id = Column(Integer, nullable=True)
+    expires_at = Column(DateTime, nullable=True)  # Không đặt: không hết hạn
+    revoked = Column(Boolean, default=False, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, default=func.now())
+    revoked_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<InviteLink(code='{self.code}', guest_id={self.guest_id}, revoked={self.revoked})>"
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from ..database import get_db
 from ..models.user import User
 from ..schemas.auth import UserLogin, UserRegister, UserResponse, Token, RefreshToken
 from ..auth import (
-    authenticate_user, 
+    authenticate_user_async,
+    check_rate_limit,
+    record_attempt,
     create_access_token, 
-    get_password_hash, 
+    hash_password,
     get_current_active_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
@@ -17,10 +20,12 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
 
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
     """Login user and return access token"""
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    check_rate_limit(request, user_credentials.email)
+    user = await authenticate_user_async(db, user_credentials.email, user_credentials.password)
     if not user:
+        record_attempt(request)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -33,9 +38,9 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Inactive user"
         )
     
-    # Update last login
+    # Update last login (and the upgraded password hash, if any)
     user.last_login = datetime.utcnow()
-    db.commit()
+    await run_in_threadpool(db.commit)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -57,12 +62,15 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/register", response_model=UserResponse)
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, request: Request, db: Session = Depends(get_db)):
     """Register a new user"""
+    check_rate_limit(request)
+    record_attempt(request)
+    
     # Check if user already exists
-    existing_user = db.query(User).filter(
+    existing_user = await run_in_threadpool(lambda: db.query(User).filter(
         (User.email == user_data.email) | (User.username == user_data.username)
-    ).first()
+    ).first())
     
     if existing_user:
         raise HTTPException(
@@ -71,7 +79,7 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -82,9 +90,11 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
         is_verified=True  # Auto-verify for now
     )
     
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    def save():
+        db.add(db_user)
+        db.commit()
+        db.refresh(db_user)
+    await run_in_threadpool(save)
     
     return db_user
 
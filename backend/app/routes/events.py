@@ -1,16 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 import logging
-from ..database import get_db
+import os
+from ..database import get_db, get_async_db
 from ..models.event import Event
 from ..schemas.event import EventCreate, EventUpdate, EventResponse
+from ..services.stats_service import get_guest_summary, get_organization_counts, STATS_CACHE_TTL_SECONDS
+from ..utils.shared_cache import shared_cache, event_tag
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/events", tags=["events"])
 
+# Danh sách/chi tiết sự kiện được cache dùng chung, xoá khi sự kiện đổi
+EVENTS_CACHE_TTL_SECONDS = int(os.getenv("EVENTS_CACHE_TTL_SECONDS", "300"))
+
 @router.get("/", response_model=List[EventResponse])
 def get_events(
     skip: int = 0,
@@ -21,23 +28,36 @@ def get_events(
     """
     Lấy danh sách sự kiện
     """
-    query = db.query(Event)
-    
-    if is_active is not None:
-        query = query.filter(Event.is_active == is_active)
+    def load():
+        query = db.query(Event)
+        
+        if is_active is not None:
+            query = query.filter(Event.is_active == is_active)
+        
+        events = query.offset(skip).limit(limit).all()
+        return [EventResponse.model_validate(event).model_dump() for event in events]
     
-    events = query.offset(skip).limit(limit).all()
-    return events
+    return shared_cache.get_or_set(
+        f"events:list:{skip}:{limit}:{is_active}", load, ttl=EVENTS_CACHE_TTL_SECONDS, tags=[event_tag(None)]
+    )
 
 @router.get("/{event_id}", response_model=EventResponse)
 def get_event(event_id: int, db: Session = Depends(get_db)):
     """
     Lấy thông tin chi tiết một sự kiện
     """
+    cache_key = f"events:{event_id}"
+    cached = shared_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Không tìm thấy sự kiện")
-    return event
+    
+    data = EventResponse.model_validate(event).model_dump()
+    shared_cache.set(cache_key, data, ttl=EVENTS_CACHE_TTL_SECONDS, tags=[event_tag(event_id)])
+    return data
 
 @router.post("/", response_model=EventResponse)
 async def create_event(request: Request, db: Session = Depends(get_db)):
@@ -122,36 +142,24 @@ def delete_event(event_id: int, db: Session = Depends(get_db)):
     return {"message": "Đã xóa sự kiện thành công"}
 
 @router.get("/{event_id}/stats")
-def get_event_stats(event_id: int, db: Session = Depends(get_db)):
+async def get_event_stats(event_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Lấy thống kê sự kiện
     """
-    event = db.query(Event).filter(Event.id == event_id).first()
+    cache_key = f"events:{event_id}:stats"
+    cached = await shared_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+    
+    event = await db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Không tìm thấy sự kiện")
     
-    # Thống kê khách mời
-    from ..models.guest import Guest
-    guests_query = db.query(Guest).filter(Guest.event_id == event_id)
-    
-    total_guests = guests_query.count()
-    checked_in = guests_query.filter(Guest.checked_in == True).count()
-    rsvp_accepted = guests_query.filter(Guest.rsvp_status == "accepted").count()
-    rsvp_declined = guests_query.filter(Guest.rsvp_status == "declined").count()
-    rsvp_pending = guests_query.filter(Guest.rsvp_status == "pending").count()
+    # Thống kê khách mời và theo tổ chức
+    summary = await get_guest_summary(db, event_id)
+    organizations = await get_organization_counts(db, event_id)
     
-    # Thống kê theo tổ chức
-    from sqlalchemy import func
-    org_stats = db.query(
-        Guest.organization,
-        func.count(Guest.id).label('count')
-    ).filter(
-        Guest.event_id == event_id,
-        Guest.organization.isnot(None),
-        Guest.organization != ''
-    ).group_by(Guest.organization).all()
-    
-    return {
+    stats = {
         "event": {
             "id": event.id,
             "name": event.name,
@@ -159,14 +167,8 @@ def get_event_stats(event_id: int, db: Session = Depends(get_db)):
             "event_date": event.event_date,
             "location": event.location
         },
-        "total_guests": total_guests,
-        "checked_in": checked_in,
-        "rsvp_accepted": rsvp_accepted,
-        "rsvp_declined": rsvp_declined,
-        "rsvp_pending": rsvp_pending,
-        "check_in_rate": round(checked_in / total_guests * 100, 2) if total_guests > 0 else 0,
-        "organizations": [
-            {"name": org, "count": count} for org, count in org_stats
-        ]
+        **summary,
+        "organizations": organizations
     }
-
+    await shared_cache.aset(cache_key, stats, ttl=STATS_CACHE_TTL_SECONDS, tags=[event_tag(event_id)])
+    return stats
@@ -1,49 +1,116 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from ..database import get_db
+from ..database import get_db, get_async_db, get_sqlite_writer, SessionLocal
 from ..models.guest import Guest
+from ..models.event_version import get_data_version
 from ..schemas.guest import GuestCreate, GuestUpdate, GuestResponse, GuestRSVP, GuestCheckIn
 from ..services.qr_service import QRService
 from ..services.csv_service import CSVService
+from ..services.export_cache import ExportCache
+from ..utils.sqlite_writer import write_context
+from ..utils.shared_cache import shared_cache, event_tag
+from ..services.stats_service import get_cached_guest_summary
+from ..services.badge_service import BadgeService, BADGE_LAYOUTS, BADGE_FORMATS
+from ..services.invite_service import (
+    decode_invite_token, get_or_create_invite_link, is_invite_code, resolve_invite_code_async,
+    revoke_invite_links, INVITE_EXPIRES_IN_SECONDS
+)
 from datetime import datetime
 import json
+import logging
 import os
-import time
-from jose import jwt
 from urllib.parse import urlencode
 import os
 
 router = APIRouter(prefix="/guests", tags=["guests"])
+logger = logging.getLogger(__name__)
 
 # Initialize services
 qr_service = QRService()
 csv_service = CSVService()
+badge_service = BadgeService()
+export_cache = ExportCache()
+
+# Số dòng lấy mỗi lần từ server-side cursor khi export
+EXPORT_BATCH_SIZE = 1000
+# Danh sách khách mời được cache dùng chung theo bộ lọc, xoá khi dữ liệu sự kiện đổi
+ROSTER_CACHE_TTL_SECONDS = int(os.getenv("ROSTER_CACHE_TTL_SECONDS", "60"))
+
+def _stream_guests(event_id: Optional[int] = None, tag: Optional[str] = None,
+                   organization: Optional[str] = None, order_by=Guest.id):
+    """
+    Duyệt khách mời theo lô bằng server-side cursor (yield_per).
+    Dùng session riêng để việc stream không phụ thuộc vòng đời của get_db.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(Guest)
+        if event_id:
+            query = query.filter(Guest.event_id == event_id)
+        if tag:
+            query = query.filter(Guest.tag == tag)
+        if organization:
+            query = query.filter(Guest.organization == organization)
+        for guest in query.order_by(order_by, Guest.id).yield_per(EXPORT_BATCH_SIZE):
+            yield guest
+    finally:
+        db.close()
+
+def _export_response(db: Session, event_id: Optional[int], ext: str, media_type: str,
+                     columns: Optional[List[str]], produce, **options):
+    """
+    Trả file export từ cache nếu phiên bản dữ liệu của sự kiện chưa đổi,
+    nếu không thì stream nội dung mới đồng thời lưu vào cache
+    """
+    version = get_data_version(db, event_id)
+    key = export_cache.make_key(event_id, ext, columns, version, **options)
+    filename = f"guests_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    
+    cached_path = export_cache.get(key, ext)
+    if cached_path:
+        return FileResponse(cached_path, filename=filename, media_type=media_type)
+    
+    return StreamingResponse(
+        export_cache.iter_cached(key, ext, produce),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/", response_model=List[GuestResponse])
-def get_guests(
+async def get_guests(
     skip: int = 0,
     limit: int = 100,
     event_id: Optional[int] = None,
     rsvp_status: Optional[str] = None,
     organization: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Lấy danh sách khách mời với các bộ lọc
     """
     try:
-        query = db.query(Guest)
+        cache_key = "guests:list:" + urlencode({
+            "skip": skip, "limit": limit, "event_id": event_id or "",
+            "rsvp_status": rsvp_status or "", "organization": organization or "",
+        })
+        cached = await shared_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+        
+        query = select(Guest)
         
         if event_id:
-            query = query.filter(Guest.event_id == event_id)
+            query = query.where(Guest.event_id == event_id)
         if rsvp_status:
-            query = query.filter(Guest.rsvp_status == rsvp_status)
+            query = query.where(Guest.rsvp_status == rsvp_status)
         if organization:
-            query = query.filter(Guest.organization.contains(organization))
+            query = query.where(Guest.organization.contains(organization))
         
-        guests = query.offset(skip).limit(limit).all()
+        guests = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
         
         # Convert to GuestResponse objects with qr_image_url
         from ..schemas.guest import GuestResponse
@@ -73,6 +140,7 @@ def get_guests(
             }
             result.append(GuestResponse(**guest_data))
         
+        await shared_cache.aset(cache_key, result, ttl=ROSTER_CACHE_TTL_SECONDS, tags=[event_tag(event_id)])
         return result
     except Exception as e:
         print(f"Error in get_guests: {str(e)}")
@@ -163,6 +231,13 @@ def update_rsvp(guest_id: int, rsvp: GuestRSVP, db: Session = Depends(get_db)):
     """
     Cập nhật RSVP cho khách mời
     """
+    writer = get_sqlite_writer()
+    if writer is not None:
+        # SQLite: ghi qua writer duy nhất (commit theo lô) như check-in
+        if not writer.submit(_write_rsvp, guest_id, rsvp.rsvp_status, rsvp.rsvp_notes, datetime.now()).result():
+            raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
+        return db.query(Guest).filter(Guest.id == guest_id).first()
+    
     db_guest = db.query(Guest).filter(Guest.id == guest_id).first()
     if not db_guest:
         raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
@@ -177,15 +252,62 @@ def update_rsvp(guest_id: int, rsvp: GuestRSVP, db: Session = Depends(get_db)):
     
     return db_guest
 
+def _write_rsvp(connection, guest_id: int, rsvp_status: str, notes: Optional[str], responded_at: datetime) -> bool:
+    """
+    Cập nhật RSVP bằng một câu UPDATE (chạy trong writer SQLite); False nếu khách mời không tồn tại
+    """
+    table = Guest.__table__
+    row = connection.execute(
+        table.update()
+        .where(table.c.id == guest_id)
+        .values(rsvp_status=rsvp_status, rsvp_notes=notes, rsvp_response_date=responded_at, updated_at=responded_at)
+        .returning(table.c.event_id)
+    ).first()
+    if row is None:
+        return False
+    write_context(connection).setdefault("changed_event_ids", set()).add(row.event_id)
+    return True
+
+def _write_checkin(connection, guest_id: int, location: Optional[str], checked_in_at: datetime) -> bool:
+    """
+    Check-in bằng một câu UPDATE có điều kiện (chạy trong writer SQLite).
+    Trả về False nếu khách mời không tồn tại hoặc đã check-in trước đó.
+    """
+    table = Guest.__table__
+    row = connection.execute(
+        table.update()
+        .where(table.c.id == guest_id, or_(table.c.checked_in.is_(None), table.c.checked_in == False))
+        .values(checked_in=True, check_in_time=checked_in_at, check_in_location=location, updated_at=checked_in_at)
+        .returning(table.c.event_id)
+    ).first()
+    if row is None:
+        return False
+    # Ghi trực tiếp không qua Session nên phải tự đánh dấu sự kiện cần tăng phiên bản dữ liệu
+    write_context(connection).setdefault("changed_event_ids", set()).add(row.event_id)
+    return True
+
 @router.post("/{guest_id}/checkin")
-def checkin_guest(guest_id: int, checkin: GuestCheckIn, db: Session = Depends(get_db)):
+async def checkin_guest(guest_id: int, checkin: GuestCheckIn, db: AsyncSession = Depends(get_async_db)):
     """
     Check-in khách mời
     """
     try:
         print(f"Checkin request for guest {guest_id}: {checkin}")
         
-        db_guest = db.query(Guest).filter(Guest.id == guest_id).first()
+        writer = get_sqlite_writer()
+        if writer is not None:
+            # SQLite: ghi qua writer duy nhất (commit theo lô), sau đó đọc lại khách mời
+            checked_in_now = await writer.run(_write_checkin, guest_id, checkin.check_in_location, datetime.now())
+            db_guest = await db.get(Guest, guest_id)
+            if not db_guest:
+                raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
+            logger.debug("Guest %s %s", guest_id, "checked in" if checked_in_now else "already checked in")
+            return {
+                "already_checked_in": not checked_in_now,
+                "guest": db_guest
+            }
+        
+        db_guest = await db.get(Guest, guest_id)
         if not db_guest:
             print(f"Guest {guest_id} not found")
             raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
@@ -203,14 +325,16 @@ def checkin_guest(guest_id: int, checkin: GuestCheckIn, db: Session = Depends(ge
         db_guest.check_in_location = checkin.check_in_location
         db_guest.updated_at = datetime.now()
         
-        db.commit()
-        db.refresh(db_guest)
+        await db.commit()
+        await db.refresh(db_guest)
         
         print(f"Guest {guest_id} checked in successfully")
         return {
             "already_checked_in": False,
             "guest": db_guest
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error checking in guest {guest_id}: {str(e)}")
         import traceback
@@ -331,21 +455,16 @@ def get_guest_qr_image(guest_id: int, db: Session = Depends(get_db)):
 def generate_invite_link(guest_id: int, db: Session = Depends(get_db)):
     """
     Tạo link thiệp mời công khai (không cần đăng nhập) cho khách mời.
-    Link chứa token an toàn (JWT) mã hóa guest_id và event_id, hết hạn sau 30 ngày.
+    Link chứa mã ngắn ngẫu nhiên (bảng invite_links), hết hạn sau 30 ngày và có thể thu hồi.
+    Gọi lại khi link còn hiệu lực sẽ trả về cùng mã.
     """
     guest = db.query(Guest).filter(Guest.id == guest_id).first()
     if not guest:
         raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
 
-    secret_key = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
-    expires_in_seconds = 30 * 24 * 3600
-    payload = {
-        "sub": "invite",
-        "guest_id": guest.id,
-        "event_id": guest.event_id,
-        "exp": int(time.time()) + expires_in_seconds,
-    }
-    token = jwt.encode(payload, secret_key, algorithm="HS256")
+    link = get_or_create_invite_link(db, guest.id, guest.event_id, INVITE_EXPIRES_IN_SECONDS)
+    token = link.code
+    expires_in_seconds = max(int((link.expires_at - datetime.utcnow()).total_seconds()), 0) if link.expires_at else None
 
     # Base URL for frontend; try ENV, fallback to root
     frontend_base = os.getenv("FRONTEND_BASE_URL", "")
@@ -353,6 +472,14 @@ def generate_invite_link(guest_id: int, db: Session = Depends(get_db)):
 
     return {"token": token, "url": invite_url, "expires_in": expires_in_seconds}
 
+@router.delete("/{guest_id}/invite_link", response_model=dict)
+def revoke_invite_link(guest_id: int, db: Session = Depends(get_db)):
+    """
+    Thu hồi các link thiệp mời (mã ngắn) của khách mời; lần tạo link tiếp theo sẽ có mã mới
+    """
+    revoked = revoke_invite_links(db, guest_id)
+    return {"message": f"Đã thu hồi {revoked} link thiệp mời", "revoked": revoked}
+
 @router.post("/{guest_id}/rsvp")
 def update_guest_rsvp(guest_id: int, rsvp_data: dict, db: Session = Depends(get_db)):
     """
@@ -390,29 +517,12 @@ def delete_guest(guest_id: int, db: Session = Depends(get_db)):
     return {"message": "Đã xóa khách mời thành công"}
 
 @router.get("/stats/summary")
-def get_guest_stats(event_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_guest_stats(event_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """
     Lấy thống kê khách mời
     """
     try:
-        query = db.query(Guest)
-        if event_id:
-            query = query.filter(Guest.event_id == event_id)
-        
-        total_guests = query.count()
-        checked_in = query.filter(Guest.checked_in == True).count()
-        rsvp_accepted = query.filter(Guest.rsvp_status == "accepted").count()
-        rsvp_declined = query.filter(Guest.rsvp_status == "declined").count()
-        rsvp_pending = query.filter(Guest.rsvp_status == "pending").count()
-        
-        return {
-            "total_guests": total_guests,
-            "checked_in": checked_in,
-            "rsvp_accepted": rsvp_accepted,
-            "rsvp_declined": rsvp_declined,
-            "rsvp_pending": rsvp_pending,
-            "check_in_rate": round(checked_in / total_guests * 100, 2) if total_guests > 0 else 0
-        }
+        return await get_cached_guest_summary(db, event_id)
     except Exception as e:
         print(f"Error in get_guest_stats: {str(e)}")
         import traceback
@@ -422,73 +532,122 @@ def get_guest_stats(event_id: Optional[int] = None, db: Session = Depends(get_db
 @router.get("/export/excel")
 def export_guests_excel(
     event_id: Optional[int] = Query(None),
+    columns: Optional[str] = Query(None, description="Danh sách cột, phân cách bằng dấu phẩy"),
+    header: bool = Query(False),
     db: Session = Depends(get_db)
 ):
     """
-    Export danh sách khách mời ra file Excel
+    Export danh sách khách mời ra file Excel (openpyxl write-only, stream theo lô)
     """
     try:
-        # Lấy danh sách khách mời
-        query = db.query(Guest)
-        if event_id:
-            query = query.filter(Guest.event_id == event_id)
-        
-        guests = query.all()
-        
-        # Tạo file Excel
-        file_path = csv_service.export_guests_to_excel(guests)
-        
-        return FileResponse(
-            path=file_path,
-            filename=f"guests_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Lỗi export Excel: {str(e)}")
+        selected_columns = csv_service.parse_export_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _export_response(
+        db, event_id, "xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        selected_columns,
+        lambda: csv_service.iter_guests_excel(_stream_guests(event_id), columns=selected_columns, header=header),
+        header=header
+    )
 
 @router.get("/export/csv")
 def export_guests_csv(
     event_id: Optional[int] = Query(None),
+    columns: Optional[str] = Query(None, description="Danh sách cột, phân cách bằng dấu phẩy"),
+    header: bool = Query(False),
     db: Session = Depends(get_db)
 ):
     """
-    Export danh sách khách mời ra file CSV
+    Export danh sách khách mời ra file CSV (stream trực tiếp từ cursor)
     """
     try:
-        # Lấy danh sách khách mời
-        query = db.query(Guest)
-        if event_id:
-            query = query.filter(Guest.event_id == event_id)
-        
-        guests = query.all()
-        
-        # Tạo file CSV
-        file_path = csv_service.export_guests_to_csv(guests)
-        
-        return FileResponse(
-            path=file_path,
-            filename=f"guests_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            media_type="text/csv"
+        selected_columns = csv_service.parse_export_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _export_response(
+        db, event_id, "csv", "text/csv",
+        selected_columns,
+        lambda: csv_service.iter_guests_csv(_stream_guests(event_id), columns=selected_columns, header=header),
+        header=header
+    )
+
+@router.get("/export/parquet")
+def export_guests_parquet(event_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+    """
+    Export toàn bộ cột khách mời ra Parquet (giữ nguyên kiểu dữ liệu) cho phân tích
+    """
+    return _export_response(
+        db, event_id, "parquet", "application/vnd.apache.parquet",
+        None,
+        lambda: csv_service.iter_guests_parquet(_stream_guests(event_id))
+    )
+
+@router.get("/export/arrow")
+def export_guests_arrow(event_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+    """
+    Export toàn bộ cột khách mời ra Arrow IPC stream
+    """
+    return _export_response(
+        db, event_id, "arrows", "application/vnd.apache.arrow.stream",
+        None,
+        lambda: csv_service.iter_guests_arrow(_stream_guests(event_id))
+    )
+
+@router.get("/export/badges")
+def export_guest_badges(
+    event_id: Optional[int] = Query(None),
+    tag: Optional[str] = Query(None),
+    organization: Optional[str] = Query(None),
+    per_page: int = Query(8, description="Số badge mỗi trang A4: 8 hoặc 12"),
+    format: str = Query("pdf", description="pdf hoặc png (ZIP các trang PNG)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Xuất tờ in badge QR (QR code, họ tên, đơn vị) theo sự kiện/tag/đơn vị, sắp xếp theo tên
+    """
+    if per_page not in BADGE_LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"per_page phải là một trong {sorted(BADGE_LAYOUTS)}")
+    if format not in BADGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format phải là một trong {list(BADGE_FORMATS)}")
+
+    guests = lambda: _stream_guests(event_id, tag=tag, organization=organization, order_by=Guest.name)
+    if format == "pdf":
+        return _export_response(
+            db, event_id, "pdf", "application/pdf", None,
+            lambda: badge_service.iter_badges_pdf(guests(), per_page=per_page),
+            kind="badges", tag=tag, organization=organization, per_page=per_page
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Lỗi export CSV: {str(e)}")
+    return _export_response(
+        db, event_id, "zip", "application/zip", None,
+        lambda: badge_service.iter_badges_png(guests(), per_page=per_page),
+        kind="badges", tag=tag, organization=organization, per_page=per_page
+    )
 
 
 # -------------------------
 # Public invitation by token
 # -------------------------
 @router.get("/invite/{token}", response_model=GuestResponse)
-def get_invitation_by_token(token: str, db: Session = Depends(get_db)):
+async def get_invitation_by_token(token: str, db: AsyncSession = Depends(get_async_db)):
     """
-    Trả về thông tin thiệp mời công khai dựa trên token (JWT) mà không cần đăng nhập.
+    Trả về thông tin thiệp mời công khai dựa trên mã ngắn hoặc token (JWT) mà không cần đăng nhập.
     """
     try:
-        secret_key = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
-        data = jwt.decode(token, secret_key, algorithms=["HS256"])
-        if data.get("sub") != "invite":
-            raise HTTPException(status_code=400, detail="Token không hợp lệ")
-        guest_id = data.get("guest_id")
-        guest = db.query(Guest).filter(Guest.id == guest_id).first()
+        if is_invite_code(token):
+            resolved = await resolve_invite_code_async(db, token)
+            if resolved is None:
+                raise HTTPException(status_code=404, detail="Thiệp mời không tồn tại hoặc đã hết hạn")
+            guest_id = resolved[0]
+        else:
+            try:
+                data = decode_invite_token(token)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            guest_id = data.get("guest_id")
+        guest = await db.get(Guest, guest_id) if guest_id is not None else None
         if not guest:
             raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
 
@@ -499,5 +658,3 @@ def get_invitation_by_token(token: str, db: Session = Depends(get_db)):
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Token không hợp lệ hoặc đã hết hạn: {str(e)}")
-
-
@@ -1,27 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from ..database import get_db
 from ..models.guest import Guest
 from ..models.event import Event
-from ..services.invitation_service import InvitationService
+from ..models.invitation_job import InvitationJob, InvitationJobItem
+from ..models.email_delivery import EmailDelivery
+from ..models.invitation import Invitation
+from ..models.event_version import get_data_version
+from ..services.invitation_service import (
+    InvitationService, guest_to_dict, event_to_dict, DEFAULT_TEMPLATE, template_fingerprint, get_template_stylesheet
+)
+from ..services.invitation_job_service import job_runner, job_to_dict
+from ..services.email_service import email_delivery_service, delivery_to_dict
+from ..services.pdf_service import NUP_LAYOUTS, is_pdf_renderer_available
 from ..schemas.guest import GuestResponse
+from ..utils.cache import LRUCache
+from ..utils.helpers import etag_matches
+import hashlib
+import json
 import os
 
 # Pydantic models for request data
 class GenerateInvitationRequest(BaseModel):
     template: Optional[str] = "elegant"
     event_id: Optional[int] = None
+    force: bool = False  # Render lại cả thiệp mời không thay đổi
 
 class GenerateBulkRequest(BaseModel):
     guest_ids: List[int]
     template: Optional[str] = "elegant"
     event_id: Optional[int] = None
+    force: bool = False
 
 class SendEmailRequest(BaseModel):
     template: Optional[str] = "elegant"
 
+class SendAllEmailsRequest(BaseModel):
+    template: Optional[str] = "elegant"
+    event_id: Optional[int] = None
+    resend: bool = False  # Gửi lại cả khách mời đã nhận email
+    retry_failed: bool = False  # Thử lại các email đã lỗi hẳn
+
+class PdfExportRequest(BaseModel):
+    template: Optional[str] = "elegant"
+    event_id: Optional[int] = None
+    merged: bool = True  # Tạo thêm một file in gộp tất cả thiệp mời
+    per_sheet: int = 1  # Số thiệp mỗi tờ A4 trong file in (1, 2, 4, 8)
+
 class PreviewRequest(BaseModel):
     template: str
     event_id: int
@@ -32,6 +61,37 @@ router = APIRouter(prefix="/invitations", tags=["invitations"])
 # Initialize service
 invitation_service = InvitationService()
 
+# Số kết quả mỗi trang khi trả về kết quả job
+RESULTS_PAGE_SIZE = 50
+
+# Cache kết quả xem trước: (template, phiên bản, sự kiện, tuỳ chỉnh) -> (payload, etag)
+_preview_cache = LRUCache(maxsize=int(os.getenv("INVITATION_PREVIEW_CACHE_SIZE", "256")))
+# Ảnh QR của khách mời mẫu chỉ tạo một lần
+_sample_qr_cache = LRUCache(maxsize=64)
+# Các tuỳ chỉnh có ảnh hưởng tới bản xem trước
+PREVIEW_CUSTOMIZATION_KEYS = ("primaryColor", "accentColor")
+
+def _job_results_page(db: Session, job_id: str, skip: int = 0, limit: int = RESULTS_PAGE_SIZE,
+                      status: Optional[str] = None) -> dict:
+    """
+    Một trang kết quả (guest id, tên file, trạng thái, lỗi nếu có) của job
+    """
+    query = db.query(InvitationJobItem).filter(InvitationJobItem.job_id == job_id)
+    if status:
+        query = query.filter(InvitationJobItem.status == status)
+    
+    items = query.order_by(InvitationJobItem.id).offset(skip).limit(limit).all()
+    return {
+        "items": [
+            {"guest_id": item.guest_id, "filename": item.filename, "status": item.status,
+             **({"error": item.error} if item.error else {})}
+            for item in items
+        ],
+        "total": query.count(),
+        "skip": skip,
+        "limit": limit
+    }
+
 @router.post("/generate/{guest_id}")
 def generate_invitation(guest_id: int, request_data: GenerateInvitationRequest, db: Session = Depends(get_db)):
     """
@@ -48,33 +108,15 @@ def generate_invitation(guest_id: int, request_data: GenerateInvitationRequest,
         raise HTTPException(status_code=404, detail="Không tìm thấy sự kiện")
     
     # Chuyển đổi thành dict
-    guest_dict = {
-        'id': guest.id,
-        'title': guest.title,
-        'name': guest.name,
-        'role': guest.role,
-        'organization': guest.organization,
-        'tag': guest.tag,
-        'email': guest.email,
-        'phone': guest.phone
-    }
-    
-    event_dict = {
-        'id': event.id,
-        'name': event.name,
-        'event_date': event.event_date.isoformat(),
-        'location': getattr(event, 'location', ''),
-        'address': getattr(event, 'address', ''),
-        'agenda': getattr(event, 'agenda', ''),
-        'description': getattr(event, 'description', '')
-    }
+    guest_dict = guest_to_dict(guest)
+    event_dict = event_to_dict(event)
     
-    # Kiểm tra xem thiệp mời đã tồn tại chưa dựa theo quy ước đặt tên file
+    # Kiểm tra thiệp mời đã có và còn đúng với dữ liệu hiện tại (so hash nội dung)
     invitation_id = f"INV{guest.id:06d}"
     filename = f"invite_{invitation_id}.html"
     filepath = os.path.join(invitation_service.templates_dir, filename)
 
-    if os.path.exists(filepath):
+    if invitation_service.is_up_to_date(guest_dict, event_dict, request_data.template):
         # Đã có thiệp mời trước đó
         return {
             "already_exists": True,
@@ -85,94 +127,148 @@ def generate_invitation(guest_id: int, request_data: GenerateInvitationRequest,
             "event": event_dict
         }
 
-    # Tạo dữ liệu thiệp mời nếu chưa có
-    invitation_data = invitation_service.generate_invitation_data(guest_dict, event_dict)
-    
-    # Tạo HTML thiệp mời
-    html_content = invitation_service.generate_html_invitation(invitation_data)
+    # Tạo (hoặc tạo lại nếu dữ liệu đã đổi) và lưu thiệp mời
+    result = invitation_service.render_and_save(guest_dict, event_dict, request_data.template)
+    invitation_service.record_results([result])
     
     return {
         "already_exists": False,
-        "invitation_data": invitation_data,
-        "html_content": html_content,
+        "invitation_data": result["invitation_data"],
+        "html_content": invitation_service.generate_html_invitation(
+            result["invitation_data"], request_data.template, inline_assets=True
+        ),
+        "filename": filename,
+        "file_path": filepath,
+        "download_url": f"/invitations/{filename}",
         "guest": guest_dict,
         "event": event_dict
     }
 
-@router.post("/generate-all")
+@router.post("/generate-all", status_code=202)
 def generate_all_invitations(
     request_data: GenerateInvitationRequest,
     db: Session = Depends(get_db)
 ):
     """
-    Tạo thiệp mời cho tất cả khách mời
+    Tạo thiệp mời cho tất cả khách mời (chạy nền, theo dõi qua /invitations/jobs/{job_id})
     """
-    # Lấy danh sách khách mời
     query = db.query(Guest)
+    if request_data.event_id:
+        query = query.filter(Guest.event_id == request_data.event_id)
     
-    # Extract event_id from request_data if provided
-    event_id = request_data.event_id
-    if event_id:
-        query = query.filter(Guest.event_id == event_id)
-    
-    guests = query.all()
-    
-    if not guests:
+    if not query.first():
         raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
     
-    # Lấy thông tin sự kiện
-    event = db.query(Event).filter(Event.id == guests[0].event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Không tìm thấy sự kiện")
+    job = job_runner.create_job(db, request_data.event_id, request_data.template, force=request_data.force)
     
-    event_dict = {
-        'id': event.id,
-        'name': event.name,
-        'event_date': event.event_date.isoformat(),
-        'location': getattr(event, 'location', ''),
-        'address': getattr(event, 'address', ''),
-        'agenda': getattr(event, 'agenda', ''),
-        'description': getattr(event, 'description', '')
+    return {
+        "message": f"Đã bắt đầu tạo {job.total} thiệp mời",
+        **job_to_dict(job)
     }
-    
-    invitations = []
-    
-    for guest in guests:
-        guest_dict = {
-            'id': guest.id,
-            'title': guest.title,
-            'name': guest.name,
-            'role': guest.role,
-            'organization': guest.organization,
-            'tag': guest.tag,
-            'email': guest.email,
-            'phone': guest.phone
-        }
-        
-        # Tạo dữ liệu thiệp mời
-        invitation_data = invitation_service.generate_invitation_data(guest_dict, event_dict)
-        
-        # Tạo HTML thiệp mời
-        html_content = invitation_service.generate_html_invitation(invitation_data)
-        
-        # Lưu file HTML
-        filename = f"invite_{invitation_data['meta']['invitation_id']}.html"
-        filepath = invitation_service.save_invitation_html(invitation_data, filename)
-        
-        invitations.append({
-            "guest_id": guest.id,
-            "guest_name": guest.name,
-            "invitation_id": invitation_data['meta']['invitation_id'],
-            "file_path": filepath,
-            "invitation_data": invitation_data
-        })
-    
+
+@router.get("/jobs")
+def list_invitation_jobs(limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Danh sách job tạo thiệp mời gần đây
+    """
+    jobs = db.query(InvitationJob).order_by(InvitationJob.created_at.desc()).limit(limit).all()
+    return {"jobs": [job_to_dict(job) for job in jobs]}
+
+@router.get("/jobs/{job_id}")
+def get_invitation_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Trạng thái và tiến độ của job tạo thiệp mời
+    """
+    job = db.query(InvitationJob).filter(InvitationJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    return job_to_dict(job)
+
+@router.get("/jobs/{job_id}/results")
+def get_invitation_job_results(
+    job_id: str,
+    skip: int = 0,
+    limit: int = Query(RESULTS_PAGE_SIZE, le=500),
+    status: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Kết quả theo từng khách mời của job, trả về theo trang
+    """
+    job = db.query(InvitationJob).filter(InvitationJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    return _job_results_page(db, job_id, skip=skip, limit=limit, status=status)
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_invitation_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Huỷ job tạo thiệp mời (dừng ở checkpoint kế tiếp)
+    """
+    job = db.query(InvitationJob).filter(InvitationJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    job = job_runner.request_cancel(db, job)
+    return job_to_dict(job)
+
+@router.post("/jobs/{job_id}/resume")
+def resume_invitation_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Tiếp tục job đã dừng từ checkpoint
+    """
+    job = db.query(InvitationJob).filter(InvitationJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    if job.status in ("completed", "partial"):
+        raise HTTPException(status_code=400, detail="Job đã hoàn tất")
+    if not job_runner.resume(db, job):
+        raise HTTPException(status_code=409, detail="Job đang được xử lý ở nơi khác")
+    db.refresh(job)
+    return job_to_dict(job)
+
+@router.post("/pdf-jobs", status_code=202)
+def export_invitations_pdf(request_data: PdfExportRequest, db: Session = Depends(get_db)):
+    """
+    Xuất thiệp mời ra PDF (job chạy nền); tải kết quả dạng ZIP khi job hoàn tất
+    """
+    if request_data.per_sheet not in NUP_LAYOUTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Số thiệp mỗi tờ phải là một trong {', '.join(str(n) for n in NUP_LAYOUTS)}"
+        )
+    if not is_pdf_renderer_available():
+        raise HTTPException(status_code=503, detail="Máy chủ chưa cài đặt WeasyPrint để xuất PDF")
+    
+    job = job_runner.create_job(
+        db,
+        request_data.event_id,
+        request_data.template,
+        kind="pdf_export",
+        options={"merged": request_data.merged, "per_sheet": request_data.per_sheet}
+    )
     return {
-        "message": f"Đã tạo {len(invitations)} thiệp mời",
-        "invitations": invitations,
-        "event": event_dict
+        "message": f"Đã bắt đầu xuất PDF {job.total} thiệp mời",
+        **job_to_dict(job)
     }
 
+@router.get("/jobs/{job_id}/pdf.zip")
+def download_invitation_pdfs(job_id: str, db: Session = Depends(get_db)):
+    """
+    Tải toàn bộ PDF của job xuất PDF (stream ZIP)
+    """
+    job = db.query(InvitationJob).filter(InvitationJob.id == job_id).first()
+    if not job or job.kind != "pdf_export":
+        raise HTTPException(status_code=404, detail="Không tìm thấy job xuất PDF")
+    # partial: tải các PDF render thành công, thiệp mời lỗi xem trong kết quả job
+    if job.status not in ("completed", "partial"):
+        raise HTTPException(status_code=409, detail="Job xuất PDF chưa hoàn tất")
+    
+    return StreamingResponse(
+        job_runner.pdf_service.iter_zip(job.id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="invitations_{job.id[:8]}.zip"'}
+    )
+
 @router.post("/generate-bulk")
 def generate_bulk_invitations(
     request_data: GenerateBulkRequest,
@@ -195,56 +291,68 @@ def generate_bulk_invitations(
     if not event:
         raise HTTPException(status_code=404, detail="Không tìm thấy sự kiện")
     
-    event_dict = {
-        'id': event.id,
-        'name': event.name,
-        'event_date': event.event_date.isoformat(),
-        'location': getattr(event, 'location', ''),
-        'address': getattr(event, 'address', ''),
-        'agenda': getattr(event, 'agenda', ''),
-        'description': getattr(event, 'description', '')
+    event_dict = event_to_dict(event)
+    
+    # Chỉ render khách mời có hash nội dung thay đổi (song song theo lô trên process pool)
+    guest_dicts = [guest_to_dict(guest) for guest in guests]
+    job = job_runner.run_bulk(db, guest_dicts, event_dict, request_data.template, force=request_data.force)
+    
+    return {
+        "message": f"Đã tạo {job.rendered} thiệp mời cho {len(request_data.guest_ids)} khách mời "
+                   f"({job.skipped} thiệp mời không thay đổi)",
+        **job_to_dict(job),
+        "results": _job_results_page(db, job.id, skip=0, limit=RESULTS_PAGE_SIZE)
     }
+
+def _preview_response(key: tuple, render, request: Request, response: Response):
+    """
+    Trả kết quả xem trước từ cache (render nếu chưa có), hỗ trợ ETag/304
+    """
+    payload, etag = _preview_cache.get_or_set(key, render)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return payload
+
+def _render_preview(sample_guest: dict, event_dict: dict, template: str, customization: dict) -> tuple:
+    """
+    Render thiệp mời mẫu, trả về (payload, etag)
+    """
+    invitation_data = invitation_service.generate_invitation_data(sample_guest, event_dict, qr_cache=_sample_qr_cache)
     
-    invitations = []
-    
-    for guest in guests:
-        guest_dict = {
-            'id': guest.id,
-            'title': guest.title,
-            'name': guest.name,
-            'role': guest.role,
-            'organization': guest.organization,
-            'tag': guest.tag,
-            'email': guest.email,
-            'phone': guest.phone
-        }
-        
-        # Tạo dữ liệu thiệp mời
-        invitation_data = invitation_service.generate_invitation_data(guest_dict, event_dict)
-        
-        # Tạo HTML thiệp mời
-        html_content = invitation_service.generate_html_invitation(invitation_data)
-        
-        # Lưu file HTML
-        filename = f"invite_{invitation_data['meta']['invitation_id']}.html"
-        filepath = invitation_service.save_invitation_html(invitation_data, filename)
-        
-        invitations.append({
-            "guest_id": guest.id,
-            "guest_name": guest.name,
-            "invitation_id": invitation_data['meta']['invitation_id'],
-            "file_path": filepath,
-            "invitation_data": invitation_data
-        })
+    # Áp dụng tuỳ chỉnh màu sắc
+    if 'primaryColor' in customization:
+        invitation_data['branding']['primary_color'] = customization['primaryColor']
+    if 'accentColor' in customization:
+        invitation_data['branding']['accent_color'] = customization['accentColor']
     
+    html_content = invitation_service.generate_html_invitation(invitation_data, template, inline_assets=True)
+    payload = {
+        "html_content": html_content,
+        "invitation_data": invitation_data,
+        "template": template,
+        "customization": customization
+    }
+    etag = '"' + hashlib.sha256(html_content.encode('utf-8')).hexdigest()[:32] + '"'
+    return payload, etag
+
+def _normalize_customization(customization: dict) -> dict:
+    """
+    Chỉ giữ các tuỳ chỉnh ảnh hưởng tới kết quả render, chuẩn hoá giá trị màu
+    """
     return {
-        "message": f"Đã tạo {len(invitations)} thiệp mời cho {len(request_data.guest_ids)} khách mời",
-        "invitations": invitations,
-        "event": event_dict
+        key: str(customization[key]).strip().lower()
+        for key in PREVIEW_CUSTOMIZATION_KEYS
+        if customization.get(key)
     }
 
+def _template_version(template: str) -> tuple:
+    # Sửa file template/CSS thì bản xem trước trong cache không còn dùng được
+    return template_fingerprint(template), get_template_stylesheet(template)[1]
+
 @router.get("/preview")
-def preview_invitation_template():
+def preview_invitation_template(request: Request, response: Response):
     """
     Xem trước mẫu thiệp mời
     """
@@ -270,16 +378,13 @@ def preview_invitation_template():
         'description': 'Lễ kỷ niệm 15 năm thành lập EXP Technology'
     }
     
-    # Tạo dữ liệu thiệp mời
-    invitation_data = invitation_service.generate_invitation_data(sample_guest, sample_event)
-    
-    # Tạo HTML thiệp mời
-    html_content = invitation_service.generate_html_invitation(invitation_data)
-    
-    return {
-        "invitation_data": invitation_data,
-        "html_content": html_content
-    }
+    key = ("sample", DEFAULT_TEMPLATE, _template_version(DEFAULT_TEMPLATE))
+    return _preview_response(
+        key,
+        lambda: _render_preview(sample_guest, sample_event, DEFAULT_TEMPLATE, {}),
+        request,
+        response
+    )
 
 @router.get("/download/{guest_id}")
 def download_invitation(guest_id: int, db: Session = Depends(get_db)):
@@ -296,139 +401,165 @@ def download_invitation(guest_id: int, db: Session = Depends(get_db)):
     if not event:
         raise HTTPException(status_code=404, detail="Không tìm thấy sự kiện")
     
-    guest_dict = {
-        'id': guest.id,
-        'title': guest.title,
-        'name': guest.name,
-        'role': guest.role,
-        'organization': guest.organization,
-        'tag': guest.tag,
-        'email': guest.email,
-        'phone': guest.phone
-    }
-    
-    event_dict = {
-        'id': event.id,
-        'name': event.name,
-        'event_date': event.event_date.isoformat(),
-        'location': getattr(event, 'location', ''),
-        'address': getattr(event, 'address', ''),
-        'agenda': getattr(event, 'agenda', ''),
-        'description': getattr(event, 'description', '')
-    }
-    
-    # Tạo dữ liệu thiệp mời
-    invitation_data = invitation_service.generate_invitation_data(guest_dict, event_dict)
+    guest_dict = guest_to_dict(guest)
+    event_dict = event_to_dict(event)
     
-    # Tạo và lưu file HTML
-    filename = f"invite_{invitation_data['meta']['invitation_id']}.html"
-    filepath = invitation_service.save_invitation_html(invitation_data, filename)
+    # Tạo (hoặc tạo lại nếu dữ liệu đã đổi) và lưu file HTML
+    invitation_id = f"INV{guest.id:06d}"
+    filename = f"invite_{invitation_id}.html"
+    filepath = os.path.join(invitation_service.templates_dir, filename)
+    if not invitation_service.is_up_to_date(guest_dict, event_dict):
+        result = invitation_service.render_and_save(guest_dict, event_dict)
+        invitation_service.record_results([result])
     
     return {
         "file_path": filepath,
         "filename": filename,
-        "invitation_id": invitation_data['meta']['invitation_id'],
+        "invitation_id": invitation_id,
         "download_url": f"/static/invitations/{filename}"
     }
 
-@router.post("/send-email/{guest_id}")
+@router.post("/send-email/{guest_id}", status_code=202)
 def send_invitation_email(guest_id: int, request_data: SendEmailRequest, db: Session = Depends(get_db)):
     """
-    Gửi email thiệp mời cho khách mời
+    Gửi email thiệp mời cho khách mời (đưa vào hàng đợi gửi)
     """
     # Lấy thông tin khách mời
     guest = db.query(Guest).filter(Guest.id == guest_id).first()
     if not guest:
         raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
     
+    if not guest.email:
+        raise HTTPException(status_code=400, detail="Khách mời chưa có email")
+    
     # Lấy thông tin sự kiện
     event = db.query(Event).filter(Event.id == guest.event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Không tìm thấy sự kiện")
     
-    guest_dict = {
-        'id': guest.id,
-        'title': guest.title,
-        'name': guest.name,
-        'role': guest.role,
-        'organization': guest.organization,
-        'tag': guest.tag,
-        'email': guest.email,
-        'phone': guest.phone
-    }
+    # Gửi theo yêu cầu trực tiếp thì gửi lại cả khi đã gửi trước đó
+    email_delivery_service.enqueue(db, [guest], request_data.template, resend=True)
+    delivery = db.query(EmailDelivery).filter(
+        EmailDelivery.guest_id == guest.id,
+        EmailDelivery.event_id == guest.event_id
+    ).first()
     
-    event_dict = {
-        'id': event.id,
-        'name': event.name,
-        'event_date': event.event_date.isoformat(),
-        'location': getattr(event, 'location', ''),
-        'address': getattr(event, 'address', ''),
-        'agenda': getattr(event, 'agenda', ''),
-        'description': getattr(event, 'description', '')
+    return {
+        "message": f"Đã đưa email thiệp mời cho {guest.name} vào hàng đợi gửi",
+        "email": guest.email,
+        "invitation_id": f"INV{guest.id:06d}",
+        "delivery": delivery_to_dict(delivery)
     }
+
+@router.post("/send-all-pending", status_code=202)
+def send_all_pending_emails(request_data: SendAllEmailsRequest, db: Session = Depends(get_db)):
+    """
+    Gửi email thiệp mời cho tất cả khách mời chưa được gửi thành công
+    """
+    query = db.query(Guest).filter(Guest.email.isnot(None), Guest.email != "")
+    if request_data.event_id:
+        query = query.filter(Guest.event_id == request_data.event_id)
+    
+    summary = email_delivery_service.enqueue(
+        db, query.all(), request_data.template,
+        resend=request_data.resend, retry_failed=request_data.retry_failed
+    )
+    return {
+        "message": f"Đã đưa {summary['queued']} email thiệp mời vào hàng đợi gửi",
+        **summary
+    }
+
+@router.get("/deliveries")
+def list_email_deliveries(
+    event_id: Optional[int] = None,
+    status: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(RESULTS_PAGE_SIZE, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Trạng thái gửi email thiệp mời theo từng khách mời, kèm thống kê theo trạng thái
+    """
+    query = db.query(EmailDelivery)
+    if event_id:
+        query = query.filter(EmailDelivery.event_id == event_id)
     
-    # Tạo dữ liệu thiệp mời
-    invitation_data = invitation_service.generate_invitation_data(guest_dict, event_dict)
-    
-    # Tạo và lưu file HTML
-    filename = f"invite_{invitation_data['meta']['invitation_id']}.html"
-    filepath = invitation_service.save_invitation_html(invitation_data, filename)
+    counts = {
+        row_status: count for row_status, count in
+        query.with_entities(EmailDelivery.status, func.count(EmailDelivery.id)).group_by(EmailDelivery.status).all()
+    }
     
-    # TODO: Implement actual email sending logic here
-    # For now, just return success message
+    if status:
+        query = query.filter(EmailDelivery.status == status)
+    deliveries = query.order_by(EmailDelivery.id).offset(skip).limit(limit).all()
     
     return {
-        "message": f"Đã gửi email thiệp mời cho {guest.name}",
-        "email": guest.email,
-        "invitation_id": invitation_data['meta']['invitation_id'],
-        "filename": filename,
-        "file_path": filepath
+        "counts": counts,
+        "total": counts.get(status, 0) if status else sum(counts.values()),
+        "skip": skip,
+        "limit": limit,
+        "deliveries": [delivery_to_dict(delivery) for delivery in deliveries]
     }
 
 @router.get("/list")
-def list_invitations(db: Session = Depends(get_db)):
+def list_invitations(
+    event_id: Optional[int] = None,
+    guest_id: Optional[int] = None,
+    template: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(RESULTS_PAGE_SIZE, le=500),
+    db: Session = Depends(get_db)
+):
     """
-    Liệt kê tất cả thiệp mời đã tạo
+    Liệt kê thiệp mời đã tạo (theo trang, mới nhất trước)
     """
-    invitations_dir = invitation_service.templates_dir
-    
-    if not os.path.exists(invitations_dir):
-        return {"invitations": []}
-    
-    invitations = []
-    
-    for filename in os.listdir(invitations_dir):
-        if filename.endswith('.html'):
-            filepath = os.path.join(invitations_dir, filename)
-            file_stat = os.stat(filepath)
-            
-            invitations.append({
-                "filename": filename,
-                "file_path": filepath,
-                "created_at": file_stat.st_ctime,
-                "size": file_stat.st_size
-            })
+    query = db.query(Invitation)
+    if event_id:
+        query = query.filter(Invitation.event_id == event_id)
+    if guest_id:
+        query = query.filter(Invitation.guest_id == guest_id)
+    if template:
+        query = query.filter(Invitation.template == template)
     
-    # Sắp xếp theo thời gian tạo
-    invitations.sort(key=lambda x: x['created_at'], reverse=True)
+    total = query.count()
+    invitations = query.order_by(Invitation.updated_at.desc(), Invitation.id.desc()).offset(skip).limit(limit).all()
     
     return {
-        "invitations": invitations,
-        "total": len(invitations)
+        "invitations": [
+            {
+                "id": invitation.id,
+                "filename": invitation.filename,
+                "file_path": invitation.file_path,
+                "guest_id": invitation.guest_id,
+                "event_id": invitation.event_id,
+                "template": invitation.template,
+                "content_hash": invitation.content_hash,
+                "size": invitation.size,
+                "created_at": invitation.created_at,
+                "updated_at": invitation.updated_at,
+                "download_url": f"/invitations/{invitation.filename}"
+            }
+            for invitation in invitations
+        ],
+        "total": total,
+        "skip": skip,
+        "limit": limit
     }
 
 @router.delete("/delete/{filename}")
-def delete_invitation(filename: str):
+def delete_invitation(filename: str, db: Session = Depends(get_db)):
     """
     Xóa thiệp mời
     """
-    filepath = os.path.join(invitation_service.templates_dir, filename)
-    
-    if not os.path.exists(filepath):
+    # Chỉ xoá file có trong bảng invitations (không nhận đường dẫn tuỳ ý)
+    invitation = db.query(Invitation).filter(Invitation.filename == filename).first()
+    if not invitation:
         raise HTTPException(status_code=404, detail="Không tìm thấy file thiệp mời")
     
     try:
-        os.remove(filepath)
+        invitation_service.delete_invitation_file(invitation.filename)
+        db.delete(invitation)
+        db.commit()
         return {"message": f"Đã xóa thiệp mời {filename}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi xóa file: {str(e)}")
@@ -492,22 +623,20 @@ def get_invitation_template():
     }
 
 @router.post("/preview")
-async def preview_template(
+def preview_template(
     request_data: PreviewRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """Preview template with sample data"""
     try:
-        print(f"Preview request: {request_data.dict()}")
-        
         # Get event info
         event = db.query(Event).filter(Event.id == request_data.event_id).first()
         if not event:
             print(f"Event {request_data.event_id} not found")
             raise HTTPException(status_code=404, detail="Event not found")
         
-        print(f"Found event: {event.name}")
-        
         # Create sample guest data for preview
         sample_guest = {
             "id": 0,
@@ -519,44 +648,28 @@ async def preview_template(
         }
         
         # Create event data
-        event_dict = {
-            "id": event.id,
-            "name": event.name,
-            "event_date": event.event_date.isoformat() if event.event_date else None,
-            "date": event.event_date.isoformat() if event.event_date else None,
-            "time": None,  # Event model doesn't have time field
-            "location": event.location,
-            "description": event.description
-        }
-        
-        print(f"Event dict: {event_dict}")
+        event_dict = event_to_dict(event)
         
-        # Generate invitation data
-        invitation_data = invitation_service.generate_invitation_data(sample_guest, event_dict)
-        print(f"Generated invitation data: {invitation_data}")
-        
-        # Apply customization if provided
-        if request_data.customization:
-            if 'primaryColor' in request_data.customization:
-                invitation_data['branding']['primary_color'] = request_data.customization['primaryColor']
-            if 'accentColor' in request_data.customization:
-                invitation_data['branding']['accent_color'] = request_data.customization['accentColor']
-        
-        # Generate HTML with template type
-        html_content = invitation_service.generate_html_invitation(invitation_data, request_data.template)
-        print(f"Generated HTML content length: {len(html_content)}")
-        
-        return {
-            "html_content": html_content,
-            "invitation_data": invitation_data,
-            "template": request_data.template,
-            "customization": request_data.customization
-        }
-    
+        # Cache theo template, phiên bản dữ liệu sự kiện và tuỳ chỉnh (đã chuẩn hoá)
+        customization = _normalize_customization(request_data.customization or {})
+        key = (
+            request_data.template,
+            _template_version(request_data.template),
+            event.id,
+            get_data_version(db, event.id),
+            json.dumps(customization, sort_keys=True)
+        )
+        return _preview_response(
+            key,
+            lambda: _render_preview(sample_guest, event_dict, request_data.template, customization),
+            request,
+            response
+        )
+    
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in preview_template: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
-
-
@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import HTMLResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from jose import JWTError
+import hashlib
+import os
+import time
+from ..database import get_async_db
+from ..models.guest import Guest
+from ..models.event import Event
+from ..models.event_version import get_data_version_async
+from ..services.invitation_service import (
+    InvitationService, guest_to_dict, event_to_dict, DEFAULT_TEMPLATE, TEMPLATE_TYPES,
+    INVITATION_ASSET_PATH, get_template_stylesheet, invitation_asset_url
+)
+from ..services.invite_service import decode_invite_token, is_invite_code, resolve_invite_code_async
+from ..utils.cache import LRUCache
+from ..utils.shared_cache import shared_cache, event_tag
+from ..utils.helpers import etag_matches
+
+router = APIRouter(tags=["public"])
+
+invitation_service = InvitationService()
+
+# JWT -> (guest_id, event_id): token không đổi nên giữ đến khi hết hạn để bỏ qua truy vấn khách mời
+_token_cache = LRUCache(maxsize=int(os.getenv("PUBLIC_INVITATION_CACHE_SIZE", "2000")))
+# Trang thiệp mời đã render (html, etag) nằm trong cache dùng chung giữa các worker
+PUBLIC_INVITATION_CACHE_TTL_SECONDS = int(os.getenv("PUBLIC_INVITATION_CACHE_TTL_SECONDS", "3600"))
+
+async def _resolve_token(token: str, db: AsyncSession) -> tuple:
+    """
+    Giải mã mã ngắn hoặc token (JWT, link cũ) thành (guest_id, event_id), có cache
+    """
+    if is_invite_code(token):
+        resolved = await resolve_invite_code_async(db, token)
+        if resolved is None:
+            raise HTTPException(status_code=404, detail="Thiệp mời không tồn tại hoặc đã hết hạn")
+        return resolved
+    
+    cached = _token_cache.get(token)
+    if cached:
+        return cached
+    
+    try:
+        data = decode_invite_token(token)
+    except (JWTError, ValueError):
+        raise HTTPException(status_code=404, detail="Thiệp mời không tồn tại hoặc đã hết hạn")
+    
+    guest = await db.get(Guest, data.get("guest_id")) if data.get("guest_id") is not None else None
+    if not guest:
+        raise HTTPException(status_code=404, detail="Không tìm thấy khách mời")
+    
+    resolved = (guest.id, guest.event_id)
+    _token_cache.set(token, resolved, ttl=max(data["exp"] - time.time(), 1) if data.get("exp") else None)
+    return resolved
+
+def _render_page(guest: dict, event: dict, stamp, template: str) -> tuple:
+    """
+    Render thiệp mời của khách mời, trả về (html, etag)
+    """
+    invitation_data = invitation_service.generate_invitation_data(guest, event)
+    # Dùng thời điểm cập nhật khách mời để nội dung (và ETag) ổn định giữa các lần render
+    if stamp:
+        invitation_data['meta']['created_at'] = stamp.isoformat()
+    
+    html = invitation_service.generate_html_invitation(invitation_data, template)
+    etag = '"' + hashlib.sha256(html.encode('utf-8')).hexdigest()[:32] + '"'
+    return html, etag
+
+@router.get("/public/invitations/{token}", response_class=HTMLResponse)
+async def render_public_invitation(
+    token: str,
+    request: Request,
+    template: str = Query(DEFAULT_TEMPLATE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Trang thiệp mời công khai render phía server, có cache và ETag.
+    /i/{token} vẫn thuộc trang React (RSVP, QR check-in); trang này dùng để xem/in thiệp mời.
+    """
+    # Template lạ được render như template mặc định: dùng chung một khoá cache
+    if template not in TEMPLATE_TYPES:
+        template = DEFAULT_TEMPLATE
+    
+    guest_id, event_id = await _resolve_token(token, db)
+    version = await get_data_version_async(db, event_id)
+    
+    key = f"invitation:{guest_id}:{event_id}:{version}:{template}:{invitation_asset_url(template)}"
+    cached = await shared_cache.aget(key)
+    if cached is None:
+        guest = await db.get(Guest, guest_id)
+        event = await db.get(Event, event_id) if event_id is not None else None
+        if not guest or not event:
+            raise HTTPException(status_code=404, detail="Không tìm thấy thiệp mời")
+        # Render template (CPU) ngoài event loop
+        cached = await run_in_threadpool(
+            _render_page, guest_to_dict(guest), event_to_dict(event), guest.updated_at or guest.created_at, template
+        )
+        await shared_cache.aset(key, cached, ttl=PUBLIC_INVITATION_CACHE_TTL_SECONDS, tags=[event_tag(event_id)])
+    html, etag = cached
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    return HTMLResponse(html, headers=headers)
+
+@router.get(INVITATION_ASSET_PATH + "/{filename}")
+def get_invitation_asset(filename: str, request: Request):
+    """
+    Stylesheet của template thiệp mời, dạng {template}.{fingerprint}.css.
+    Nội dung không đổi theo URL nên được cache vĩnh viễn (immutable).
+    """
+    parts = filename.split('.')
+    if len(parts) != 3 or parts[0] not in TEMPLATE_TYPES or parts[2] != "css":
+        raise HTTPException(status_code=404, detail="Không tìm thấy tài nguyên")
+    
+    content, fingerprint = get_template_stylesheet(parts[0])
+    etag = f'"{fingerprint}"'
+    if parts[1] == fingerprint:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        # Thiệp mời cũ còn trỏ tới fingerprint trước đó: trả CSS hiện tại nhưng không cache lâu
+        cache_control = "no-cache"
+    
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content, media_type="text/css", headers=headers)
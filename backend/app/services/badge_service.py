@@ -0,0 +1,254 @@
+import os
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .qr_service import QRService
+from ..utils.helpers import ChunkSink, process_pool_context
+
+# Độ phân giải ảnh trang badge (dpi)
+BADGE_DPI = int(os.getenv("BADGE_DPI", "200"))
+# Số process render trang song song
+BADGE_WORKERS = int(os.getenv("BADGE_WORKERS", str(os.cpu_count() or 1)))
+# Font có dấu tiếng Việt; có thể chỉ định bằng biến môi trường
+BADGE_FONT_PATH = os.getenv("BADGE_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+BADGE_BOLD_FONT_PATH = os.getenv("BADGE_BOLD_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+
+# Số badge mỗi trang A4 -> (số cột, số hàng)
+BADGE_LAYOUTS = {
+    8: (2, 4),
+    12: (3, 4),
+}
+BADGE_FORMATS = ("pdf", "png")
+
+# Khổ A4 (inch và point)
+_A4_INCHES = (8.27, 11.69)
+_A4_POINTS = (595.28, 841.89)
+_MARGIN_INCHES = 0.4
+
+
+def guest_to_badge(guest) -> Dict[str, Any]:
+    """
+    Dữ liệu cần cho một badge (nhẹ, gửi được sang worker process)
+    """
+    return {
+        "title": guest.title or "",
+        "name": guest.name,
+        "organization": guest.organization or "",
+        "qr_image_path": guest.qr_image_path,
+        "qr_code": guest.qr_code,
+        "guest_id": guest.id,
+        "event_id": guest.event_id,
+    }
+
+
+def _load_font(path: str, size: int):
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _fit_lines(draw: ImageDraw.ImageDraw, text: str, font, max_width: int, max_lines: int) -> List[str]:
+    """
+    Ngắt dòng theo độ rộng ô, cắt bớt bằng "…" nếu vượt quá số dòng
+    """
+    lines: List[str] = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if draw.textlength(candidate, font=font) <= max_width:
+            current = candidate
+            continue
+        if current:
+            lines.append(current)
+        current = word
+    if current:
+        lines.append(current)
+
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        last = lines[-1]
+        while last and draw.textlength(last + "…", font=font) > max_width:
+            last = last[:-1]
+        lines[-1] = last.rstrip() + "…"
+    return lines
+
+
+def _badge_qr_image(badge: Dict[str, Any]) -> Image.Image:
+    """
+    Ảnh QR của khách mời: dùng file QRService đã tạo, nếu thiếu thì tạo lại từ dữ liệu QR
+    """
+    path = badge.get("qr_image_path")
+    if path and os.path.exists(path):
+        return Image.open(path).convert("L")
+    data = badge.get("qr_code") or f'{{"guest_id": {badge["guest_id"]}, "event_id": {badge["event_id"]}, "type": "guest_checkin"}}'
+    return QRService.make_qr_image(data).convert("L")
+
+
+def render_badge_page(badges: List[Dict[str, Any]], per_page: int = 8, dpi: int = BADGE_DPI) -> Image.Image:
+    """
+    Vẽ một trang A4 (ảnh xám) chứa tối đa per_page badge: QR code, họ tên và đơn vị
+    """
+    cols, rows = BADGE_LAYOUTS[per_page]
+    width, height = int(_A4_INCHES[0] * dpi), int(_A4_INCHES[1] * dpi)
+    margin = int(_MARGIN_INCHES * dpi)
+    cell_width = (width - 2 * margin) // cols
+    cell_height = (height - 2 * margin) // rows
+    padding = cell_width // 16
+
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    name_font = _load_font(BADGE_BOLD_FONT_PATH, max(cell_width // 14, 12))
+    org_font = _load_font(BADGE_FONT_PATH, max(cell_width // 20, 10))
+
+    for index, badge in enumerate(badges[:per_page]):
+        left = margin + (index % cols) * cell_width
+        top = margin + (index // cols) * cell_height
+        # Đường cắt
+        draw.rectangle([left, top, left + cell_width - 1, top + cell_height - 1], outline=190, width=max(dpi // 100, 1))
+
+        qr_size = int(min(cell_width * 0.6, cell_height * 0.58))
+        qr_image = _badge_qr_image(badge).resize((qr_size, qr_size), Image.NEAREST)
+        page.paste(qr_image, (left + (cell_width - qr_size) // 2, top + padding))
+
+        text_width = cell_width - 2 * padding
+        y = top + padding + qr_size + padding // 2
+        name = f"{badge['title']} {badge['name']}".strip()
+        for line in _fit_lines(draw, name, name_font, text_width, 2):
+            draw.text((left + cell_width // 2, y), line, font=name_font, fill=0, anchor="ma")
+            y += int(name_font.size * 1.2)
+        y += padding // 4
+        for line in _fit_lines(draw, badge['organization'], org_font, text_width, 2):
+            draw.text((left + cell_width // 2, y), line, font=org_font, fill=60, anchor="ma")
+            y += int(org_font.size * 1.2)
+    return page
+
+
+def _render_page_png(args: Tuple[List[Dict[str, Any]], int, int]) -> bytes:
+    badges, per_page, dpi = args
+    buffer = BytesIO()
+    render_badge_page(badges, per_page, dpi).save(buffer, "PNG", optimize=True, dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+def _render_page_pdf_image(args: Tuple[List[Dict[str, Any]], int, int]) -> Tuple[int, int, bytes]:
+    """
+    Trang badge dạng ảnh xám đã nén Flate, dùng trực tiếp làm image XObject trong PDF
+    """
+    badges, per_page, dpi = args
+    page = render_badge_page(badges, per_page, dpi)
+    return page.width, page.height, zlib.compress(page.tobytes(), 6)
+
+
+class _PdfStreamWriter:
+    """
+    Ghi PDF tuần tự từng trang (mỗi trang là một ảnh), không cần giữ cả tài liệu trong bộ nhớ
+    """
+
+    def __init__(self):
+        self.sink = ChunkSink()
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = 3  # 1: Catalog, 2: Pages (ghi cuối cùng)
+        self.sink.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, object_id: int, body: bytes, stream: Optional[bytes] = None) -> None:
+        self.offsets[object_id] = self.sink.tell()
+        self.sink.write(f"{object_id} 0 obj\n".encode() + body)
+        if stream is not None:
+            self.sink.write(b"\nstream\n" + stream + b"\nendstream")
+        self.sink.write(b"\nendobj\n")
+
+    def add_image_page(self, width: int, height: int, data: bytes) -> bytes:
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        page_width, page_height = _A4_POINTS
+
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+            f"/BitsPerComponent 8 /Filter /FlateDecode /Length {len(data)} >>"
+        ).encode(), data)
+        content = f"q {page_width} 0 0 {page_height} 0 0 cm /Im0 Do Q".encode()
+        self._object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self.page_ids.append(page_id)
+        return self.sink.drain()
+
+    def finish(self) -> bytes:
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+
+        xref_offset = self.sink.tell()
+        size = self.next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        lines.extend(
+            f"{self.offsets[object_id]:010d} 00000 n \n" if object_id in self.offsets else "0000000000 65535 f \n"
+            for object_id in range(1, size)
+        )
+        self.sink.write("".join(lines).encode())
+        self.sink.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        return self.sink.drain()
+
+
+_badge_pool = None
+_badge_pool_lock = threading.Lock()
+
+def _get_badge_pool() -> ProcessPoolExecutor:
+    """
+    Process pool riêng cho việc render trang badge, tạo khi cần lần đầu
+    """
+    global _badge_pool
+    with _badge_pool_lock:
+        if _badge_pool is None:
+            _badge_pool = ProcessPoolExecutor(max_workers=BADGE_WORKERS, mp_context=process_pool_context())
+        return _badge_pool
+
+
+class BadgeService:
+    """
+    Tạo tờ in badge QR (8 hoặc 12 badge mỗi trang A4), render các trang song song và stream kết quả
+    """
+
+    def _iter_pages(self, badges: List[Dict[str, Any]], per_page: int, render) -> Iterator[Any]:
+        pages = [(badges[i:i + per_page], per_page, BADGE_DPI) for i in range(0, len(badges), per_page)]
+        if len(pages) <= 1 or BADGE_WORKERS <= 1:
+            for page in pages:
+                yield render(page)
+            return
+        # Giữ đúng thứ tự trang; mỗi trang được trả về ngay khi đến lượt
+        futures = [_get_badge_pool().submit(render, page) for page in pages]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def iter_badges_pdf(self, guests: Iterable[Any], per_page: int = 8) -> Iterator[bytes]:
+        badges = [guest_to_badge(guest) for guest in guests]
+        writer = _PdfStreamWriter()
+        for width, height, data in self._iter_pages(badges, per_page, _render_page_pdf_image):
+            yield writer.add_image_page(width, height, data)
+        yield writer.finish()
+
+    def iter_badges_png(self, guests: Iterable[Any], per_page: int = 8) -> Iterator[bytes]:
+        """
+        ZIP các trang PNG (badges_001.png, ...)
+        """
+        badges = [guest_to_badge(guest) for guest in guests]
+        sink = ChunkSink()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for number, png in enumerate(self._iter_pages(badges, per_page, _render_page_png), start=1):
+                archive.writestr(f"badges_{number:03d}.png", png)
+                yield sink.drain()
+        yield sink.drain()
@@ -1,10 +1,62 @@
 import pandas as pd
+import csv
 import json
-from typing import List, Dict, Any
+import tempfile
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from io import StringIO, BytesIO
+from openpyxl import Workbook
 import uuid
 import os
 from datetime import datetime
+from ..utils.helpers import ChunkSink
+
+# Các cột có thể chọn khi export: tên cột -> tiêu đề hiển thị
+EXPORT_COLUMNS = {
+    'id': 'ID',
+    'title': 'Danh xưng',
+    'name': 'Họ tên',
+    'role': 'Chức vụ',
+    'organization': 'Tổ chức',
+    'tag': 'Tag',
+    'email': 'Email',
+    'phone': 'Điện thoại',
+    'rsvp_status': 'RSVP',
+    'rsvp_response_date': 'Ngày phản hồi RSVP',
+    'rsvp_notes': 'Ghi chú RSVP',
+    'checked_in': 'Đã check-in',
+    'check_in_time': 'Thời gian check-in',
+    'check_in_location': 'Vị trí check-in',
+    'event_id': 'Sự kiện',
+    'created_at': 'Ngày tạo',
+    'updated_at': 'Ngày cập nhật',
+}
+
+# Mặc định chỉ xuất 3 cột: id, name, organization
+DEFAULT_EXPORT_COLUMNS = ['id', 'name', 'organization']
+
+# Kiểu dữ liệu của toàn bộ cột khách mời khi export dạng cột (Parquet/Arrow)
+ARROW_COLUMN_TYPES = {
+    'id': 'int64',
+    'title': 'string',
+    'name': 'string',
+    'role': 'string',
+    'organization': 'string',
+    'tag': 'string',
+    'email': 'string',
+    'phone': 'string',
+    'qr_code': 'string',
+    'qr_image_path': 'string',
+    'rsvp_status': 'string',
+    'rsvp_response_date': 'timestamp',
+    'rsvp_notes': 'string',
+    'checked_in': 'bool',
+    'check_in_time': 'timestamp',
+    'check_in_location': 'string',
+    'event_id': 'int64',
+    'created_at': 'timestamp',
+    'updated_at': 'timestamp',
+}
+
 
 class CSVService:
     def __init__(self):
@@ -95,73 +147,185 @@ class CSVService:
         
         return cleaned
     
-    def _extract_minimal_guest_rows(self, guests: List[Any]) -> List[Dict[str, Any]]:
+    def parse_export_columns(self, columns: Optional[str]) -> List[str]:
+        """
+        Chuyển tham số columns (phân cách bằng dấu phẩy) thành danh sách cột hợp lệ
         """
-        Chuẩn hoá danh sách khách mời thành chỉ 3 cột: id, name, organization.
+        if not columns:
+            return list(DEFAULT_EXPORT_COLUMNS)
+        
+        selected = [c.strip() for c in columns.split(',') if c.strip()]
+        unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cột không hợp lệ: {', '.join(unknown)}")
+        return selected or list(DEFAULT_EXPORT_COLUMNS)
+    
+    def _iter_guest_rows(self, guests: Iterable[Any], columns: List[str]) -> Iterator[List[Any]]:
+        """
+        Chuẩn hoá từng khách mời thành một dòng theo các cột được chọn.
         Hỗ trợ cả dict và SQLAlchemy model (có attribute).
         """
-        rows: List[Dict[str, Any]] = []
         for g in guests:
-            # Support SQLAlchemy model or dict-like
-            try:
-                gid = getattr(g, 'id', None) if not isinstance(g, dict) else g.get('id')
-                name = getattr(g, 'name', None) if not isinstance(g, dict) else g.get('name')
-                org = getattr(g, 'organization', None) if not isinstance(g, dict) else g.get('organization')
-            except Exception:
-                gid = None
-                name = None
-                org = None
-            rows.append({
-                'id': gid if gid is not None else '',
-                'name': (name or ''),
-                'organization': (org or ''),
-            })
-        return rows
+            if isinstance(g, dict):
+                yield [g.get(column) for column in columns]
+            else:
+                yield [getattr(g, column, None) for column in columns]
     
-    def export_guests_to_csv(self, guests: List[Dict[str, Any]], filename: str = None) -> str:
+    def iter_guests_csv(
+        self,
+        guests: Iterable[Any],
+        columns: Optional[List[str]] = None,
+        header: bool = False,
+        chunk_rows: int = 500
+    ) -> Iterator[bytes]:
         """
-        Xuất danh sách khách mời ra file CSV
+        Sinh nội dung CSV theo từng khối để stream thẳng về client,
+        không tạo file tạm và không giữ toàn bộ danh sách trong bộ nhớ
         """
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"guests_export_{timestamp}.csv"
+        columns = columns or list(DEFAULT_EXPORT_COLUMNS)
+        buffer = StringIO()
+        # Phân cách bằng '|', mặc định không header
+        writer = csv.writer(buffer, delimiter='|', lineterminator='\n')
+        
+        # BOM để Excel nhận đúng UTF-8 (giống utf-8-sig trước đây)
+        yield '\ufeff'.encode('utf-8')
+        
+        if header:
+            writer.writerow([EXPORT_COLUMNS[c] for c in columns])
+        
+        pending = 0
+        for row in self._iter_guest_rows(guests, columns):
+            writer.writerow(['' if value is None else value for value in row])
+            pending += 1
+            if pending >= chunk_rows:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+        
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    
+    def write_guests_excel(
+        self,
+        guests: Iterable[Any],
+        target,
+        columns: Optional[List[str]] = None,
+        header: bool = False
+    ) -> None:
+        """
+        Ghi danh sách khách mời ra Excel bằng chế độ write-only của openpyxl.
+        Các dòng được ghi lần lượt nên bộ nhớ không tăng theo số khách mời.
+        """
+        columns = columns or list(DEFAULT_EXPORT_COLUMNS)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Guests')
+        
+        if header:
+            sheet.append([EXPORT_COLUMNS[c] for c in columns])
         
-        # Tạo thư mục exports nếu chưa có
-        export_dir = "exports"
-        if not os.path.exists(export_dir):
-            os.makedirs(export_dir)
+        for row in self._iter_guest_rows(guests, columns):
+            sheet.append(row)
         
-        file_path = os.path.join(export_dir, filename)
+        workbook.save(target)
+    
+    def iter_guests_excel(
+        self,
+        guests: Iterable[Any],
+        columns: Optional[List[str]] = None,
+        header: bool = False,
+        chunk_size: int = 64 * 1024
+    ) -> Iterator[bytes]:
+        """
+        Tạo file Excel trong file tạm ẩn danh (tự xoá khi đóng) rồi stream theo từng khối
+        """
+        with tempfile.TemporaryFile() as tmp:
+            self.write_guests_excel(guests, tmp, columns=columns, header=header)
+            tmp.seek(0)
+            while True:
+                chunk = tmp.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def _arrow_schema(self):
+        """
+        Schema Arrow cho toàn bộ cột khách mời
+        """
+        import pyarrow as pa
         
-        # Chỉ xuất 3 cột: id|name|organization, không header, phân cách bằng '|'
-        rows = self._extract_minimal_guest_rows(guests)
-        df = pd.DataFrame(rows, columns=['id', 'name', 'organization'])
-        df.to_csv(file_path, index=False, header=False, sep='|', encoding='utf-8-sig')
+        types = {
+            'int64': pa.int64(),
+            'string': pa.string(),
+            'bool': pa.bool_(),
+            'timestamp': pa.timestamp('us'),
+        }
+        return pa.schema([(name, types[kind]) for name, kind in ARROW_COLUMN_TYPES.items()])
+    
+    def _iter_arrow_batches(self, guests: Iterable[Any], schema, batch_rows: int) -> Iterator[Any]:
+        """
+        Gom khách mời thành các RecordBatch có kiểu dữ liệu đúng
+        """
+        import pyarrow as pa
         
-        return file_path
+        columns = list(ARROW_COLUMN_TYPES)
+        data: Dict[str, List[Any]] = {c: [] for c in columns}
+        count = 0
+        for row in self._iter_guest_rows(guests, columns):
+            for column, value in zip(columns, row):
+                data[column].append(value)
+            count += 1
+            if count >= batch_rows:
+                yield pa.RecordBatch.from_pydict(data, schema=schema)
+                data = {c: [] for c in columns}
+                count = 0
+        
+        if count:
+            yield pa.RecordBatch.from_pydict(data, schema=schema)
     
-    def export_guests_to_excel(self, guests: List[Dict[str, Any]], filename: str = None) -> str:
+    def iter_guests_parquet(self, guests: Iterable[Any], batch_rows: int = 10000) -> Iterator[bytes]:
         """
-        Xuất danh sách khách mời ra file Excel
+        Xuất toàn bộ cột khách mời ra Parquet, mỗi lô là một row group và được stream ngay
         """
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"guests_export_{timestamp}.xlsx"
+        import pyarrow.parquet as pq
         
-        # Tạo thư mục exports nếu chưa có
-        export_dir = "exports"
-        if not os.path.exists(export_dir):
-            os.makedirs(export_dir)
+        schema = self._arrow_schema()
+        sink = ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        try:
+            for batch in self._iter_arrow_batches(guests, schema, batch_rows):
+                writer.write_batch(batch, row_group_size=batch_rows)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        finally:
+            writer.close()
         
-        file_path = os.path.join(export_dir, filename)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    
+    def iter_guests_arrow(self, guests: Iterable[Any], batch_rows: int = 10000) -> Iterator[bytes]:
+        """
+        Xuất toàn bộ cột khách mời ra Arrow IPC (stream format)
+        """
+        import pyarrow as pa
         
-        # Xuất 3 cột: id, name, organization (không header) vào Excel
-        rows = self._extract_minimal_guest_rows(guests)
-        df = pd.DataFrame(rows, columns=['id', 'name', 'organization'])
-        # Dùng engine mặc định (openpyxl) để tránh thiếu dependency trong container
-        df.to_excel(file_path, index=False, header=False, sheet_name='Guests')
+        schema = self._arrow_schema()
+        sink = ChunkSink()
+        writer = pa.ipc.new_stream(sink, schema)
+        try:
+            for batch in self._iter_arrow_batches(guests, schema, batch_rows):
+                writer.write_batch(batch)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        finally:
+            writer.close()
         
-        return file_path
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
     
     def get_import_template(self) -> str:
         """
@@ -0,0 +1,488 @@
+import base64
+import os
+import queue
+import random
+import smtplib
+import socket
+import ssl
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.email_delivery import EmailDelivery
+from ..models.event import Event
+from ..models.guest import Guest
+from .invitation_service import InvitationService, guest_to_dict, event_to_dict
+
+# Cấu hình SMTP
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"  # STARTTLS
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "false").lower() == "true"  # SMTPS (cổng 465)
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USERNAME or "no-reply@localhost")
+SMTP_FROM_NAME = os.getenv("SMTP_FROM_NAME", "Ban tổ chức")
+
+# Số kết nối SMTP gửi song song
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "4"))
+# Giới hạn số email gửi mỗi phút của cả hệ thống (0 = không giới hạn)
+EMAIL_RATE_PER_MINUTE = int(os.getenv("EMAIL_RATE_PER_MINUTE", "600"))
+# Số process cùng gửi email (mỗi worker uvicorn/gunicorn có hàng đợi gửi riêng):
+# giới hạn được chia đều cho từng process
+EMAIL_SENDER_PROCESSES = int(os.getenv("EMAIL_SENDER_PROCESSES", os.getenv("WEB_CONCURRENCY", "1")))
+# Số email tối đa trên một kết nối trước khi mở kết nối mới
+EMAIL_MESSAGES_PER_CONNECTION = int(os.getenv("EMAIL_MESSAGES_PER_CONNECTION", "100"))
+# Số lần thử tối đa và thời gian chờ cơ sở cho backoff (giây, nhân đôi sau mỗi lần lỗi)
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+# Bản ghi "sending" quá thời gian này (process gửi bị dừng giữa chừng) được đưa lại vào hàng đợi
+EMAIL_STALE_SECONDS = int(os.getenv("EMAIL_STALE_SECONDS", "300"))
+
+# Kết nối để rảnh lâu hơn thời gian này được kiểm tra bằng NOOP trước khi dùng lại
+_IDLE_CHECK_SECONDS = 30
+_POLL_SECONDS = 5
+_MIN_WAIT_SECONDS = 0.5
+_MAX_BACKOFF_SECONDS = 3600
+
+
+class RateLimiter:
+    """
+    Giới hạn tốc độ gửi: các lần gửi được giãn đều theo số email mỗi phút, dùng chung giữa các thread
+    của một process (giới hạn của cả hệ thống được chia cho EMAIL_SENDER_PROCESSES)
+    """
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class SMTPConnectionPool:
+    """
+    Pool kết nối SMTP dùng lại giữa các email (tránh bắt tay TLS và đăng nhập cho mỗi email)
+    """
+
+    def __init__(self, size: int = EMAIL_CONCURRENCY):
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+
+    def _connect(self) -> smtplib.SMTP:
+        if SMTP_USE_SSL:
+            smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT,
+                                    context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+            if SMTP_USE_TLS:
+                smtp.starttls(context=ssl.create_default_context())
+        if SMTP_USERNAME:
+            smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return smtp
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _checkout(self) -> list:
+        """
+        Lấy kết nối rảnh còn sống, nếu không có thì mở kết nối mới.
+        Mỗi phần tử là [smtp, số email đã gửi, thời điểm dùng gần nhất]
+        """
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return [self._connect(), 0, time.monotonic()]
+            if time.monotonic() - entry[2] < _IDLE_CHECK_SECONDS:
+                return entry
+            try:
+                if entry[0].noop()[0] == 250:
+                    return entry
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(entry[0])
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        entry = None
+        try:
+            entry = self._checkout()
+            yield entry[0]
+            entry[1] += 1
+        except Exception as e:
+            # Server đã trả lời (địa chỉ bị từ chối, lỗi 4xx/5xx) thì kết nối vẫn dùng được;
+            # các lỗi khác (mất kết nối, timeout) thì bỏ kết nối, lần sau mở kết nối mới
+            if entry is not None and not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                self._close(entry[0])
+                entry = None
+            raise
+        finally:
+            if entry is not None:
+                if entry[1] >= EMAIL_MESSAGES_PER_CONNECTION:
+                    self._close(entry[0])
+                else:
+                    entry[2] = time.monotonic()
+                    self._idle.put(entry)
+            self._slots.release()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(entry[0])
+
+
+class EmailDeliveryService:
+    """
+    Gửi email thiệp mời qua hàng đợi trong bảng email_deliveries.
+    Một thread điều phối lấy các bản ghi đến hạn theo lô, giao cho các thread gửi
+    (dùng chung pool kết nối SMTP và giới hạn tốc độ), rồi ghi kết quả theo lô.
+    """
+
+    def __init__(self, invitation_service: InvitationService = None, session_factory=SessionLocal):
+        self.invitation_service = invitation_service or InvitationService()
+        self.session_factory = session_factory
+        self.pool = SMTPConnectionPool(EMAIL_CONCURRENCY)
+        self.rate_limiter = RateLimiter(EMAIL_RATE_PER_MINUTE / max(EMAIL_SENDER_PROCESSES, 1))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._dispatcher: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._results: List[Dict[str, Any]] = []
+        self._results_lock = threading.Lock()
+
+    def enqueue(self, db: Session, guests: Iterable[Guest], template: str = "elegant",
+                resend: bool = False, retry_failed: bool = False) -> Dict[str, Any]:
+        """
+        Đưa email thiệp mời của các khách mời vào hàng đợi gửi.
+        Khách mời đã gửi thành công chỉ được gửi lại khi resend=True,
+        email đã lỗi hẳn chỉ được thử lại khi retry_failed=True.
+        """
+        guests = list(guests)
+        summary = {"queued": 0, "already_sent": 0, "failed": 0, "no_email": 0}
+
+        existing: Dict[tuple, EmailDelivery] = {}
+        guest_ids = [guest.id for guest in guests]
+        for start in range(0, len(guest_ids), 500):
+            chunk = guest_ids[start:start + 500]
+            for delivery in db.query(EmailDelivery).filter(EmailDelivery.guest_id.in_(chunk)).all():
+                existing[(delivery.guest_id, delivery.event_id)] = delivery
+
+        new_rows = []
+        for guest in guests:
+            if not guest.email:
+                summary["no_email"] += 1
+                continue
+            delivery = existing.get((guest.id, guest.event_id))
+            if delivery is None:
+                new_rows.append({
+                    "guest_id": guest.id,
+                    "event_id": guest.event_id,
+                    "email": guest.email,
+                    "template": template,
+                    "status": "queued",
+                    "attempts": 0
+                })
+            elif delivery.status == "sent" and not resend:
+                summary["already_sent"] += 1
+                continue
+            elif delivery.status == "failed" and not (retry_failed or resend):
+                summary["failed"] += 1
+                continue
+            elif delivery.status != "sending":
+                delivery.email = guest.email
+                delivery.template = template
+                delivery.status = "queued"
+                delivery.attempts = 0
+                delivery.last_error = None
+                delivery.next_attempt_at = None
+            summary["queued"] += 1
+
+        if new_rows:
+            db.bulk_insert_mappings(EmailDelivery, new_rows)
+        db.commit()
+
+        if summary["queued"]:
+            self._notify()
+        return summary
+
+    def resume_pending(self) -> bool:
+        """
+        Gọi khi khởi động: chạy lại thread điều phối nếu còn email chưa gửi
+        """
+        db = self.session_factory()
+        try:
+            pending = db.query(EmailDelivery.id).filter(
+                EmailDelivery.status.in_(("queued", "sending"))
+            ).first()
+        finally:
+            db.close()
+
+        if pending:
+            self._notify()
+        return bool(pending)
+
+    def _notify(self) -> None:
+        """
+        Đánh thức thread điều phối (khởi chạy nếu chưa có)
+        """
+        with self._lock:
+            self._wakeup.set()
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="email-dispatcher", daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        executor = ThreadPoolExecutor(max_workers=max(EMAIL_CONCURRENCY, 1), thread_name_prefix="email-sender")
+        in_flight = set()
+        try:
+            while True:
+                self._wakeup.clear()
+                in_flight = {future for future in in_flight if not future.done()}
+                self._flush_results()
+
+                capacity = EMAIL_CONCURRENCY * 4 - len(in_flight)
+                tasks = self._claim_batch(capacity) if capacity > 0 else []
+                for task in tasks:
+                    future = executor.submit(self._deliver, task)
+                    future.add_done_callback(lambda _: self._wakeup.set())
+                    in_flight.add(future)
+
+                if tasks:
+                    continue
+                if not in_flight:
+                    delay = self._seconds_until_next_due()
+                    if delay is None:
+                        with self._lock:
+                            # Có email mới được thêm trong lúc kiểm tra thì chạy tiếp
+                            if self._wakeup.is_set():
+                                continue
+                            self._dispatcher = None
+                            return
+                    self._wakeup.wait(min(delay, _POLL_SECONDS))
+                else:
+                    self._wakeup.wait(_POLL_SECONDS)
+        except Exception as e:
+            print(f"Error in email dispatcher: {str(e)}")
+            traceback.print_exc()
+            with self._lock:
+                self._dispatcher = None
+        finally:
+            executor.shutdown(wait=True)
+            self._flush_results()
+            self.pool.close_all()
+
+    def _seconds_until_next_due(self) -> Optional[float]:
+        """
+        Số giây chờ trước khi kiểm tra lại hàng đợi; None nếu không còn email nào chưa gửi
+        """
+        db = self.session_factory()
+        try:
+            queued, next_attempt_at = db.query(
+                func.count(EmailDelivery.id), func.min(EmailDelivery.next_attempt_at)
+            ).filter(EmailDelivery.status == "queued").one()
+            sending = db.query(EmailDelivery.id).filter(EmailDelivery.status == "sending").first()
+        finally:
+            db.close()
+
+        if not queued:
+            # Email "sending" của process khác: chờ đến khi hoàn tất hoặc bị coi là bỏ dở
+            return float(_POLL_SECONDS) if sending else None
+        if next_attempt_at is None:
+            return _MIN_WAIT_SECONDS
+        return max((next_attempt_at - datetime.utcnow()).total_seconds(), _MIN_WAIT_SECONDS)
+
+    def _claim_batch(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Nhận các email đến hạn gửi (kể cả email "sending" bị bỏ dở) và chuẩn bị dữ liệu render
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            stale_before = now - timedelta(seconds=EMAIL_STALE_SECONDS)
+            due = db.query(EmailDelivery.id).filter(or_(
+                and_(
+                    EmailDelivery.status == "queued",
+                    or_(EmailDelivery.next_attempt_at.is_(None), EmailDelivery.next_attempt_at <= now)
+                ),
+                and_(EmailDelivery.status == "sending", EmailDelivery.claimed_at < stale_before)
+            )).order_by(EmailDelivery.id).limit(limit).all()
+            if not due:
+                return []
+
+            claim = f"{self.owner}:{uuid.uuid4().hex[:8]}"
+            db.query(EmailDelivery).filter(
+                EmailDelivery.id.in_([delivery_id for (delivery_id,) in due]),
+                or_(
+                    EmailDelivery.status == "queued",
+                    and_(EmailDelivery.status == "sending", EmailDelivery.claimed_at < stale_before)
+                )
+            ).update({
+                "status": "sending",
+                "owner": claim,
+                "claimed_at": now,
+                "attempts": EmailDelivery.attempts + 1
+            }, synchronize_session=False)
+            db.commit()
+
+            deliveries = db.query(EmailDelivery).filter(EmailDelivery.owner == claim).all()
+            guests = {
+                guest.id: guest for guest in
+                db.query(Guest).filter(Guest.id.in_([d.guest_id for d in deliveries])).all()
+            }
+            events = {
+                event.id: event_to_dict(event) for event in
+                db.query(Event).filter(Event.id.in_({d.event_id for d in deliveries})).all()
+            }
+
+            tasks = []
+            for delivery in deliveries:
+                guest = guests.get(delivery.guest_id)
+                event = events.get(delivery.event_id)
+                if guest is None or event is None:
+                    self._add_result(delivery.id, delivery.attempts, error="Không tìm thấy khách mời hoặc sự kiện",
+                                     permanent=True)
+                    continue
+                tasks.append({
+                    "delivery_id": delivery.id,
+                    "attempts": delivery.attempts,
+                    "email": delivery.email,
+                    "template": delivery.template,
+                    "guest": guest_to_dict(guest),
+                    "event": event
+                })
+            return tasks
+        finally:
+            db.close()
+
+    def build_message(self, guest: Dict[str, Any], event: Dict[str, Any], email: str,
+                      template: str = "elegant") -> EmailMessage:
+        """
+        Tạo email thiệp mời: HTML (CSS nhúng, QR code đính kèm dạng ảnh inline) kèm bản text
+        """
+        invitation_data = self.invitation_service.generate_invitation_data(guest, event)
+
+        # Nhiều ứng dụng email chặn ảnh data URI nên QR code được đính kèm và tham chiếu qua cid
+        qr_png = base64.b64decode(invitation_data['qr']['qr_url'].split(',', 1)[1])
+        qr_cid = make_msgid(domain="invitation.local")
+        invitation_data['qr']['qr_url'] = f"cid:{qr_cid[1:-1]}"
+        html_content = self.invitation_service.generate_html_invitation(invitation_data, template, inline_assets=True)
+
+        message = EmailMessage()
+        message['Subject'] = invitation_data['delivery']['email_subject']
+        message['From'] = formataddr((SMTP_FROM_NAME, SMTP_FROM))
+        message['To'] = email
+        message['Message-ID'] = make_msgid(domain=SMTP_FROM.rsplit('@', 1)[-1] or None)
+        message.set_content(
+            f"Kính gửi {guest.get('title') or ''} {guest['name']},\n\n"
+            f"Trân trọng kính mời Quý khách tham dự {event['name']}.\n"
+            f"Mã thiệp mời: {invitation_data['meta']['invitation_id']}\n"
+        )
+        message.add_alternative(html_content, subtype='html')
+        message.get_payload()[1].add_related(qr_png, 'image', 'png', cid=qr_cid, filename="qr.png")
+        return message
+
+    def _deliver(self, task: Dict[str, Any]) -> None:
+        """
+        Gửi một email (chạy trong thread gửi)
+        """
+        try:
+            message = self.build_message(task['guest'], task['event'], task['email'], task['template'])
+            self.rate_limiter.acquire()
+            with self.pool.connection() as smtp:
+                smtp.send_message(message)
+            self._add_result(task['delivery_id'], task['attempts'], message_id=message['Message-ID'])
+        except Exception as e:
+            # Lỗi 5xx (địa chỉ bị từ chối, nội dung bị chặn) không gửi lại được
+            if isinstance(e, smtplib.SMTPRecipientsRefused):
+                permanent = all(code >= 500 for code, _ in e.recipients.values())
+            else:
+                permanent = (
+                    isinstance(e, smtplib.SMTPResponseException) and 500 <= e.smtp_code < 600
+                    and not isinstance(e, smtplib.SMTPAuthenticationError)
+                )
+            print(f"Error sending invitation email to {task['email']}: {str(e)}")
+            self._add_result(task['delivery_id'], task['attempts'], error=str(e), permanent=permanent)
+
+    def _add_result(self, delivery_id: int, attempts: int, message_id: str = None, error: str = None,
+                    permanent: bool = False) -> None:
+        now = datetime.utcnow()
+        if error is None:
+            result = {"id": delivery_id, "status": "sent", "message_id": message_id, "sent_at": now,
+                      "last_error": None, "next_attempt_at": None}
+        elif permanent or attempts >= EMAIL_MAX_ATTEMPTS:
+            result = {"id": delivery_id, "status": "failed", "last_error": error, "next_attempt_at": None}
+        else:
+            # Backoff lũy thừa kèm jitter để các email lỗi không thử lại cùng lúc
+            delay = min(EMAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), _MAX_BACKOFF_SECONDS)
+            delay += random.uniform(0, EMAIL_RETRY_BASE_SECONDS)
+            result = {"id": delivery_id, "status": "queued", "last_error": error,
+                      "next_attempt_at": now + timedelta(seconds=delay)}
+        result["owner"] = None
+        with self._results_lock:
+            self._results.append(result)
+
+    def _flush_results(self) -> None:
+        """
+        Ghi kết quả gửi theo lô (một commit cho nhiều email)
+        """
+        with self._results_lock:
+            results, self._results = self._results, []
+        if not results:
+            return
+        db = self.session_factory()
+        try:
+            db.bulk_update_mappings(EmailDelivery, results)
+            db.commit()
+        finally:
+            db.close()
+
+
+def delivery_to_dict(delivery: EmailDelivery) -> Dict[str, Any]:
+    """
+    Thông tin trạng thái gửi email trả về cho client
+    """
+    return {
+        "id": delivery.id,
+        "guest_id": delivery.guest_id,
+        "event_id": delivery.event_id,
+        "email": delivery.email,
+        "template": delivery.template,
+        "status": delivery.status,
+        "attempts": delivery.attempts,
+        "last_error": delivery.last_error,
+        "next_attempt_at": delivery.next_attempt_at,
+        "sent_at": delivery.sent_at,
+        "updated_at": delivery.updated_at
+    }
+
+
+email_delivery_service = EmailDeliveryService()
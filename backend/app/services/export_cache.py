@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+class ExportCache:
+    """
+    Cache file export trên đĩa, khoá theo (sự kiện, định dạng, cột, phiên bản dữ liệu).
+    File được phục vụ lại trực tiếp khi phiên bản chưa đổi; thư mục được dọn theo LRU
+    khi vượt quá dung lượng hoặc số file cho phép.
+    """
+    
+    def __init__(
+        self,
+        cache_dir: str = None,
+        max_bytes: int = None,
+        max_files: int = None
+    ):
+        self.cache_dir = cache_dir or os.getenv("EXPORT_CACHE_DIR", "exports")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("EXPORT_CACHE_MAX_MB", "200")) * 1024 * 1024
+        self.max_files = max_files if max_files is not None else int(os.getenv("EXPORT_CACHE_MAX_FILES", "200"))
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def make_key(
+        self,
+        event_id: Optional[int],
+        fmt: str,
+        columns: Optional[List[str]],
+        version: int,
+        **options
+    ) -> str:
+        """
+        Tạo khoá cache ổn định từ các tham số export
+        """
+        parts = [
+            f"event={event_id or 'all'}",
+            f"format={fmt}",
+            f"columns={','.join(columns or [])}",
+            f"version={version}",
+        ]
+        parts.extend(f"{name}={options[name]}" for name in sorted(options))
+        digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:20]
+        return f"{fmt}_{event_id or 'all'}_v{version}_{digest}"
+    
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+    
+    def get(self, key: str, ext: str) -> Optional[str]:
+        """
+        Trả về đường dẫn file nếu đã có trong cache (đồng thời đánh dấu vừa dùng)
+        """
+        path = self._path(key, ext)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+    
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+    
+    def _release(self, key: str, lock: threading.Lock) -> None:
+        with self._locks_guard:
+            self._locks.pop(key, None)
+        lock.release()
+    
+    def _iter_file(self, path: str, chunk_size: int) -> Iterator[bytes]:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def _iter_tee(self, key: str, ext: str, produce: Callable[[], Iterable[bytes]]) -> Iterator[bytes]:
+        """
+        Stream nội dung mới cho client đồng thời ghi vào file tạm; file chỉ được đưa vào cache
+        khi stream chạy hết. Lỗi hoặc client ngắt giữa chừng thì bỏ file tạm.
+        """
+        final_path = self._path(key, ext)
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, 'wb') as tmp:
+                for chunk in produce():
+                    tmp.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def iter_cached(self, key: str, ext: str, produce: Callable[[], Iterable[bytes]],
+                    chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Stream nội dung export: lấy từ cache nếu có, nếu không thì stream nội dung mới ngay
+        (không chờ tạo xong file) và ghi song song vào cache.
+        Chỉ một request ghi cache cho mỗi khoá; các request trùng khoá trong lúc đó stream thẳng, không chờ.
+        """
+        path = self.get(key, ext)
+        if path:
+            try:
+                yield from self._iter_file(path, chunk_size)
+                return
+            except FileNotFoundError:
+                pass
+        
+        lock = self._lock_for(key)
+        if not lock.acquire(blocking=False):
+            yield from produce()
+            return
+        try:
+            path = self.get(key, ext)
+            if path:
+                try:
+                    yield from self._iter_file(path, chunk_size)
+                    return
+                except FileNotFoundError:
+                    pass
+            yield from self._iter_tee(key, ext, produce)
+        finally:
+            self._release(key, lock)
+        self.evict()
+    
+    def evict(self) -> None:
+        """
+        Xoá các file ít được dùng gần đây nhất khi vượt giới hạn dung lượng/số file
+        """
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith('.'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (total_bytes > self.max_bytes or len(entries) > self.max_files):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
@@ -0,0 +1,491 @@
+import json
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal, get_sqlite_writer
+from ..models.event import Event
+from ..models.guest import Guest
+from ..models.invitation_job import InvitationJob, InvitationJobItem
+from .invitation_service import InvitationService, guest_to_dict, event_to_dict
+from .pdf_service import PDFExportService
+
+# Số khách mời xử lý giữa hai lần lưu checkpoint
+JOB_BATCH_SIZE = int(os.getenv("INVITATION_JOB_BATCH_SIZE", "500"))
+# Job không cập nhật heartbeat quá thời gian này được coi là bị bỏ dở và có thể tiếp tục
+JOB_STALE_SECONDS = int(os.getenv("INVITATION_JOB_STALE_SECONDS", "120"))
+# Chu kỳ cập nhật heartbeat khi job đang chạy (kể cả giữa hai checkpoint)
+JOB_HEARTBEAT_SECONDS = int(os.getenv("INVITATION_JOB_HEARTBEAT_SECONDS", str(max(JOB_STALE_SECONDS // 4, 1))))
+
+ACTIVE_STATUSES = ("queued", "running")
+# Trạng thái có thể tiếp tục bằng resume
+RESUMABLE_STATUSES = ("queued", "running", "failed", "cancelled")
+
+
+class JobOwnershipLost(Exception):
+    """
+    Process khác đã nhận job (heartbeat của process này bị coi là hết hạn): dừng, không ghi gì thêm
+    """
+
+
+def _write_owned_job(connection, job_id: str, owner: str, values: Dict[str, Any],
+                     items: List[Dict[str, Any]]) -> None:
+    """
+    Ghi kết quả của lô và trạng thái job trong một transaction, chỉ khi owner vẫn giữ job
+    (raise JobOwnershipLost để huỷ cả transaction)
+    """
+    if items:
+        connection.execute(InvitationJobItem.__table__.insert(), items)
+    jobs = InvitationJob.__table__
+    updated = connection.execute(
+        jobs.update().where(jobs.c.id == job_id, jobs.c.owner == owner).values(**values)
+    ).rowcount
+    if not updated:
+        raise JobOwnershipLost(job_id)
+
+
+def _write_heartbeat(connection, job_id: str, owner: str) -> int:
+    jobs = InvitationJob.__table__
+    return connection.execute(
+        jobs.update().where(jobs.c.id == job_id, jobs.c.owner == owner).values(heartbeat_at=datetime.utcnow())
+    ).rowcount
+
+
+class InvitationJobRunner:
+    """
+    Chạy job tạo thiệp mời trong thread nền.
+    Tiến độ được lưu vào bảng invitation_jobs sau mỗi lô, nên khi server khởi động lại
+    job tiếp tục từ guest id cuối cùng đã xử lý.
+    """
+
+    def __init__(self, invitation_service: InvitationService = None, session_factory=SessionLocal,
+                 pdf_service: PDFExportService = None):
+        self.invitation_service = invitation_service or InvitationService()
+        self.pdf_service = pdf_service or PDFExportService()
+        self.session_factory = session_factory
+        # Duy nhất cho mỗi lần chạy process (pid có thể lặp lại sau khi container khởi động lại)
+        self.owner = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._recheck_timer: Optional[threading.Timer] = None
+
+    def create_job(self, db: Session, event_id: Optional[int], template: str, kind: str = "generate_all",
+                   force: bool = False, options: Optional[Dict[str, Any]] = None) -> InvitationJob:
+        """
+        Tạo job mới và khởi chạy ngay
+        """
+        query = db.query(Guest)
+        if event_id:
+            query = query.filter(Guest.event_id == event_id)
+
+        job = InvitationJob(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            event_id=event_id,
+            template=template or "elegant",
+            force=force,
+            options=json.dumps(options) if options else None,
+            status="queued",
+            total=query.count(),
+            processed=0,
+            last_guest_id=0,
+            rendered=0,
+            skipped=0,
+            failed=0,
+            removed=0,
+            cancel_requested=False,
+            owner=self.owner,
+            heartbeat_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self._start_thread(job.id)
+        return job
+
+    def run_bulk(self, db: Session, guests: List[Dict[str, Any]], event: Dict[str, Any], template: str,
+                 force: bool = False) -> InvitationJob:
+        """
+        Tạo thiệp mời cho danh sách khách mời được chọn ngay trong request,
+        lưu lại như một job để client xem kết quả theo trang
+        """
+        job = InvitationJob(
+            id=str(uuid.uuid4()),
+            kind="generate_bulk",
+            event_id=event['id'],
+            template=template or "elegant",
+            force=force,
+            status="running",
+            total=len(guests),
+            processed=0,
+            last_guest_id=0,
+            rendered=0,
+            skipped=0,
+            failed=0,
+            removed=0,
+            cancel_requested=False,
+            owner=self.owner,
+            heartbeat_at=datetime.utcnow(),
+            started_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+
+        result = self.invitation_service.regenerate_invitations(guests, event, job.template, force=force)
+        self._update_owned(
+            db, job,
+            items=self._item_rows(job.id, result["rendered"], result["skipped"]),
+            processed=len(guests),
+            last_guest_id=max((g['id'] for g in guests), default=0),
+            rendered=len(result["rendered"]),
+            skipped=len(result["skipped"]),
+            status="completed",
+            finished_at=datetime.utcnow(),
+            owner=None
+        )
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def _item_rows(job_id: str, rendered: List[Dict[str, Any]] = (), skipped: List[int] = (),
+                   removed: List[Dict[str, Any]] = (), failed: List[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+        """
+        Kết quả theo từng khách mời của job (ghi cùng checkpoint)
+        """
+        def row(guest_id, filename, status, error=None):
+            return {"job_id": job_id, "guest_id": guest_id, "filename": filename, "status": status, "error": error}
+
+        rows = [row(r['guest_id'], r['filename'], "rendered") for r in rendered]
+        rows.extend(row(guest_id, f"invite_INV{guest_id:06d}.html", "skipped") for guest_id in skipped)
+        rows.extend(row(r['guest_id'], r['filename'], "removed") for r in removed)
+        rows.extend(row(r['guest_id'], r['filename'], "failed", r['error']) for r in failed)
+        return rows
+
+    def request_cancel(self, db: Session, job: InvitationJob) -> InvitationJob:
+        """
+        Đánh dấu huỷ; job dừng ở checkpoint kế tiếp
+        """
+        if job.status in ACTIVE_STATUSES:
+            job.cancel_requested = True
+            db.commit()
+            db.refresh(job)
+        return job
+
+    def resume(self, db: Session, job: InvitationJob) -> bool:
+        """
+        Tiếp tục một job đã dừng (huỷ, lỗi hoặc bị bỏ dở) từ checkpoint.
+        Trả về False nếu job đang được một process khác (hoặc thread khác) chạy.
+        """
+        if job.status == "completed":
+            return False
+        return self._claim_and_start(job.id, RESUMABLE_STATUSES, reset=True)
+
+    def resume_pending(self) -> List[str]:
+        """
+        Gọi khi khởi động: tiếp tục các job còn dang dở mà không process nào đang giữ.
+        Job còn heartbeat của process khác được kiểm tra lại sau JOB_STALE_SECONDS.
+        """
+        db = self.session_factory()
+        try:
+            job_ids = [
+                job_id for (job_id,) in db.query(InvitationJob.id)
+                .filter(InvitationJob.status.in_(ACTIVE_STATUSES))
+                .all()
+            ]
+        finally:
+            db.close()
+
+        claimed = [job_id for job_id in job_ids if self._claim_and_start(job_id)]
+        if len(claimed) < len(job_ids):
+            self._schedule_recheck()
+        return claimed
+
+    def _schedule_recheck(self) -> None:
+        with self._lock:
+            if self._recheck_timer is not None:
+                return
+            self._recheck_timer = threading.Timer(JOB_STALE_SECONDS, self._recheck)
+            self._recheck_timer.daemon = True
+            self._recheck_timer.start()
+
+    def _recheck(self) -> None:
+        with self._lock:
+            self._recheck_timer = None
+        self.resume_pending()
+
+    def _claim_and_start(self, job_id: str, statuses=ACTIVE_STATUSES, reset: bool = False) -> bool:
+        """
+        Nhận quyền chạy job bằng một câu UPDATE có điều kiện: chỉ khi chưa có chủ
+        hoặc chủ cũ đã mất heartbeat. reset=True đưa job về hàng đợi (resume).
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=JOB_STALE_SECONDS)
+        values = {"owner": self.owner, "heartbeat_at": now}
+        if reset:
+            values.update(status="queued", cancel_requested=False, error=None, finished_at=None)
+
+        db = self.session_factory()
+        try:
+            claimed = db.query(InvitationJob).filter(
+                InvitationJob.id == job_id,
+                InvitationJob.status.in_(statuses),
+                or_(
+                    InvitationJob.owner.is_(None),
+                    InvitationJob.heartbeat_at.is_(None),
+                    InvitationJob.heartbeat_at < stale_before
+                )
+            ).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        if claimed:
+            self._start_thread(job_id)
+        return bool(claimed)
+
+    def _write(self, db: Session, fn, *args) -> Any:
+        """
+        Chạy thao tác ghi fn(connection, *args) rồi commit: qua writer SQLite nếu bật SQLITE_WRITER
+        (không tranh khoá ghi với check-in/RSVP), nếu không thì trên connection của session
+        """
+        writer = get_sqlite_writer()
+        if writer is None:
+            try:
+                result = fn(db.connection(), *args)
+            except Exception:
+                db.rollback()
+                raise
+            db.commit()
+            return result
+        # Kết thúc transaction đọc của session để lần đọc sau thấy dữ liệu vừa ghi
+        db.commit()
+        result = writer.submit(fn, *args).result()
+        db.expire_all()
+        return result
+
+    def _update_owned(self, db: Session, job: InvitationJob, items: List[Dict[str, Any]] = (), **values) -> None:
+        """
+        Ghi kết quả của lô (items) và trạng thái job (kèm heartbeat), chỉ khi process này vẫn giữ job.
+        Nếu không, huỷ cả transaction (kể cả kết quả của lô) và dừng job.
+        """
+        values.setdefault("heartbeat_at", datetime.utcnow())
+        self._write(db, _write_owned_job, job.id, self.owner, values, list(items))
+
+    def _heartbeat_loop(self, job_id: str, stop: threading.Event) -> None:
+        """
+        Cập nhật heartbeat định kỳ trong lúc job chạy, để lô dài (PDF) không bị coi là bỏ dở
+        """
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            db = self.session_factory()
+            try:
+                updated = self._write(db, _write_heartbeat, job_id, self.owner)
+            except Exception as e:
+                print(f"Error updating heartbeat of invitation job {job_id}: {str(e)}")
+                continue
+            finally:
+                db.close()
+            if not updated:
+                # Mất quyền giữ job: checkpoint kế tiếp sẽ dừng job
+                return
+
+    def _start_thread(self, job_id: str) -> None:
+        with self._lock:
+            thread = self._threads.get(job_id)
+            if thread and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._run, args=(job_id,), name=f"invitation-job-{job_id[:8]}", daemon=True)
+            self._threads[job_id] = thread
+            thread.start()
+
+    def _run(self, job_id: str) -> None:
+        db = self.session_factory()
+        stop_heartbeat = threading.Event()
+        try:
+            job = db.query(InvitationJob).filter(InvitationJob.id == job_id).first()
+            if not job or job.status not in ACTIVE_STATUSES or job.owner != self.owner:
+                return
+
+            self._update_owned(db, job, status="running", started_at=job.started_at or datetime.utcnow())
+            threading.Thread(
+                target=self._heartbeat_loop, args=(job_id, stop_heartbeat),
+                name=f"invitation-job-heartbeat-{job_id[:8]}", daemon=True
+            ).start()
+
+            run = self._run_pdf_export if job.kind == "pdf_export" else self._run_generate
+            if not run(db, job):
+                return
+
+            # Có thiệp mời lỗi: job đã chạy hết nhưng kết quả chưa đầy đủ
+            status = "partial" if job.failed else "completed"
+            self._update_owned(db, job, status=status, finished_at=datetime.utcnow(), owner=None)
+        except JobOwnershipLost:
+            print(f"Invitation job {job_id} was taken over by another process, stopping")
+        except Exception as e:
+            print(f"Error in invitation job {job_id}: {str(e)}")
+            traceback.print_exc()
+            db.rollback()
+            try:
+                self._update_owned(db, job, status="failed", error=str(e), finished_at=datetime.utcnow(), owner=None)
+            except JobOwnershipLost:
+                pass
+        finally:
+            stop_heartbeat.set()
+            db.close()
+            with self._lock:
+                self._threads.pop(job_id, None)
+
+    def _next_batch(self, db: Session, job: InvitationJob) -> Optional[List[Guest]]:
+        """
+        Lô khách mời kế tiếp sau checkpoint; None nếu job bị yêu cầu huỷ (đã đánh dấu cancelled)
+        """
+        db.refresh(job)
+        if job.cancel_requested:
+            self._update_owned(db, job, status="cancelled", finished_at=datetime.utcnow(), owner=None)
+            return None
+
+        query = db.query(Guest).filter(Guest.id > (job.last_guest_id or 0))
+        if job.event_id:
+            query = query.filter(Guest.event_id == job.event_id)
+        return query.order_by(Guest.id).limit(JOB_BATCH_SIZE).all()
+
+    def _regenerate_batch(self, db: Session, job: InvitationJob, guests: List[Guest],
+                          events: Dict[int, Optional[Dict[str, Any]]], force: bool = False) -> Dict[str, Any]:
+        """
+        Tạo lại (nếu dữ liệu đổi) thiệp mời HTML cho một lô khách mời, gom theo sự kiện
+        để mỗi khách mời dùng đúng thông tin sự kiện của mình
+        """
+        by_event: Dict[int, List[Dict[str, Any]]] = {}
+        for guest in guests:
+            by_event.setdefault(guest.event_id, []).append(guest_to_dict(guest))
+
+        rendered, skipped, guest_ids = [], [], []
+        for event_id, guest_dicts in by_event.items():
+            if event_id not in events:
+                event = db.query(Event).filter(Event.id == event_id).first()
+                events[event_id] = event_to_dict(event) if event else None
+            if events[event_id] is None:
+                continue
+            # Chỉ render khách mời có hash nội dung thay đổi
+            result = self.invitation_service.regenerate_invitations(
+                guest_dicts, events[event_id], job.template, force=force
+            )
+            rendered.extend(result["rendered"])
+            skipped.extend(result["skipped"])
+            guest_ids.extend(guest['id'] for guest in guest_dicts)
+        # guest_ids: khách mời đã có thiệp mời HTML mới nhất sau lô này
+        return {"rendered": rendered, "skipped": skipped, "guest_ids": guest_ids}
+
+    def _checkpoint(self, db: Session, job: InvitationJob, guests: List[Guest],
+                    rendered: int = 0, skipped: int = 0, failed: int = 0,
+                    items: List[Dict[str, Any]] = ()) -> None:
+        """
+        Lưu guest id cuối cùng đã xử lý cùng kết quả của lô (chỉ khi process này vẫn giữ job)
+        """
+        self._update_owned(
+            db, job,
+            items=items,
+            last_guest_id=guests[-1].id,
+            processed=(job.processed or 0) + len(guests),
+            rendered=(job.rendered or 0) + rendered,
+            skipped=(job.skipped or 0) + skipped,
+            failed=(job.failed or 0) + failed
+        )
+
+    def _run_generate(self, db: Session, job: InvitationJob) -> bool:
+        events: Dict[int, Optional[Dict[str, Any]]] = {}
+        while True:
+            guests = self._next_batch(db, job)
+            if guests is None:
+                return False
+            if not guests:
+                break
+
+            result = self._regenerate_batch(db, job, guests, events, force=job.force)
+            self._checkpoint(db, job, guests, len(result["rendered"]), len(result["skipped"]),
+                             items=self._item_rows(job.id, result["rendered"], result["skipped"]))
+
+        # Xoá thiệp mời của khách mời đã bị xoá
+        guest_ids = db.query(Guest.id)
+        if job.event_id:
+            guest_ids = guest_ids.filter(Guest.event_id == job.event_id)
+        removed = self.invitation_service.prune_invitations(
+            [guest_id for (guest_id,) in guest_ids.all()], job.event_id
+        )
+        self._update_owned(db, job, items=self._item_rows(job.id, removed=removed), removed=len(removed))
+        return True
+
+    def _run_pdf_export(self, db: Session, job: InvitationJob) -> bool:
+        """
+        Xuất PDF: đảm bảo thiệp mời HTML mới nhất, render PDF song song theo lô,
+        cuối cùng ghép file in N-up nếu được yêu cầu
+        """
+        options = json.loads(job.options or "{}")
+        events: Dict[int, Optional[Dict[str, Any]]] = {}
+        while True:
+            guests = self._next_batch(db, job)
+            if guests is None:
+                return False
+            if not guests:
+                break
+
+            result = self._regenerate_batch(db, job, guests, events)
+            items = [
+                (guest_id, os.path.join(self.invitation_service.templates_dir, f"invite_INV{guest_id:06d}.html"))
+                for guest_id in result["guest_ids"]
+            ]
+            rendered, failed = [], []
+            for pdf in self.pdf_service.render_pdfs(job.id, items):
+                if pdf.get("error"):
+                    print(f"Error rendering PDF for guest {pdf['guest_id']}: {pdf['error']}")
+                    failed.append(pdf)
+                else:
+                    rendered.append(pdf)
+            self._checkpoint(db, job, guests, len(rendered), failed=len(failed),
+                             items=self._item_rows(job.id, rendered, failed=failed))
+
+        if options.get("merged"):
+            filenames = [
+                filename for (filename,) in db.query(InvitationJobItem.filename)
+                .filter(InvitationJobItem.job_id == job.id, InvitationJobItem.status == "rendered")
+                .order_by(InvitationJobItem.guest_id)
+                .all()
+            ]
+            self.pdf_service.build_print_file(job.id, filenames, options.get("per_sheet", 1))
+        return True
+
+def job_to_dict(job: InvitationJob) -> Dict[str, Any]:
+    """
+    Thông tin trạng thái job trả về cho client
+    """
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "event_id": job.event_id,
+        "template": job.template,
+        "options": json.loads(job.options) if job.options else None,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "progress": round(job.processed / job.total * 100, 2) if job.total else 0,
+        "last_guest_id": job.last_guest_id,
+        "rendered": job.rendered,
+        "skipped": job.skipped,
+        "failed": job.failed,
+        "removed": job.removed,
+        "cancel_requested": job.cancel_requested,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+
+job_runner = InvitationJobRunner()
@@ -1,21 +1,306 @@
+import hashlib
+import json
 import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Any
-from jinja2 import Template, Environment
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template
 import qrcode
 from io import BytesIO
 import base64
+from ..database import SessionLocal
+from ..models.invitation import Invitation
+from ..utils.cache import LRUCache
+from ..utils.compression import minify_html, write_compressed_variants, remove_compressed_variants
+from ..utils.helpers import process_pool_context
+
+# Thư mục chứa các mẫu thiệp mời (elegant, modern, classic, festive)
+TEMPLATE_SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "invitation_templates")
+TEMPLATE_TYPES = ("elegant", "modern", "classic", "festive")
+DEFAULT_TEMPLATE = "elegant"
+
+# Nhận diện thương hiệu mặc định trên thiệp mời
+DEFAULT_BRANDING = {
+    "logo_url": "/static/logo.png",
+    "primary_color": "#0B2A4A",
+    "accent_color": "#1E88E5"
+}
+
+# File manifest cũ (trước khi dùng bảng invitations), chỉ còn dùng để chuyển dữ liệu
+MANIFEST_FILENAME = ".manifest.json"
+
+# Stylesheet của template được phục vụ tại đường dẫn có fingerprint (cache lâu dài ở trình duyệt/CDN)
+INVITATION_ASSET_PATH = "/assets/invitations"
+# Để trống: cùng origin với backend; có thể trỏ tới CDN, ví dụ https://cdn.example.com
+INVITATION_ASSET_BASE_URL = os.getenv("INVITATION_ASSET_BASE_URL", "").rstrip('/')
+
+def format_datetime(value):
+    if not value:
+        return ""
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return dt.strftime("%d/%m/%Y lúc %H:%M")
+    except:
+        return str(value)
+
+def format_date(value):
+    if not value:
+        return ""
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return dt.strftime("%d/%m/%Y")
+    except:
+        return str(value)
+
+_file_fingerprints: Dict[str, tuple] = {}
+
+def _read_with_fingerprint(path: str) -> tuple:
+    """
+    Đọc file kèm hash sha256 nội dung (chỉ đọc lại khi mtime đổi)
+    """
+    mtime = os.path.getmtime(path)
+    cached = _file_fingerprints.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    _file_fingerprints[path] = (mtime, content, digest)
+    return content, digest
+
+def template_fingerprint(template_type: str) -> str:
+    """
+    Hash nội dung file template
+    """
+    if template_type not in TEMPLATE_TYPES:
+        template_type = DEFAULT_TEMPLATE
+    return _read_with_fingerprint(os.path.join(TEMPLATE_SOURCE_DIR, f"{template_type}.html"))[1]
+
+def get_template_stylesheet(template_type: str) -> tuple:
+    """
+    Nội dung CSS của template và fingerprint (12 ký tự đầu của hash)
+    """
+    if template_type not in TEMPLATE_TYPES:
+        template_type = DEFAULT_TEMPLATE
+    content, digest = _read_with_fingerprint(os.path.join(TEMPLATE_SOURCE_DIR, f"{template_type}.css"))
+    return content, digest[:12]
+
+def invitation_asset_url(template_type: str) -> str:
+    """
+    URL stylesheet của template, đổi theo nội dung nên trình duyệt có thể cache vĩnh viễn
+    """
+    if template_type not in TEMPLATE_TYPES:
+        template_type = DEFAULT_TEMPLATE
+    fingerprint = get_template_stylesheet(template_type)[1]
+    return f"{INVITATION_ASSET_BASE_URL}{INVITATION_ASSET_PATH}/{template_type}.{fingerprint}.css"
+
+def _create_template_environment() -> Environment:
+    """
+    Tạo Jinja Environment dùng chung cho cả process.
+    Template được biên dịch một lần, bytecode lưu trên đĩa và chỉ nạp lại khi file đổi mtime.
+    """
+    cache_dir = os.getenv("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "invitation_jinja_cache"))
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_SOURCE_DIR),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir),
+        auto_reload=True
+    )
+    env.filters['format_datetime'] = format_datetime
+    env.filters['format_date'] = format_date
+    env.globals['invitation_asset_url'] = invitation_asset_url
+    return env
+
+template_env = _create_template_environment()
+
+def get_invitation_template(template_type: str = DEFAULT_TEMPLATE) -> Template:
+    """
+    Lấy template đã biên dịch theo loại (mặc định elegant nếu không hợp lệ)
+    """
+    if template_type not in TEMPLATE_TYPES:
+        template_type = DEFAULT_TEMPLATE
+    return template_env.get_template(f"{template_type}.html")
+
+def compute_invitation_hash(
+    guest: Dict[str, Any],
+    event: Dict[str, Any],
+    template_type: str = DEFAULT_TEMPLATE,
+    branding: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Hash các dữ liệu đầu vào của một thiệp mời: khách mời, sự kiện, template và branding.
+    Hash không đổi nghĩa là file thiệp mời đã tạo vẫn còn đúng.
+    """
+    payload = {
+        "guest": guest,
+        "event": event,
+        "template": template_type if template_type in TEMPLATE_TYPES else DEFAULT_TEMPLATE,
+        "template_source": template_fingerprint(template_type),
+        # HTML chứa URL stylesheet nên CSS hoặc base URL đổi thì thiệp mời cũng phải tạo lại
+        "stylesheet": invitation_asset_url(template_type),
+        "branding": branding or DEFAULT_BRANDING,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+
+class InvitationIndex:
+    """
+    Chỉ mục thiệp mời đã tạo trong bảng invitations: guest, sự kiện, template, hash, kích thước
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def get_hashes(self, guest_ids: Iterable[int]) -> Dict[int, tuple]:
+        """
+        guest_id -> (filename, content_hash) của các thiệp mời đã tạo
+        """
+        guest_ids = list(guest_ids)
+        hashes = {}
+        db = self.session_factory()
+        try:
+            for start in range(0, len(guest_ids), 500):
+                rows = db.query(Invitation.guest_id, Invitation.filename, Invitation.content_hash).filter(
+                    Invitation.guest_id.in_(guest_ids[start:start + 500])
+                ).all()
+                hashes.update({guest_id: (filename, content_hash) for guest_id, filename, content_hash in rows})
+        finally:
+            db.close()
+        return hashes
+
+    def upsert(self, results: Iterable[Dict[str, Any]]) -> None:
+        """
+        Ghi (hoặc cập nhật) các thiệp mời vừa tạo
+        """
+        results = {r['filename']: r for r in results}
+        if not results:
+            return
+        db = self.session_factory()
+        try:
+            existing = {
+                invitation.filename: invitation for invitation in
+                db.query(Invitation).filter(Invitation.filename.in_(list(results))).all()
+            }
+            for filename, result in results.items():
+                invitation = existing.get(filename)
+                if invitation is None:
+                    invitation = Invitation(filename=filename)
+                    db.add(invitation)
+                invitation.guest_id = result['guest_id']
+                invitation.event_id = result['event_id']
+                invitation.template = result['template']
+                invitation.content_hash = result['content_hash']
+                invitation.file_path = result['file_path']
+                invitation.size = result.get('size', 0)
+                invitation.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    def remove(self, filenames: Iterable[str]) -> None:
+        filenames = list(filenames)
+        if not filenames:
+            return
+        db = self.session_factory()
+        try:
+            for start in range(0, len(filenames), 500):
+                db.query(Invitation).filter(
+                    Invitation.filename.in_(filenames[start:start + 500])
+                ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def find_orphans(self, valid_guest_ids: Iterable[int], event_id: Optional[int] = None) -> List[tuple]:
+        """
+        (filename, guest_id) của thiệp mời thuộc khách mời không còn trong danh sách
+        """
+        valid = set(valid_guest_ids)
+        db = self.session_factory()
+        try:
+            query = db.query(Invitation.filename, Invitation.guest_id)
+            if event_id:
+                query = query.filter(Invitation.event_id == event_id)
+            return [(filename, guest_id) for filename, guest_id in query.all() if guest_id not in valid]
+        finally:
+            db.close()
+
+    def import_manifest(self, templates_dir: str) -> int:
+        """
+        Chuyển manifest JSON cũ (nếu còn) vào bảng invitations rồi đổi tên file manifest
+        """
+        path = os.path.join(templates_dir, MANIFEST_FILENAME)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        results = []
+        for filename, entry in manifest.items():
+            filepath = os.path.join(templates_dir, filename)
+            if not os.path.exists(filepath):
+                continue
+            results.append({
+                **entry,
+                "filename": filename,
+                "file_path": filepath,
+                "size": os.path.getsize(filepath)
+            })
+        self.upsert(results)
+        os.replace(path, path + ".imported")
+        return len(results)
+
+def guest_to_dict(guest) -> Dict[str, Any]:
+    """
+    Chuyển khách mời (model) thành dict dùng cho việc tạo thiệp mời
+    """
+    return {
+        'id': guest.id,
+        'title': guest.title,
+        'name': guest.name,
+        'role': guest.role,
+        'organization': guest.organization,
+        'tag': guest.tag,
+        'email': guest.email,
+        'phone': guest.phone
+    }
+
+def event_to_dict(event) -> Dict[str, Any]:
+    """
+    Chuyển sự kiện (model) thành dict dùng cho việc tạo thiệp mời
+    """
+    return {
+        'id': event.id,
+        'name': event.name,
+        'event_date': event.event_date.isoformat() if event.event_date else None,
+        'location': getattr(event, 'location', ''),
+        'address': getattr(event, 'address', ''),
+        'agenda': getattr(event, 'agenda', ''),
+        'description': getattr(event, 'description', '')
+    }
+
+# Context render theo sự kiện (khoá là nội dung sự kiện, nên tự đổi theo phiên bản dữ liệu)
+_event_contexts = LRUCache(maxsize=int(os.getenv("EVENT_CONTEXT_CACHE_SIZE", "256")))
 
 class InvitationService:
     def __init__(self, templates_dir: str = "templates/invitations"):
         self.templates_dir = templates_dir
+        self.index = InvitationIndex()
         os.makedirs(templates_dir, exist_ok=True)
     
-    def generate_invitation_data(self, guest: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_invitation_data(self, guest: Dict[str, Any], event: Dict[str, Any],
+                                 qr_cache: Optional[LRUCache] = None) -> Dict[str, Any]:
         """
         Tạo dữ liệu thiệp mời từ thông tin khách mời và sự kiện
+        (qr_cache: dùng lại ảnh QR đã tạo, ví dụ cho khách mời mẫu khi xem trước)
         """
         invitation_id = f"INV{guest['id']:06d}"
+        context = self.get_event_context(event)
         
         # Tạo QR code
         qr_data = {
@@ -26,7 +311,11 @@ class InvitationService:
             "type": "invitation"
         }
         
-        qr_code = self.generate_qr_code(str(qr_data))
+        qr_payload = str(qr_data)
+        if qr_cache is not None:
+            qr_code = qr_cache.get_or_set(qr_payload, lambda: self.generate_qr_code(qr_payload))
+        else:
+            qr_code = self.generate_qr_code(qr_payload)
         
         invitation_data = {
             "guest": {
@@ -36,23 +325,12 @@ class InvitationService:
                 "organization": guest.get('organization', ''),
                 "tag": guest.get('tag', '')
             },
-            "event": {
-                "title": event['name'],
-                "subtitle": "Lễ kỷ niệm 15 năm thành lập",
-                "host_org": "EXP Technology Company Limited",
-                "datetime": event.get('event_date', event.get('date')),
-                "timezone": "Asia/Ho_Chi_Minh",
-                "venue": {
-                    "name": event.get('location', ''),
-                    "address": event.get('address', ''),
-                    "map_url": f"https://maps.google.com/?q={event.get('location', '')}"
-                },
-                "program_outline": self.parse_program_outline(event.get('agenda', ''))
-            },
+            "event": context['event'],
             "rsvp": {
                 "accept_url": f"https://exp-solution.io/rsvp/accept?id={invitation_id}",
                 "decline_url": f"https://exp-solution.io/rsvp/decline?id={invitation_id}",
-                "deadline": self.calculate_rsvp_deadline(event['event_date'])
+                "deadline": context['rsvp_deadline'],
+                "deadline_display": context['rsvp_deadline_display']
             },
             "qr": {
                 "qr_url": qr_code,
@@ -64,11 +342,7 @@ class InvitationService:
                 "email_to": guest.get('email', ''),
                 "file_name": f"invite_{invitation_id}.html"
             },
-            "branding": {
-                "logo_url": "/static/logo.png",
-                "primary_color": "#0B2A4A",
-                "accent_color": "#1E88E5"
-            },
+            "branding": dict(context['branding']),
             "meta": {
                 "invitation_id": invitation_id,
                 "created_at": datetime.now().isoformat(),
@@ -78,6 +352,38 @@ class InvitationService:
         
         return invitation_data
     
+    def get_event_context(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Phần dữ liệu thiệp mời chỉ phụ thuộc sự kiện (chương trình, hạn RSVP, địa điểm, branding,
+        ngày giờ đã định dạng). Cache theo nội dung sự kiện nên chỉ tính lại khi sự kiện thay đổi
+        và dùng chung cho mọi khách mời; không sửa trực tiếp các dict trong context.
+        """
+        key = json.dumps(event, sort_keys=True, ensure_ascii=False, default=str)
+        return _event_contexts.get_or_set(key, lambda: self._build_event_context(event))
+    
+    def _build_event_context(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        event_datetime = event.get('event_date', event.get('date'))
+        rsvp_deadline = self.calculate_rsvp_deadline(event['event_date'])
+        return {
+            "event": {
+                "title": event['name'],
+                "subtitle": "Lễ kỷ niệm 15 năm thành lập",
+                "host_org": "EXP Technology Company Limited",
+                "datetime": event_datetime,
+                "datetime_display": format_datetime(event_datetime),
+                "timezone": "Asia/Ho_Chi_Minh",
+                "venue": {
+                    "name": event.get('location', ''),
+                    "address": event.get('address', ''),
+                    "map_url": f"https://maps.google.com/?q={event.get('location', '')}"
+                },
+                "program_outline": self.parse_program_outline(event.get('agenda', ''))
+            },
+            "rsvp_deadline": rsvp_deadline,
+            "rsvp_deadline_display": format_date(rsvp_deadline),
+            "branding": dict(DEFAULT_BRANDING)
+        }
+    
     def generate_qr_code(self, data: str) -> str:
         """
         Tạo QR code và trả về base64 string
@@ -153,1396 +459,209 @@ class InvitationService:
         except:
             return "2025-09-30"
     
-    def generate_html_invitation(self, invitation_data: Dict[str, Any], template_type: str = "elegant") -> str:
+    def generate_html_invitation(self, invitation_data: Dict[str, Any], template_type: str = "elegant",
+                                 inline_assets: bool = False) -> str:
         """
-        Tạo HTML thiệp mời từ dữ liệu với template khác nhau
+        Tạo HTML thiệp mời từ dữ liệu với template khác nhau.
+        Mặc định HTML link tới stylesheet dùng chung; inline_assets=True nhúng CSS vào thẻ <style>
+        (dùng cho HTML trả về trong JSON để frontend hiển thị trực tiếp)
         """
-        # Chọn template dựa trên template_type
-        if template_type == "elegant":
-            template_html = self._get_elegant_template()
-        elif template_type == "modern":
-            template_html = self._get_modern_template()
-        elif template_type == "classic":
-            template_html = self._get_classic_template()
-        elif template_type == "festive":
-            template_html = self._get_festive_template()
-        else:
-            template_html = self._get_elegant_template()
-        
-        # Render template với Jinja2
-        env = Environment()
-        
-        # Register custom filters
-        def format_datetime(value):
-            if not value:
-                return ""
-            try:
-                dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                return dt.strftime("%d/%m/%Y lúc %H:%M")
-            except:
-                return str(value)
-        
-        def format_date(value):
-            if not value:
-                return ""
-            try:
-                dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                return dt.strftime("%d/%m/%Y")
-            except:
-                return str(value)
-        
-        env.filters['format_datetime'] = format_datetime
-        env.filters['format_date'] = format_date
-        
-        template = env.from_string(template_html)
-        return template.render(invitation_data=invitation_data)
+        template = get_invitation_template(template_type)
+        invitation_css = None
+        if inline_assets:
+            invitation_css = get_template_stylesheet(template_type)[0].decode('utf-8')
+        return template.render(invitation_data=invitation_data, invitation_css=invitation_css)
     
-    def _get_elegant_template(self) -> str:
+    def save_invitation_html(
+        self,
+        invitation_data: Dict[str, Any],
+        filename: str = None,
+        html_content: str = None,
+        template_type: str = DEFAULT_TEMPLATE
+    ) -> str:
         """
-        Template thanh lịch - Thiết kế sang trọng
+        Lưu thiệp mời HTML vào file (chỉ render lại nếu chưa có html_content).
+        HTML được minify và ghi kèm bản nén sẵn .gz/.br để phục vụ không cần nén lại.
         """
-        return """
-<!DOCTYPE html>
-<html lang="vi">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ invitation_data.event.title }}</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Georgia', 'Times New Roman', serif;
-            background: radial-gradient(1200px 800px at 50% -200px, #1b2454 0%, #150f2e 50%, #0a0a1a 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        
-        .invitation-container {
-            max-width: 600px;
-            margin: 0 auto;
-            background: #ffffff;
-            border-radius: 20px;
-            overflow: hidden;
-            box-shadow: 0 20px 50px rgba(0,0,0,0.4);
-            position: relative;
-            border: 1px solid rgba(212,175,55,0.35); /* gold foil */
-        }
-
-        /* soft vignette and subtle pattern */
-        .invitation-container::before {
-            content: '';
-            position: absolute;
-            inset: 0;
-            background: radial-gradient(120% 80% at 50% -20%, rgba(255,255,255,0.08) 0%, rgba(255,255,255,0) 50%),
-                        radial-gradient(120% 80% at 50% 120%, rgba(0,0,0,0.06) 0%, rgba(0,0,0,0) 40%);
-            pointer-events: none;
-        }
-
-        /* inner subtle border to create depth */
-        .invitation-container::after {
-            content: '';
-            position: absolute;
-            inset: 12px;
-            border-radius: 14px;
-            border: 1px solid rgba(212,175,55,0.25);
-            pointer-events: none;
-        }
-        
-        .header {
-            background: linear-gradient(135deg, #101935 0%, #291b5c 60%, #3b1f6d 100%);
-            color: #fff8e7;
-            padding: 48px 30px 36px;
-            text-align: center;
-            position: relative;
-        }
-        
-        .header::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: url('data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><pattern id="grain" width="100" height="100" patternUnits="userSpaceOnUse"><circle cx="25" cy="25" r="1" fill="white" opacity="0.1"/><circle cx="75" cy="75" r="1" fill="white" opacity="0.1"/><circle cx="50" cy="10" r="0.5" fill="white" opacity="0.1"/><circle cx="10" cy="60" r="0.5" fill="white" opacity="0.1"/><circle cx="90" cy="40" r="0.5" fill="white" opacity="0.1"/></pattern></defs><rect width="100" height="100" fill="url(%23grain)"/></svg>');
-            opacity: 0.3;
-        }
-
-        /* corner ornaments */
-        .ornament {
-            position: absolute;
-            width: 80px;
-            height: 80px;
-            opacity: .5;
-            pointer-events: none;
-            background-repeat: no-repeat;
-            background-size: contain;
-            filter: drop-shadow(0 2px 6px rgba(0,0,0,.3));
-        }
-        .ornament.tl { left: 8px; top: 8px; transform: rotate(0deg); }
-        .ornament.br { right: 8px; bottom: 8px; transform: rotate(180deg); }
-        .ornament.tl, .ornament.br {
-            background-image: url('data:image/svg+xml;utf8,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 64 64"><path d="M2 62 Q24 40 24 24 Q24 10 38 2" fill="none" stroke="%23d4af37" stroke-width="2"/><circle cx="40" cy="2" r="2" fill="%23f3e8a3"/></svg>');
-        }
-        
-        .logo {
-            width: 88px;
-            height: 44px;
-            background: rgba(255,255,255,0.1);
-            border-radius: 50%;
-            margin: 0 auto 20px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 20px;
-            font-weight: 700;
-            letter-spacing: 1px;
-            color: #fff8e7;
-            position: relative;
-            z-index: 1;
-            border: 2px solid rgba(212,175,55,0.55);
-            box-shadow: inset 0 0 0 1px rgba(255,255,255,0.15), 0 6px 18px rgba(0,0,0,0.35);
-        }
-        
-        .event-title {
-            font-size: 30px;
-            font-weight: 700;
-            margin-bottom: 6px;
-            position: relative;
-            z-index: 1;
-            color: #fff8e7;
-        }
-        
-        .event-subtitle {
-            font-size: 16px;
-            opacity: 0.9;
-            position: relative;
-            z-index: 1;
-            color: #efe7cf;
-        }
-
-        .date-badge {
-            display: inline-block;
-            margin-top: 14px;
-            padding: 6px 12px;
-            border: 1px solid rgba(212,175,55,.6);
-            border-radius: 999px;
-            color: #fff8e7;
-            font-size: 12px;
-            letter-spacing: .5px;
-            background: linear-gradient(135deg, rgba(212,175,55,.25), rgba(255,255,255,.08));
-        }
-        
-        .content {
-            padding: 40px 30px;
-        }
-
-        /* divider with diamond */
-        .divider { position: relative; margin: 24px auto; height: 1px; background: linear-gradient(90deg, rgba(212,175,55,0) 0%, rgba(212,175,55,.5) 50%, rgba(212,175,55,0) 100%);}        
-        .divider .diamond { position: absolute; left: 50%; top: -5px; width: 10px; height: 10px; background: linear-gradient(135deg, #d4af37, #f3e8a3); transform: translateX(-50%) rotate(45deg); box-shadow: 0 2px 6px rgba(0,0,0,.2);}        
-        
-        .greeting {
-            font-size: 18px;
-            color: #2a2a2a;
-            margin-bottom: 30px;
-            text-align: center;
-        }
-        
-        .guest-info {
-            background: #fbfbfb;
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 30px;
-            border-left: 4px solid rgba(212,175,55,0.85);
-        }
-        
-        .guest-name {
-            font-size: 20px;
-            font-weight: 700;
-            color: #1b2454;
-            margin-bottom: 5px;
-        }
-        
-        .guest-role {
-            color: #666;
-            font-size: 14px;
-        }
-        
-        .event-details {
-            margin-bottom: 30px;
-        }
-        
-        .detail-item {
-            display: flex;
-            align-items: center;
-            margin-bottom: 15px;
-            padding: 10px 0;
-            border-bottom: 1px solid #eee;
-        }
-        
-        .detail-icon {
-            width: 40px;
-            height: 40px;
-            background: linear-gradient(135deg, #c79c2b, #e6c972);
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            margin-right: 15px;
-            color: #1b2454;
-            font-size: 18px;
-        }
-        
-        .detail-content h3 {
-            color: #1b2454;
-            font-size: 16px;
-            margin-bottom: 5px;
-        }
-        
-        .detail-content p {
-            color: #666;
-            font-size: 14px;
-        }
-        
-        .program {
-            background: #fbfbfb;
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 30px;
-            border: 1px solid rgba(212,175,55,0.25);
-        }
-        
-        .program h3 {
-            color: #0B2A4A;
-            margin-bottom: 15px;
-            text-align: center;
-        }
-        
-        .program-item {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 8px 0;
-            border-bottom: 1px solid #ddd;
-        }
-        
-        .program-item:last-child {
-            border-bottom: none;
-        }
-        
-        .program-time {
-            font-weight: 700;
-            color: #1b2454;
-            min-width: 60px;
-        }
-        
-        .program-item-text {
-            color: #333;
-            flex: 1;
-            margin-left: 15px;
-        }
-        
-        .qr-section {
-            text-align: center;
-            margin: 30px 0;
-            padding: 20px;
-            background: #ffffff;
-            border-radius: 10px;
-            border: 1px solid rgba(212,175,55,0.25);
-        }
-        
-        .qr-code {
-            width: 150px;
-            height: 150px;
-            margin: 0 auto 15px;
-            border: 3px solid rgba(212,175,55,0.85);
-            border-radius: 10px;
-            padding: 10px;
-            background: white;
-        }
-        
-        .qr-code img {
-            width: 100%;
-            height: 100%;
-        }
-        
-        .rsvp-buttons {
-            display: flex;
-            gap: 15px;
-            justify-content: center;
-            margin: 30px 0;
-        }
-        
-        .rsvp-btn {
-            padding: 12px 30px;
-            border: none;
-            border-radius: 25px;
-            font-size: 16px;
-            font-weight: bold;
-            cursor: pointer;
-            text-decoration: none;
-            display: inline-block;
-            transition: all 0.3s ease;
-        }
-        
-        .rsvp-accept {
-            background: linear-gradient(135deg, #d4af37, #f3e8a3);
-            color: #1b2454;
-            border: 1px solid rgba(212,175,55,0.9);
-        }
-        
-        .rsvp-accept:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 18px rgba(212,175,55,0.35);
-        }
-
-        /* sheen effect */
-        .rsvp-accept::after { content:''; position:absolute; inset:0; border-radius:25px; background: linear-gradient(120deg, rgba(255,255,255,0.0) 30%, rgba(255,255,255,0.35) 50%, rgba(255,255,255,0.0) 70%); transform: translateX(-100%); transition: transform .8s ease; }
-        .rsvp-accept:hover::after { transform: translateX(100%); }
-        
-        .rsvp-decline {
-            background: transparent;
-            color: #1b2454;
-            border: 1px solid #cbd0df;
-            backdrop-filter: blur(4px);
-        }
-        
-        .rsvp-decline:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 18px rgba(0,0,0,0.15);
-        }
-        
-        .footer {
-            background: #101935;
-            color: white;
-            padding: 20px 30px;
-            text-align: center;
-        }
-        
-        .footer p {
-            margin-bottom: 10px;
-        }
-        
-        .footer a {
-            color: #1E88E5;
-            text-decoration: none;
-        }
+        if not filename:
+            filename = f"invite_{invitation_data['meta']['invitation_id']}.html"
         
-        .deadline {
-            background: #fffaf1;
-            border: 1px solid rgba(212,175,55,0.4);
-            color: #5d4a12;
-            padding: 10px;
-            border-radius: 5px;
-            margin: 20px 0;
-            text-align: center;
-        }
+        if html_content is None:
+            html_content = self.generate_html_invitation(invitation_data, template_type)
+        filepath = os.path.join(self.templates_dir, filename)
         
-        @media (max-width: 600px) {
-            .invitation-container {
-                margin: 10px;
-                border-radius: 15px;
-            }
-            
-            .header, .content, .footer {
-                padding: 20px;
-            }
-            
-            .event-title {
-                font-size: 24px;
-            }
-            
-            .rsvp-buttons {
-                flex-direction: column;
-            }
-            
-            .rsvp-btn {
-                width: 100%;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="invitation-container">
-        <div class="header">
-            <div class="logo">EXP</div>
-            <h1 class="event-title">{{ invitation_data.event.title }}</h1>
-            <p class="event-subtitle">{{ invitation_data.event.subtitle }}</p>
-            <div class="date-badge">{{ invitation_data.event.datetime | format_datetime }}</div>
-            <div class="ornament tl"></div>
-            <div class="ornament br"></div>
-        </div>
+        data = minify_html(html_content).encode('utf-8')
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        write_compressed_variants(filepath, data)
         
-        <div class="content">
-            <div class="divider"><span class="diamond"></span></div>
-            <div class="greeting">
-                Kính gửi {{ invitation_data.guest.title }} {{ invitation_data.guest.name }},
-            </div>
-            
-            <div class="guest-info">
-                <div class="guest-name">{{ invitation_data.guest.title }} {{ invitation_data.guest.name }}</div>
-                {% if invitation_data.guest.role %}
-                <div class="guest-role">{{ invitation_data.guest.role }}</div>
-                {% endif %}
-                {% if invitation_data.guest.organization %}
-                <div class="guest-role">{{ invitation_data.guest.organization }}</div>
-                {% endif %}
-            </div>
-            
-            <div class="event-details">
-                <div class="detail-item">
-                    <div class="detail-icon">📅</div>
-                    <div class="detail-content">
-                        <h3>Thời gian</h3>
-                        <p>{{ invitation_data.event.datetime | format_datetime }}</p>
-                    </div>
-                </div>
-                
-                <div class="detail-item">
-                    <div class="detail-icon">📍</div>
-                    <div class="detail-content">
-                        <h3>Địa điểm</h3>
-                        <p>{{ invitation_data.event.venue.name }}</p>
-                        <p>{{ invitation_data.event.venue.address }}</p>
-                    </div>
-                </div>
-                
-                <div class="detail-item">
-                    <div class="detail-icon">🏢</div>
-                    <div class="detail-content">
-                        <h3>Tổ chức</h3>
-                        <p>{{ invitation_data.event.host_org }}</p>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="program">
-                <h3>Chương trình sự kiện</h3>
-                {% for item in invitation_data.event.program_outline %}
-                <div class="program-item">
-                    <span class="program-time">{{ item.time }}</span>
-                    <span class="program-item-text">{{ item.item }}</span>
-                </div>
-                {% endfor %}
-            </div>
-            
-            <div class="qr-section">
-                <h3>QR Code Check-in</h3>
-                <div class="qr-code">
-                    <img src="{{ invitation_data.qr.qr_url }}" alt="QR Code">
-                </div>
-                <p>Vui lòng mang theo QR code này để check-in tại sự kiện</p>
-            </div>
-            
-            <div class="deadline">
-                <strong>Hạn phản hồi RSVP: {{ invitation_data.rsvp.deadline }}</strong>
-            </div>
-            
-            <div class="rsvp-buttons">
-                <a href="{{ invitation_data.rsvp.accept_url }}" class="rsvp-btn rsvp-accept">
-                    ✅ Chấp nhận tham gia
-                </a>
-                <a href="{{ invitation_data.rsvp.decline_url }}" class="rsvp-btn rsvp-decline">
-                    ❌ Từ chối tham gia
-                </a>
-            </div>
-        </div>
-        
-        <div class="footer">
-            <p><strong>{{ invitation_data.event.host_org }}</strong></p>
-            <p>Thiệp mời ID: {{ invitation_data.meta.invitation_id }}</p>
-            <p>Tạo ngày: {{ invitation_data.meta.created_at | format_date }}</p>
-            <p>Liên hệ: <a href="mailto:contact@exp-solution.io">contact@exp-solution.io</a></p>
-        </div>
-    </div>
-</body>
-</html>
+        return filepath
+    
+    def delete_invitation_file(self, filename: str) -> bool:
         """
+        Xoá file thiệp mời cùng các bản nén đi kèm
+        """
+        filepath = os.path.join(self.templates_dir, filename)
+        remove_compressed_variants(filepath)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+            return True
+        return False
     
-    def _get_modern_template(self) -> str:
+    def render_and_save(self, guest: Dict[str, Any], event: Dict[str, Any], template_type: str = DEFAULT_TEMPLATE) -> Dict[str, Any]:
         """
-        Template hiện đại - Phong cách trẻ trung
+        Tạo dữ liệu, render một lần và lưu thiệp mời của một khách mời (kèm hash nội dung)
         """
-        return """
-<!DOCTYPE html>
-<html lang="vi">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ invitation_data.event.title }}</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Inter', 'Segoe UI', sans-serif;
-            background: linear-gradient(45deg, #2D3748 0%, #4299E1 50%, #38B2AC 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        
-        .invitation-container {
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 24px;
-            overflow: hidden;
-            box-shadow: 0 25px 50px rgba(0,0,0,0.15);
-            position: relative;
-        }
-        
-        .header {
-            background: linear-gradient(135deg, #2D3748 0%, #4299E1 100%);
-            color: white;
-            padding: 50px 30px;
-            text-align: center;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .logo {
-            width: 100px;
-            height: 100px;
-            background: linear-gradient(135deg, #38B2AC, #4299E1);
-            border-radius: 20px;
-            margin: 0 auto 30px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 32px;
-            font-weight: 900;
-            color: white;
-            position: relative;
-            z-index: 1;
-            transform: rotate(-5deg);
-            box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-        }
-        
-        .event-title {
-            font-size: 32px;
-            font-weight: 800;
-            margin-bottom: 15px;
-            position: relative;
-            z-index: 1;
-            letter-spacing: -1px;
-        }
-        
-        .event-subtitle {
-            font-size: 18px;
-            opacity: 0.9;
-            position: relative;
-            z-index: 1;
-            font-weight: 300;
-        }
-        
-        .content {
-            padding: 50px 30px;
-        }
-        
-        .greeting {
-            font-size: 20px;
-            color: #2D3748;
-            margin-bottom: 40px;
-            text-align: center;
-            font-weight: 600;
-        }
-        
-        .info-grid {
-            display: grid;
-            gap: 30px;
-            margin-bottom: 40px;
-        }
-        
-        .info-card {
-            background: linear-gradient(135deg, #f7fafc 0%, #edf2f7 100%);
-            border-radius: 16px;
-            padding: 25px;
-            border-left: 4px solid #4299E1;
-            transition: transform 0.3s ease;
-        }
-        
-        .info-card:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-        }
-        
-        .info-title {
-            font-size: 16px;
-            font-weight: 700;
-            color: #2D3748;
-            margin-bottom: 8px;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        
-        .info-value {
-            font-size: 18px;
-            color: #4a5568;
-            font-weight: 500;
-        }
-        
-        .program {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border-radius: 20px;
-            padding: 30px;
-            margin-bottom: 40px;
-        }
-        
-        .program h3 {
-            font-size: 24px;
-            font-weight: 700;
-            margin-bottom: 25px;
-            text-align: center;
-        }
-        
-        .program-item {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 15px 0;
-            border-bottom: 1px solid rgba(255,255,255,0.2);
-        }
-        
-        .program-item:last-child {
-            border-bottom: none;
-        }
-        
-        .program-time {
-            font-weight: 700;
-            font-size: 16px;
-            min-width: 80px;
-        }
-        
-        .program-activity {
-            flex: 1;
-            margin-left: 20px;
-            font-size: 16px;
-        }
-        
-        .rsvp-section {
-            text-align: center;
-            margin: 40px 0;
-        }
-        
-        .rsvp-button {
-            display: inline-block;
-            background: linear-gradient(135deg, #4299E1 0%, #38B2AC 100%);
-            color: white;
-            padding: 18px 40px;
-            border-radius: 50px;
-            text-decoration: none;
-            font-weight: 700;
-            font-size: 18px;
-            transition: all 0.3s ease;
-            box-shadow: 0 8px 25px rgba(66, 153, 225, 0.3);
-        }
-        
-        .rsvp-button:hover {
-            transform: translateY(-3px);
-            box-shadow: 0 12px 35px rgba(66, 153, 225, 0.4);
-        }
-        
-        .qr-section {
-            text-align: center;
-            margin: 40px 0;
-            padding: 30px;
-            background: linear-gradient(135deg, #f7fafc 0%, #edf2f7 100%);
-            border-radius: 20px;
-        }
-        
-        .qr-code {
-            width: 150px;
-            height: 150px;
-            margin: 0 auto 20px;
-            border-radius: 16px;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-        }
-        
-        .footer {
-            background: #2D3748;
-            color: white;
-            padding: 30px;
-            text-align: center;
-            font-size: 14px;
-            line-height: 1.6;
-        }
-        
-        .footer a {
-            color: #4299E1;
-            text-decoration: none;
+        invitation_data = self.generate_invitation_data(guest, event)
+        content_hash = compute_invitation_hash(guest, event, template_type, invitation_data['branding'])
+        invitation_data['meta']['content_hash'] = content_hash
+        html_content = self.generate_html_invitation(invitation_data, template_type)
+        filename = f"invite_{invitation_data['meta']['invitation_id']}.html"
+        filepath = self.save_invitation_html(invitation_data, filename, html_content=html_content)
+        
+        return {
+            "guest_id": guest['id'],
+            "guest_name": guest['name'],
+            "event_id": event['id'],
+            "template": template_type,
+            "invitation_id": invitation_data['meta']['invitation_id'],
+            "filename": filename,
+            "file_path": filepath,
+            "size": os.path.getsize(filepath),
+            "content_hash": content_hash,
+            "invitation_data": invitation_data
         }
-    </style>
-</head>
-<body>
-    <div class="invitation-container">
-        <div class="header">
-            <div class="logo">EXP</div>
-            <h1 class="event-title">{{ invitation_data.event.title }}</h1>
-            <p class="event-subtitle">{{ invitation_data.event.subtitle }}</p>
-        </div>
-        
-        <div class="content">
-            <div class="greeting">
-                Xin chào {{ invitation_data.guest.title }} {{ invitation_data.guest.name }}! 🚀
-            </div>
-            
-            <div class="info-grid">
-                <div class="info-card">
-                    <div class="info-title">📅 Thời gian</div>
-                    <div class="info-value">{{ invitation_data.event.datetime | format_datetime }}</div>
-                </div>
-                
-                <div class="info-card">
-                    <div class="info-title">📍 Địa điểm</div>
-                    <div class="info-value">{{ invitation_data.event.venue.name }}</div>
-                </div>
-                
-                <div class="info-card">
-                    <div class="info-title">🏢 Tổ chức</div>
-                    <div class="info-value">{{ invitation_data.event.host_org }}</div>
-                </div>
-            </div>
-            
-            <div class="program">
-                <h3>🎯 Chương trình</h3>
-                {% for item in invitation_data.event.program_outline %}
-                <div class="program-item">
-                    <div class="program-time">{{ item.time }}</div>
-                    <div class="program-activity">{{ item.item }}</div>
-                </div>
-                {% endfor %}
-            </div>
-            
-            <div class="rsvp-section">
-                <a href="{{ invitation_data.rsvp.rsvp_url }}" class="rsvp-button">
-                    ✨ Xác nhận tham gia
-                </a>
-                <p style="margin-top: 15px; color: #666; font-size: 14px;">
-                    Hạn chót: {{ invitation_data.rsvp.deadline | format_date }}
-                </p>
-            </div>
-            
-            <div class="qr-section">
-                <h3 style="color: #2D3748; margin-bottom: 20px;">📱 QR Code Check-in</h3>
-                <img src="{{ invitation_data.qr_code }}" alt="QR Code" class="qr-code">
-                <p style="color: #666; font-size: 14px;">
-                    Quét mã QR để check-in nhanh chóng
-                </p>
-            </div>
-        </div>
-        
-        <div class="footer">
-            <p><strong>{{ invitation_data.event.host_org }}</strong></p>
-            <p>Thiệp mời ID: {{ invitation_data.meta.invitation_id }}</p>
-            <p>Tạo ngày: {{ invitation_data.meta.created_at | format_date }}</p>
-            <p>Liên hệ: <a href="mailto:contact@exp-solution.io">contact@exp-solution.io</a></p>
-        </div>
-    </div>
-</body>
-</html>
-        """
     
-    def _get_classic_template(self) -> str:
+    def is_up_to_date(self, guest: Dict[str, Any], event: Dict[str, Any], template_type: str = DEFAULT_TEMPLATE,
+                      known_hashes: Optional[Dict[int, tuple]] = None) -> bool:
         """
-        Template cổ điển - Truyền thống
+        Kiểm tra file thiệp mời của khách mời đã tồn tại và đúng với dữ liệu hiện tại chưa
         """
-        return """
-<!DOCTYPE html>
-<html lang="vi">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ invitation_data.event.title }}</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Times New Roman', serif;
-            background: #1A202C;
-            min-height: 100vh;
-            padding: 20px;
-        }
-        
-        .invitation-container {
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 0;
-            overflow: hidden;
-            box-shadow: 0 0 0 2px #718096, 0 0 0 4px #1A202C;
-            position: relative;
-        }
-        
-        .header {
-            background: #1A202C;
-            color: white;
-            padding: 60px 40px;
-            text-align: center;
-            position: relative;
-        }
-        
-        .logo {
-            width: 120px;
-            height: 120px;
-            background: white;
-            border: 3px solid #718096;
-            margin: 0 auto 30px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 36px;
-            font-weight: bold;
-            color: #1A202C;
-            position: relative;
-            z-index: 1;
-        }
-        
-        .event-title {
-            font-size: 36px;
-            font-weight: bold;
-            margin-bottom: 15px;
-            position: relative;
-            z-index: 1;
-            letter-spacing: 2px;
-        }
-        
-        .event-subtitle {
-            font-size: 18px;
-            opacity: 0.9;
-            position: relative;
-            z-index: 1;
-            font-style: italic;
-        }
-        
-        .content {
-            padding: 50px 40px;
-        }
-        
-        .greeting {
-            font-size: 20px;
-            color: #2D3748;
-            margin-bottom: 40px;
-            text-align: center;
-            font-style: italic;
-        }
-        
-        .info-section {
-            margin-bottom: 40px;
-        }
-        
-        .info-item {
-            display: flex;
-            margin-bottom: 20px;
-            align-items: center;
-            border-bottom: 1px solid #e2e8f0;
-            padding-bottom: 15px;
-        }
-        
-        .info-label {
-            font-weight: bold;
-            color: #1A202C;
-            min-width: 120px;
-            font-size: 16px;
-        }
-        
-        .info-value {
-            font-size: 16px;
-            color: #4a5568;
-            flex: 1;
-        }
-        
-        .program {
-            background: #f7fafc;
-            border: 2px solid #718096;
-            padding: 30px;
-            margin-bottom: 40px;
-        }
-        
-        .program h3 {
-            font-size: 24px;
-            font-weight: bold;
-            margin-bottom: 25px;
-            text-align: center;
-            color: #1A202C;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-        
-        .program-item {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 12px 0;
-            border-bottom: 1px solid #cbd5e0;
-        }
-        
-        .program-item:last-child {
-            border-bottom: none;
-        }
-        
-        .program-time {
-            font-weight: bold;
-            font-size: 16px;
-            color: #1A202C;
-            min-width: 80px;
-        }
-        
-        .program-activity {
-            flex: 1;
-            margin-left: 20px;
-            font-size: 16px;
-            color: #4a5568;
-        }
-        
-        .rsvp-section {
-            text-align: center;
-            margin: 40px 0;
-            padding: 30px;
-            border: 2px solid #718096;
-        }
-        
-        .rsvp-button {
-            display: inline-block;
-            background: #1A202C;
-            color: white;
-            padding: 15px 40px;
-            border: 2px solid #718096;
-            text-decoration: none;
-            font-weight: bold;
-            font-size: 16px;
-            transition: all 0.3s ease;
-        }
-        
-        .rsvp-button:hover {
-            background: white;
-            color: #1A202C;
-        }
-        
-        .qr-section {
-            text-align: center;
-            margin: 40px 0;
-            padding: 30px;
-            border: 2px solid #e2e8f0;
-        }
-        
-        .qr-code {
-            width: 150px;
-            height: 150px;
-            margin: 0 auto 20px;
-            border: 2px solid #718096;
-        }
-        
-        .footer {
-            background: #1A202C;
-            color: white;
-            padding: 30px;
-            text-align: center;
-            font-size: 14px;
-            line-height: 1.6;
-        }
-        
-        .footer a {
-            color: #718096;
-            text-decoration: none;
-        }
-    </style>
-</head>
-<body>
-    <div class="invitation-container">
-        <div class="header">
-            <div class="logo">EXP</div>
-            <h1 class="event-title">{{ invitation_data.event.title }}</h1>
-            <p class="event-subtitle">{{ invitation_data.event.subtitle }}</p>
-        </div>
-        
-        <div class="content">
-            <div class="greeting">
-                Kính gửi {{ invitation_data.guest.title }} {{ invitation_data.guest.name }}
-            </div>
-            
-            <div class="info-section">
-                <div class="info-item">
-                    <div class="info-label">Thời gian:</div>
-                    <div class="info-value">{{ invitation_data.event.datetime | format_datetime }}</div>
-                </div>
-                
-                <div class="info-item">
-                    <div class="info-label">Địa điểm:</div>
-                    <div class="info-value">{{ invitation_data.event.venue.name }}</div>
-                </div>
-                
-                <div class="info-item">
-                    <div class="info-label">Tổ chức:</div>
-                    <div class="info-value">{{ invitation_data.event.host_org }}</div>
-                </div>
-            </div>
-            
-            <div class="program">
-                <h3>Chương trình</h3>
-                {% for item in invitation_data.event.program_outline %}
-                <div class="program-item">
-                    <div class="program-time">{{ item.time }}</div>
-                    <div class="program-activity">{{ item.item }}</div>
-                </div>
-                {% endfor %}
-            </div>
-            
-            <div class="rsvp-section">
-                <a href="{{ invitation_data.rsvp.rsvp_url }}" class="rsvp-button">
-                    Xác nhận tham gia
-                </a>
-                <p style="margin-top: 15px; color: #666; font-size: 14px;">
-                    Hạn chót: {{ invitation_data.rsvp.deadline | format_date }}
-                </p>
-            </div>
-            
-            <div class="qr-section">
-                <h3 style="color: #1A202C; margin-bottom: 20px;">QR Code Check-in</h3>
-                <img src="{{ invitation_data.qr_code }}" alt="QR Code" class="qr-code">
-                <p style="color: #666; font-size: 14px;">
-                    Quét mã QR để check-in
-                </p>
-            </div>
-        </div>
-        
-        <div class="footer">
-            <p><strong>{{ invitation_data.event.host_org }}</strong></p>
-            <p>Thiệp mời ID: {{ invitation_data.meta.invitation_id }}</p>
-            <p>Tạo ngày: {{ invitation_data.meta.created_at | format_date }}</p>
-            <p>Liên hệ: <a href="mailto:contact@exp-solution.io">contact@exp-solution.io</a></p>
-        </div>
-    </div>
-</body>
-</html>
+        if known_hashes is None:
+            known_hashes = self.index.get_hashes([guest['id']])
+        entry = known_hashes.get(guest['id'])
+        return bool(
+            entry
+            and entry[1] == compute_invitation_hash(guest, event, template_type)
+            and os.path.exists(os.path.join(self.templates_dir, entry[0]))
+        )
+    
+    def record_results(self, results: Iterable[Dict[str, Any]]) -> None:
         """
+        Lưu các thiệp mời vừa tạo vào bảng invitations
+        """
+        self.index.upsert(results)
     
-    def _get_festive_template(self) -> str:
+    def regenerate_invitations(
+        self,
+        guests: List[Dict[str, Any]],
+        event: Dict[str, Any],
+        template_type: str = DEFAULT_TEMPLATE,
+        force: bool = False
+    ) -> Dict[str, Any]:
         """
-        Template lễ hội - Vui tươi
+        Tạo lại thiệp mời theo kiểu tăng dần: chỉ render khách mời có hash thay đổi
         """
-        return """
-<!DOCTYPE html>
-<html lang="vi">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ invitation_data.event.title }}</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Comic Sans MS', cursive, sans-serif;
-            background: linear-gradient(45deg, #C53030 0%, #F56565 25%, #F6AD55 50%, #68D391 75%, #4FD1C7 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        
-        .invitation-container {
-            max-width: 600px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 30px;
-            overflow: hidden;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.2);
-            position: relative;
-        }
-        
-        .header {
-            background: linear-gradient(135deg, #C53030 0%, #F56565 100%);
-            color: white;
-            padding: 50px 30px;
-            text-align: center;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .logo {
-            width: 100px;
-            height: 100px;
-            background: linear-gradient(45deg, #F6AD55, #68D391);
-            border-radius: 50%;
-            margin: 30px auto 20px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 36px;
-            font-weight: bold;
-            color: white;
-            position: relative;
-            z-index: 1;
-            animation: bounce 2s ease-in-out infinite;
-        }
-        
-        @keyframes bounce {
-            0%, 20%, 50%, 80%, 100% { transform: translateY(0); }
-            40% { transform: translateY(-10px); }
-            60% { transform: translateY(-5px); }
-        }
-        
-        .event-title {
-            font-size: 32px;
-            font-weight: bold;
-            margin-bottom: 15px;
-            position: relative;
-            z-index: 1;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.3);
-        }
-        
-        .event-subtitle {
-            font-size: 18px;
-            opacity: 0.9;
-            position: relative;
-            z-index: 1;
-            font-weight: 600;
-        }
-        
-        .content {
-            padding: 40px 30px;
-        }
-        
-        .greeting {
-            font-size: 22px;
-            color: #2D3748;
-            margin-bottom: 30px;
-            text-align: center;
-            font-weight: bold;
-        }
-        
-        .info-grid {
-            display: grid;
-            gap: 20px;
-            margin-bottom: 30px;
-        }
-        
-        .info-card {
-            background: linear-gradient(135deg, #FFF5F5 0%, #FED7D7 100%);
-            border-radius: 20px;
-            padding: 20px;
-            border: 3px solid #F56565;
-            transition: transform 0.3s ease;
-        }
-        
-        .info-card:hover {
-            transform: scale(1.05);
-        }
-        
-        .info-title {
-            font-size: 16px;
-            font-weight: bold;
-            color: #C53030;
-            margin-bottom: 8px;
-        }
-        
-        .info-value {
-            font-size: 18px;
-            color: #2D3748;
-            font-weight: 600;
-        }
-        
-        .program {
-            background: linear-gradient(135deg, #68D391 0%, #4FD1C7 100%);
-            color: white;
-            border-radius: 25px;
-            padding: 30px;
-            margin-bottom: 30px;
-        }
-        
-        .program h3 {
-            font-size: 24px;
-            font-weight: bold;
-            margin-bottom: 20px;
-            text-align: center;
-        }
-        
-        .program-item {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 12px 0;
-            border-bottom: 2px solid rgba(255,255,255,0.3);
-        }
-        
-        .program-item:last-child {
-            border-bottom: none;
-        }
-        
-        .program-time {
-            font-weight: bold;
-            font-size: 16px;
-            min-width: 80px;
-        }
-        
-        .program-activity {
-            flex: 1;
-            margin-left: 20px;
-            font-size: 16px;
-        }
-        
-        .rsvp-section {
-            text-align: center;
-            margin: 30px 0;
-        }
-        
-        .rsvp-button {
-            display: inline-block;
-            background: linear-gradient(135deg, #F6AD55 0%, #68D391 100%);
-            color: white;
-            padding: 20px 40px;
-            border-radius: 50px;
-            text-decoration: none;
-            font-weight: bold;
-            font-size: 18px;
-            transition: all 0.3s ease;
-            box-shadow: 0 10px 30px rgba(246, 173, 85, 0.4);
-            animation: pulse 2s ease-in-out infinite;
-        }
-        
-        @keyframes pulse {
-            0% { transform: scale(1); }
-            50% { transform: scale(1.05); }
-            100% { transform: scale(1); }
-        }
-        
-        .rsvp-button:hover {
-            transform: scale(1.1);
-        }
-        
-        .qr-section {
-            text-align: center;
-            margin: 30px 0;
-            padding: 25px;
-            background: linear-gradient(135deg, #FED7D7 0%, #FFF5F5 100%);
-            border-radius: 25px;
-            border: 3px solid #F56565;
-        }
-        
-        .qr-code {
-            width: 150px;
-            height: 150px;
-            margin: 0 auto 20px;
-            border-radius: 20px;
-            border: 4px solid #F56565;
-        }
-        
-        .footer {
-            background: linear-gradient(135deg, #C53030 0%, #F56565 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-            font-size: 14px;
-            line-height: 1.6;
-        }
-        
-        .footer a {
-            color: #FED7D7;
-            text-decoration: none;
-        }
-    </style>
-</head>
-<body>
-    <div class="invitation-container">
-        <div class="header">
-            <div class="logo">🎉</div>
-            <h1 class="event-title">{{ invitation_data.event.title }}</h1>
-            <p class="event-subtitle">{{ invitation_data.event.subtitle }}</p>
-        </div>
-        
-        <div class="content">
-            <div class="greeting">
-                Chào mừng {{ invitation_data.guest.title }} {{ invitation_data.guest.name }}! 🎊
-            </div>
-            
-            <div class="info-grid">
-                <div class="info-card">
-                    <div class="info-title">🕐 Thời gian</div>
-                    <div class="info-value">{{ invitation_data.event.datetime | format_datetime }}</div>
-                </div>
-                
-                <div class="info-card">
-                    <div class="info-title">🏢 Địa điểm</div>
-                    <div class="info-value">{{ invitation_data.event.venue.name }}</div>
-                </div>
-                
-                <div class="info-card">
-                    <div class="info-title">🎈 Tổ chức</div>
-                    <div class="info-value">{{ invitation_data.event.host_org }}</div>
-                </div>
-            </div>
-            
-            <div class="program">
-                <h3>🎪 Chương trình vui vẻ</h3>
-                {% for item in invitation_data.event.program_outline %}
-                <div class="program-item">
-                    <div class="program-time">{{ item.time }}</div>
-                    <div class="program-activity">{{ item.item }}</div>
-                </div>
-                {% endfor %}
-            </div>
-            
-            <div class="rsvp-section">
-                <a href="{{ invitation_data.rsvp.rsvp_url }}" class="rsvp-button">
-                    🎉 Tham gia ngay!
-                </a>
-                <p style="margin-top: 15px; color: #666; font-size: 14px;">
-                    Hạn chót: {{ invitation_data.rsvp.deadline | format_date }}
-                </p>
-            </div>
-            
-            <div class="qr-section">
-                <h3 style="color: #C53030; margin-bottom: 20px;">📱 QR Code Check-in</h3>
-                <img src="{{ invitation_data.qr_code }}" alt="QR Code" class="qr-code">
-                <p style="color: #666; font-size: 14px;">
-                    Quét mã QR để check-in siêu nhanh! 🚀
-                </p>
-            </div>
-        </div>
-        
-        <div class="footer">
-            <p><strong>{{ invitation_data.event.host_org }}</strong></p>
-            <p>Thiệp mời ID: {{ invitation_data.meta.invitation_id }}</p>
-            <p>Tạo ngày: {{ invitation_data.meta.created_at | format_date }}</p>
-            <p>Liên hệ: <a href="mailto:contact@exp-solution.io">contact@exp-solution.io</a></p>
-        </div>
-    </div>
-</body>
-</html>
+        known_hashes = {} if force else self.index.get_hashes(guest['id'] for guest in guests)
+        to_render = []
+        skipped = []
+        for guest in guests:
+            if not force and self.is_up_to_date(guest, event, template_type, known_hashes):
+                skipped.append(guest['id'])
+            else:
+                to_render.append(guest)
+        
+        rendered = []
+        for result in self.generate_invitations(to_render, event, template_type):
+            rendered.append(result)
+        self.record_results(rendered)
+        
+        return {"rendered": rendered, "skipped": skipped}
+    
+    def prune_invitations(self, valid_guest_ids: Iterable[int], event_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """
+        Xoá file thiệp mời của khách mời không còn tồn tại (trong phạm vi sự kiện nếu có)
+        """
+        removed = []
+        for filename, guest_id in self.index.find_orphans(valid_guest_ids, event_id):
+            self.delete_invitation_file(filename)
+            removed.append({"filename": filename, "guest_id": guest_id})
+        self.index.remove(r['filename'] for r in removed)
+        return removed
     
-    def save_invitation_html(self, invitation_data: Dict[str, Any], filename: str = None) -> str:
+    def generate_invitations(
+        self,
+        guests: List[Dict[str, Any]],
+        event: Dict[str, Any],
+        template_type: str = DEFAULT_TEMPLATE
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Lưu thiệp mời HTML vào file
+        Tạo thiệp mời hàng loạt: chia khách mời thành từng lô và render song song
+        trên process pool; kết quả được trả về ngay khi mỗi lô hoàn tất
         """
-        if not filename:
-            filename = f"invite_{invitation_data['meta']['invitation_id']}.html"
-        
-        html_content = self.generate_html_invitation(invitation_data)
-        filepath = os.path.join(self.templates_dir, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        return filepath
-
+        chunks = [guests[i:i + INVITATION_CHUNK_SIZE] for i in range(0, len(guests), INVITATION_CHUNK_SIZE)]
+        
+        # Lô nhỏ: render ngay tại chỗ, tránh chi phí gửi dữ liệu sang process khác
+        if len(chunks) <= 1 or INVITATION_WORKERS <= 1:
+            for guest in guests:
+                yield _summarize_result(self.render_and_save(guest, event, template_type))
+            return
+        
+        pool = _get_process_pool()
+        futures = [
+            pool.submit(_render_invitation_chunk, chunk, event, template_type, self.templates_dir)
+            for chunk in chunks
+        ]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
 
 
+# Số process và kích thước lô khi tạo thiệp mời hàng loạt
+INVITATION_WORKERS = int(os.getenv("INVITATION_WORKERS", str(os.cpu_count() or 1)))
+INVITATION_CHUNK_SIZE = int(os.getenv("INVITATION_CHUNK_SIZE", "50"))
 
+_process_pool = None
+_process_pool_lock = threading.Lock()
 
+def _init_invitation_worker():
+    """
+    Biên dịch sẵn các template trong mỗi worker process
+    """
+    for template_type in TEMPLATE_TYPES:
+        get_invitation_template(template_type)
 
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    Process pool dùng chung, tạo khi cần lần đầu
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=INVITATION_WORKERS,
+                mp_context=process_pool_context(),
+                initializer=_init_invitation_worker
+            )
+        return _process_pool
 
+def _render_invitation_chunk(
+    guests: List[Dict[str, Any]],
+    event: Dict[str, Any],
+    template_type: str,
+    templates_dir: str
+) -> List[Dict[str, Any]]:
+    """
+    Chạy trong worker process: render và ghi file cho một lô khách mời
+    """
+    service = InvitationService(templates_dir)
+    return [_summarize_result(service.render_and_save(guest, event, template_type)) for guest in guests]
 
+def _summarize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bỏ invitation_data (chứa QR base64) khỏi kết quả hàng loạt: file đã nằm trên đĩa
+    """
+    return {key: value for key, value in result.items() if key != 'invitation_data'}
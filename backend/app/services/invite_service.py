@@ -0,0 +1,134 @@
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from jose import jwt
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models.invite_link import InviteLink
+from ..utils.cache import LRUCache
+
+# Thời hạn của link thiệp mời công khai
+INVITE_EXPIRES_IN_SECONDS = 30 * 24 * 3600
+# Số byte ngẫu nhiên của mã ngắn (8 byte -> 11 ký tự URL-safe)
+INVITE_CODE_BYTES = int(os.getenv("INVITE_CODE_BYTES", "8"))
+# code -> (guest_id, event_id, hạn dùng); TTL giới hạn độ trễ khi link bị thu hồi ở process khác
+INVITE_CODE_CACHE_TTL_SECONDS = int(os.getenv("INVITE_CODE_CACHE_TTL_SECONDS", "300"))
+_code_cache = LRUCache(maxsize=int(os.getenv("INVITE_CODE_CACHE_SIZE", "5000")), ttl=INVITE_CODE_CACHE_TTL_SECONDS)
+
+def _secret_key() -> str:
+    return os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
+
+def create_invite_token(guest_id: int, event_id: int, expires_in: int = INVITE_EXPIRES_IN_SECONDS) -> str:
+    """
+    Tạo token (JWT) mã hoá guest_id và event_id cho link thiệp mời công khai
+    """
+    payload = {
+        "sub": "invite",
+        "guest_id": guest_id,
+        "event_id": event_id,
+        "exp": int(time.time()) + expires_in,
+    }
+    return jwt.encode(payload, _secret_key(), algorithm="HS256")
+
+def decode_invite_token(token: str) -> Dict[str, Any]:
+    """
+    Giải mã và kiểm tra token thiệp mời.
+    Raise JWTError nếu token sai/hết hạn, ValueError nếu không phải token thiệp mời.
+    """
+    data = jwt.decode(token, _secret_key(), algorithms=["HS256"])
+    if data.get("sub") != "invite":
+        raise ValueError("Token không hợp lệ")
+    return data
+
+def is_invite_code(token: str) -> bool:
+    """
+    Mã ngắn không chứa dấu chấm, còn JWT luôn gồm 3 phần phân cách bằng dấu chấm
+    """
+    return '.' not in token
+
+def get_or_create_invite_link(db: Session, guest_id: int, event_id: Optional[int],
+                              expires_in: int = INVITE_EXPIRES_IN_SECONDS) -> InviteLink:
+    """
+    Lấy link còn hiệu lực của khách mời (để QR code đã in không bị đổi), nếu chưa có thì tạo mã mới
+    """
+    now = datetime.utcnow()
+    link = db.query(InviteLink).filter(
+        InviteLink.guest_id == guest_id,
+        InviteLink.event_id == event_id,
+        InviteLink.revoked.is_(False),
+        or_(InviteLink.expires_at.is_(None), InviteLink.expires_at > now),
+    ).order_by(InviteLink.id.desc()).first()
+    if link:
+        return link
+
+    for _ in range(5):
+        link = InviteLink(
+            code=secrets.token_urlsafe(INVITE_CODE_BYTES),
+            guest_id=guest_id,
+            event_id=event_id,
+            expires_at=now + timedelta(seconds=expires_in) if expires_in else None,
+        )
+        db.add(link)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Trùng mã (rất hiếm): thử mã khác
+            db.rollback()
+            continue
+        db.refresh(link)
+        return link
+    raise RuntimeError("Không tạo được mã thiệp mời")
+
+def _cache_link(code: str, link: Optional[InviteLink]) -> Optional[tuple]:
+    if link is None or link.revoked:
+        return None
+    expires_at = link.expires_at.timestamp() if link.expires_at else None
+    cached = (link.guest_id, link.event_id, expires_at)
+    _code_cache.set(code, cached)
+    return cached
+
+def _unexpired(code: str, cached: Optional[tuple]) -> Optional[Tuple[int, Optional[int]]]:
+    if cached is None:
+        return None
+    guest_id, event_id, expires_at = cached
+    if expires_at is not None and expires_at <= datetime.utcnow().timestamp():
+        _code_cache.delete(code)
+        return None
+    return guest_id, event_id
+
+def resolve_invite_code(db: Session, code: str) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    Tra mã ngắn thành (guest_id, event_id): một lần truy vấn theo unique index hoặc lấy từ cache.
+    Trả về None nếu mã không tồn tại, đã thu hồi hoặc hết hạn.
+    """
+    cached = _code_cache.get(code)
+    if cached is None:
+        cached = _cache_link(code, db.query(InviteLink).filter(InviteLink.code == code).first())
+    return _unexpired(code, cached)
+
+async def resolve_invite_code_async(db: AsyncSession, code: str) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    Như resolve_invite_code, dùng với AsyncSession
+    """
+    cached = _code_cache.get(code)
+    if cached is None:
+        link = (await db.execute(select(InviteLink).where(InviteLink.code == code))).scalars().first()
+        cached = _cache_link(code, link)
+    return _unexpired(code, cached)
+
+def revoke_invite_links(db: Session, guest_id: int) -> int:
+    """
+    Thu hồi mọi link còn hiệu lực của khách mời, trả về số link đã thu hồi
+    """
+    links = db.query(InviteLink).filter(InviteLink.guest_id == guest_id, InviteLink.revoked.is_(False)).all()
+    now = datetime.utcnow()
+    for link in links:
+        link.revoked = True
+        link.revoked_at = now
+        _code_cache.delete(link.code)
+    db.commit()
+    return len(links)
@@ -0,0 +1,215 @@
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .invitation_service import INVITATION_ASSET_PATH, TEMPLATE_TYPES, get_template_stylesheet
+from ..utils.helpers import ChunkSink, process_pool_context
+
+# Thư mục chứa PDF của từng job xuất PDF
+PDF_EXPORT_DIR = os.getenv("PDF_EXPORT_DIR", os.path.join("exports", "pdf"))
+# Số process và kích thước lô khi render PDF (WeasyPrint tốn CPU và bộ nhớ)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_CHUNK_SIZE = int(os.getenv("PDF_CHUNK_SIZE", "20"))
+
+# Khổ A4 (point)
+A4_WIDTH, A4_HEIGHT = 595.28, 841.89
+# Số thiệp mỗi tờ in -> (số cột, số hàng, tờ xoay ngang)
+NUP_LAYOUTS = {
+    1: (1, 1, False),
+    2: (2, 1, True),
+    4: (2, 2, False),
+    8: (2, 4, False),
+}
+PRINT_FILE_TEMPLATE = "print_{per_sheet}up.pdf"
+
+# Base URL giả để các URL tương đối trong HTML (stylesheet) được phân giải khi render offline
+_OFFLINE_BASE_URL = "http://invitation.local/"
+
+
+def _offline_url_fetcher(url: str) -> Dict[str, Any]:
+    """
+    Chỉ nạp tài nguyên cục bộ: stylesheet của template và ảnh data URI (QR code).
+    Không tải gì từ mạng để render PDF nhanh và ổn định.
+    """
+    from weasyprint.urls import default_url_fetcher
+
+    if url.startswith("data:"):
+        return default_url_fetcher(url)
+
+    path = urlparse(url).path
+    if path.startswith(INVITATION_ASSET_PATH + "/"):
+        template_type = os.path.basename(path).split('.')[0]
+        if template_type in TEMPLATE_TYPES:
+            return {"string": get_template_stylesheet(template_type)[0], "mime_type": "text/css"}
+    raise ValueError(f"Bỏ qua tài nguyên ngoài khi render PDF: {url}")
+
+
+def is_pdf_renderer_available() -> bool:
+    """
+    WeasyPrint là phụ thuộc tuỳ chọn (cần thư viện hệ thống Pango)
+    """
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def render_pdf(html_path: str, pdf_path: str) -> int:
+    """
+    Chuyển một file thiệp mời HTML thành PDF, trả về kích thước file PDF
+    """
+    from weasyprint import HTML
+
+    tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+    HTML(filename=html_path, base_url=_OFFLINE_BASE_URL, url_fetcher=_offline_url_fetcher).write_pdf(tmp_path)
+    os.replace(tmp_path, pdf_path)
+    return os.path.getsize(pdf_path)
+
+
+def _render_pdf_chunk(items: List[Tuple[int, str, str]]) -> List[Dict[str, Any]]:
+    """
+    Render một lô PDF trong worker process; lỗi của từng thiệp mời không làm hỏng cả lô
+    """
+    results = []
+    for guest_id, html_path, pdf_path in items:
+        try:
+            size = render_pdf(html_path, pdf_path)
+            results.append({"guest_id": guest_id, "filename": os.path.basename(pdf_path), "size": size})
+        except Exception as e:
+            results.append({"guest_id": guest_id, "filename": os.path.basename(pdf_path), "error": str(e)})
+    return results
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Process pool riêng cho việc render PDF, tạo khi cần lần đầu
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=process_pool_context())
+        return _pdf_pool
+
+
+def nup_sheet_size(per_sheet: int) -> Tuple[float, float]:
+    """
+    Kích thước tờ in (rộng, cao) theo số thiệp mỗi tờ
+    """
+    landscape = NUP_LAYOUTS[per_sheet][2]
+    return (A4_HEIGHT, A4_WIDTH) if landscape else (A4_WIDTH, A4_HEIGHT)
+
+
+def nup_placement(per_sheet: int, slot: int, page_width: float, page_height: float) -> Tuple[float, float, float]:
+    """
+    (tỉ lệ, x, y) đặt một trang vào ô thứ slot của tờ in: thu nhỏ giữ tỉ lệ, căn giữa trong ô,
+    ô đầu tiên ở góc trên bên trái, điền theo hàng
+    """
+    cols, rows, _ = NUP_LAYOUTS[per_sheet]
+    sheet_width, sheet_height = nup_sheet_size(per_sheet)
+    cell_width, cell_height = sheet_width / cols, sheet_height / rows
+    scale = min(cell_width / page_width, cell_height / page_height)
+    col, row = slot % cols, slot // cols
+    x = col * cell_width + (cell_width - page_width * scale) / 2
+    y = sheet_height - (row + 1) * cell_height + (cell_height - page_height * scale) / 2
+    return scale, x, y
+
+
+class PDFExportService:
+    """
+    Xuất thiệp mời ra PDF: render song song, ghép nhiều thiệp lên một tờ in (N-up) và đóng gói ZIP
+    """
+
+    def __init__(self, export_dir: str = PDF_EXPORT_DIR):
+        self.export_dir = export_dir
+        os.makedirs(export_dir, exist_ok=True)
+
+    def job_dir(self, job_id: str) -> str:
+        path = os.path.join(self.export_dir, job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def render_pdfs(self, job_id: str, items: List[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Render PDF cho các (guest_id, đường dẫn HTML); kết quả trả về ngay khi mỗi lô xong
+        """
+        job_dir = self.job_dir(job_id)
+        tasks = [
+            (guest_id, html_path, os.path.join(job_dir, os.path.splitext(os.path.basename(html_path))[0] + ".pdf"))
+            for guest_id, html_path in items
+        ]
+        chunks = [tasks[i:i + PDF_CHUNK_SIZE] for i in range(0, len(tasks), PDF_CHUNK_SIZE)]
+
+        if len(chunks) <= 1 or PDF_WORKERS <= 1:
+            for chunk in chunks:
+                yield from _render_pdf_chunk(chunk)
+            return
+
+        pool = _get_pdf_pool()
+        futures = [pool.submit(_render_pdf_chunk, chunk) for chunk in chunks]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def build_print_file(self, job_id: str, filenames: List[str], per_sheet: int = 1) -> Optional[str]:
+        """
+        Ghép các PDF (theo thứ tự) thành một file in, mỗi tờ A4 chứa per_sheet thiệp
+        """
+        from pypdf import PageObject, PdfReader, PdfWriter, Transformation
+
+        if not filenames:
+            return None
+        sheet_width, sheet_height = nup_sheet_size(per_sheet)
+
+        job_dir = self.job_dir(job_id)
+        writer = PdfWriter()
+        sheet = None
+        slot = 0
+        for filename in filenames:
+            for page in PdfReader(os.path.join(job_dir, filename)).pages:
+                if per_sheet == 1:
+                    writer.add_page(page)
+                    continue
+                if slot == 0:
+                    sheet = PageObject.create_blank_page(width=sheet_width, height=sheet_height)
+                    writer.add_page(sheet)
+                    sheet = writer.pages[-1]
+
+                scale, x, y = nup_placement(
+                    per_sheet, slot, float(page.mediabox.width), float(page.mediabox.height)
+                )
+                sheet.merge_transformed_page(page, Transformation().scale(scale).translate(x, y))
+                slot = (slot + 1) % per_sheet
+
+        output_path = os.path.join(job_dir, PRINT_FILE_TEMPLATE.format(per_sheet=per_sheet))
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+        return output_path
+
+    def iter_zip(self, job_id: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Stream file ZIP chứa toàn bộ PDF của job (không nén lại vì PDF đã nén sẵn)
+        """
+        job_dir = os.path.join(self.export_dir, job_id)
+        sink = ChunkSink()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for filename in sorted(os.listdir(job_dir)):
+                if not filename.endswith('.pdf'):
+                    continue
+                with open(os.path.join(job_dir, filename), 'rb') as source, archive.open(filename, 'w') as target:
+                    while True:
+                        data = source.read(chunk_size)
+                        if not data:
+                            break
+                        target.write(data)
+                        yield sink.drain()
+        yield sink.drain()
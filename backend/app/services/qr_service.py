@@ -17,6 +17,21 @@ class QRService:
             safe = safe.replace('__', '_')
         return safe or 'guest'
 
+    @staticmethod
+    def make_qr_image(data: str):
+        """
+        Tạo ảnh QR code check-in (PIL image) từ dữ liệu, không lưu file
+        """
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        return qr.make_image(fill_color="black", back_color="white")
+
     def generate_qr_code(self, guest_id: int, guest_name: str, event_id: int) -> dict:
         """
         Tạo QR code cho khách mời
@@ -34,17 +49,7 @@ class QRService:
         }
         
         # Tạo QR code với JSON data
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(json.dumps(qr_data))  # Sử dụng JSON data
-        qr.make(fit=True)
-        
-        # Tạo image
-        img = qr.make_image(fill_color="black", back_color="white")
+        img = self.make_qr_image(json.dumps(qr_data))
         
         # Lưu file
         safe_guest = self._sanitize(guest_name)
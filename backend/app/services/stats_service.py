@@ -0,0 +1,65 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.guest import Guest
+from ..utils.shared_cache import shared_cache, event_tag
+
+# Thống kê được cache dùng chung và bị xoá khi dữ liệu sự kiện đổi; TTL chỉ là giới hạn an toàn
+STATS_CACHE_TTL_SECONDS = int(os.getenv("STATS_CACHE_TTL_SECONDS", "60"))
+
+
+async def get_guest_summary(db: AsyncSession, event_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Thống kê check-in/RSVP của khách mời bằng một truy vấn tổng hợp (thay cho nhiều lần COUNT)
+    """
+    stmt = select(
+        func.count(Guest.id),
+        func.count(case((Guest.checked_in == True, 1))),
+        func.count(case((Guest.rsvp_status == "accepted", 1))),
+        func.count(case((Guest.rsvp_status == "declined", 1))),
+        func.count(case((Guest.rsvp_status == "pending", 1))),
+    )
+    if event_id:
+        stmt = stmt.where(Guest.event_id == event_id)
+    total_guests, checked_in, rsvp_accepted, rsvp_declined, rsvp_pending = (await db.execute(stmt)).one()
+
+    return {
+        "total_guests": total_guests,
+        "checked_in": checked_in,
+        "rsvp_accepted": rsvp_accepted,
+        "rsvp_declined": rsvp_declined,
+        "rsvp_pending": rsvp_pending,
+        "check_in_rate": round(checked_in / total_guests * 100, 2) if total_guests > 0 else 0
+    }
+
+
+async def get_organization_counts(db: AsyncSession, event_id: int) -> List[Dict[str, Any]]:
+    """
+    Số khách mời theo tổ chức của một sự kiện
+    """
+    rows = await db.execute(
+        select(Guest.organization, func.count(Guest.id))
+        .where(
+            Guest.event_id == event_id,
+            Guest.organization.isnot(None),
+            Guest.organization != ''
+        )
+        .group_by(Guest.organization)
+    )
+    return [{"name": org, "count": count} for org, count in rows]
+
+
+
+async def get_cached_guest_summary(db: AsyncSession, event_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Như get_guest_summary, lấy từ cache dùng chung nếu có
+    """
+    return await shared_cache.aget_or_set(
+        f"stats:summary:{event_id or 'all'}",
+        lambda: get_guest_summary(db, event_id),
+        ttl=STATS_CACHE_TTL_SECONDS,
+        tags=[event_tag(event_id)],
+    )
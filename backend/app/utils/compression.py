@@ -0,0 +1,133 @@
+import gzip
+import os
+import re
+from typing import Dict, List
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # thiếu brotli (requirements.txt) thì chỉ tạo bản .gz
+    brotli = None
+    print("⚠️ Chưa cài thư viện brotli, thiệp mời chỉ được nén sẵn dạng .gz")
+
+# Đuôi file nén đi kèm, theo thứ tự ưu tiên khi trình duyệt chấp nhận cả hai
+COMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Nội dung giữ nguyên khi minify (khoảng trắng có ý nghĩa hoặc là CSS/JS)
+_PRESERVED_BLOCK_RE = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+_COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def minify_html(html: str) -> str:
+    """
+    Minify HTML an toàn: bỏ comment, gộp khoảng trắng, giữ nguyên pre/textarea/script/style
+    """
+    parts = _PRESERVED_BLOCK_RE.split(html)
+    result = []
+    # split với 2 nhóm: [văn bản, khối giữ nguyên, tên thẻ, văn bản, ...]
+    for index in range(0, len(parts), 3):
+        text = _COMMENT_RE.sub('', parts[index])
+        result.append(_WHITESPACE_RE.sub(' ', text))
+        if index + 1 < len(parts):
+            result.append(parts[index + 1])
+    return ''.join(result).strip()
+
+
+def write_compressed_variants(filepath: str, data: bytes) -> List[str]:
+    """
+    Ghi các bản nén sẵn (.gz và .br nếu có brotli) cạnh file gốc
+    """
+    written = []
+    gz_path = filepath + COMPRESSED_SUFFIXES["gzip"]
+    # mtime=0 để cùng nội dung luôn cho ra cùng file nén
+    with open(gz_path, 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(gz_path)
+
+    br_path = filepath + COMPRESSED_SUFFIXES["br"]
+    if brotli is not None:
+        with open(br_path, 'wb') as f:
+            f.write(brotli.compress(data, mode=brotli.MODE_TEXT, quality=11))
+        written.append(br_path)
+    elif os.path.exists(br_path):
+        # Bản .br cũ không còn khớp nội dung
+        os.remove(br_path)
+    return written
+
+
+def remove_compressed_variants(filepath: str) -> None:
+    """
+    Xoá các bản nén đi kèm file gốc
+    """
+    for suffix in COMPRESSED_SUFFIXES.values():
+        if os.path.exists(filepath + suffix):
+            os.remove(filepath + suffix)
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """
+    Các encoding nén sẵn mà client chấp nhận (bỏ qua q=0), theo thứ tự ưu tiên của server
+    """
+    accepted: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    return [
+        encoding for encoding in COMPRESSED_SUFFIXES
+        if accepted.get(encoding, wildcard) > 0
+    ]
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles trả về bản .br/.gz đã nén sẵn cạnh file gốc nếu client chấp nhận,
+    không nén lại trên mỗi request
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse):
+            return response
+
+        variants = [
+            (encoding, response.path + suffix)
+            for encoding, suffix in COMPRESSED_SUFFIXES.items()
+            if os.path.isfile(response.path + suffix)
+        ]
+        if not variants:
+            return response
+
+        response.headers["Vary"] = "Accept-Encoding"
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, variant_path in variants:
+            if encoding not in accepted:
+                continue
+            compressed = FileResponse(
+                variant_path,
+                stat_result=os.stat(variant_path),
+                media_type=response.media_type
+            )
+            compressed.headers["Content-Encoding"] = encoding
+            compressed.headers["Vary"] = "Accept-Encoding"
+            if self.is_not_modified(compressed.headers, request_headers):
+                return Response(status_code=304, headers={
+                    "ETag": compressed.headers["etag"],
+                    "Vary": "Accept-Encoding"
+                })
+            return compressed
+        return response
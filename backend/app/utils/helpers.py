@@ -1,7 +1,13 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+import multiprocessing
+import os
 import re
 
+# Cách khởi tạo worker của các process pool (thiệp mời, PDF, badge). Mặc định "spawn":
+# server đã có nhiều thread và kết nối database, fork sẽ sao chép cả các lock đang bị giữ
+PROCESS_START_METHOD = os.getenv("PROCESS_START_METHOD", "spawn")
+
 def format_phone_number(phone: str) -> str:
     """
     Format số điện thoại Việt Nam
@@ -89,3 +95,56 @@ def get_checkin_status_color(checked_in: bool) -> str:
 
 
 
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Kiểm tra header If-None-Match có khớp ETag hiện tại không
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+class ChunkSink:
+    """
+    File-like tối giản (chỉ ghi) để pyarrow/zipfile ghi vào, cho phép lấy ra từng phần đã ghi khi stream
+    """
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def process_pool_context():
+    """
+    Multiprocessing context dùng cho ProcessPoolExecutor (mp_context)
+    """
+    return multiprocessing.get_context(PROCESS_START_METHOD)
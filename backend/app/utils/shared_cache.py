@@ -0,0 +1,355 @@
+import asyncio
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from .cache import LRUCache
+
+# Redis dùng chung giữa các worker; không đặt thì chỉ cache trong process
+REDIS_URL = os.getenv("REDIS_URL", "")
+SHARED_CACHE_PREFIX = os.getenv("SHARED_CACHE_PREFIX", "gm")
+SHARED_CACHE_DEFAULT_TTL = int(os.getenv("SHARED_CACHE_DEFAULT_TTL", "300"))
+SHARED_CACHE_LOCAL_SIZE = int(os.getenv("SHARED_CACHE_LOCAL_SIZE", "5000"))
+# Khi có Redis: bản sao trong process chỉ giữ ngắn, được xoá ngay khi worker khác phát invalidation
+SHARED_CACHE_LOCAL_TTL = int(os.getenv("SHARED_CACHE_LOCAL_TTL", "30"))
+SHARED_CACHE_REDIS_TIMEOUT = float(os.getenv("SHARED_CACHE_REDIS_TIMEOUT", "0.5"))
+# Redis lỗi thì bỏ qua Redis trong khoảng này (giây) thay vì chờ timeout ở mọi request
+SHARED_CACHE_RETRY_SECONDS = float(os.getenv("SHARED_CACHE_RETRY_SECONDS", "5"))
+# Connection pub/sub không có socket timeout (kênh có thể im lặng rất lâu); PING định kỳ để phát hiện mất kết nối
+SHARED_CACHE_HEALTH_CHECK_SECONDS = int(os.getenv("SHARED_CACHE_HEALTH_CHECK_SECONDS", "30"))
+
+_MISSING = object()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def event_tag(event_id: Optional[int]) -> str:
+    """
+    Tag của dữ liệu thuộc một sự kiện; dữ liệu tổng hợp mọi sự kiện dùng tag "event:all"
+    """
+    return f"event:{event_id}" if event_id else "event:all"
+
+
+class LocalCache:
+    """
+    Cache trong process (LRU + TTL) có tag; dùng khi không cấu hình Redis và làm lớp đệm trước Redis
+    """
+
+    def __init__(self, maxsize: int = SHARED_CACHE_LOCAL_SIZE, default_ttl: Optional[float] = SHARED_CACHE_DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data = LRUCache(maxsize=maxsize)
+        self._tag_keys: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        self._data.set(key, value, ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            for tag in tags:
+                keys = self._tag_keys.setdefault(tag, set())
+                keys.add(key)
+                if len(keys) > self.maxsize:
+                    # Bỏ các khoá đã bị LRU loại khỏi cache để chỉ mục tag không phình mãi
+                    keys.intersection_update([cached for cached in keys if cached in self._data])
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.delete(key)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tag_keys.pop(tag, ()))
+        for key in keys:
+            self._data.delete(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        with self._lock:
+            self._tag_keys.clear()
+
+
+class SharedCache:
+    """
+    Cache dùng chung: Redis (khi có REDIS_URL) với bản sao ngắn hạn trong process, hoặc chỉ LocalCache.
+    - TTL theo từng khoá, tag để xoá theo nhóm (ví dụ mọi dữ liệu của một sự kiện)
+    - Invalidation được phát qua Redis pub/sub để các worker khác xoá bản sao trong process;
+      thread lắng nghe chỉ khởi động khi cache được dùng lần đầu (process con chỉ import module thì không tạo)
+    - Redis lỗi/không kết nối được thì coi như cache miss, không làm hỏng request
+    Giá trị được pickle khi lưu vào Redis (Redis nội bộ, tin cậy).
+    """
+
+    def __init__(self, redis_client=None, prefix: str = SHARED_CACHE_PREFIX,
+                 default_ttl: int = SHARED_CACHE_DEFAULT_TTL, local_ttl: int = SHARED_CACHE_LOCAL_TTL,
+                 subscriber_client=None):
+        self.redis = redis_client
+        # Client riêng cho pub/sub: socket timeout ngắn của client chính sẽ cắt kết nối khi kênh im lặng
+        self.subscriber_redis = subscriber_client or redis_client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.local = LocalCache(default_ttl=local_ttl if redis_client is not None else default_ttl)
+        self.channel = f"{prefix}:cache:invalidate"
+        self.node_id = uuid.uuid4().hex
+        self._subscriber: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._redis_down_until = 0.0
+        # tag -> số lần xoá trên Redis đang chạy nền; giá trị Redis mang tag này chưa được tin
+        self._pending_tags: Dict[str, int] = {}
+
+    # ---- Redis helpers ----
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:cache:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:tag:{tag}"
+
+    def _redis_call(self, fn: Callable, default: Any = None) -> Any:
+        if time.monotonic() < self._redis_down_until:
+            return default
+        try:
+            return fn()
+        except Exception as e:
+            print(f"⚠️ Lỗi Redis cache, tạm dùng cache trong process: {e}")
+            self._redis_down_until = time.monotonic() + SHARED_CACHE_RETRY_SECONDS
+            return default
+
+    def _ensure_subscriber(self) -> None:
+        """
+        Lắng nghe invalidation từ các worker khác và xoá bản sao trong process tương ứng.
+        Khởi động lại sau fork (thread không được sao chép sang process con).
+        """
+        if self._subscriber is not None and self._subscriber.is_alive():
+            return
+        with self._lock:
+            if self._subscriber is None or not self._subscriber.is_alive():
+                self._start_subscriber()
+
+    def _start_subscriber(self) -> None:
+        def listen():
+            while True:
+                pubsub = None
+                try:
+                    pubsub = self.subscriber_redis.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(self.channel)
+                    while True:
+                        # Không có tin nhắn trong khoảng chờ là bình thường, không phải mất kết nối
+                        message = pubsub.get_message(timeout=1.0)
+                        if message is not None:
+                            self._apply_invalidation(message.get("data"))
+                except Exception as e:
+                    print(f"⚠️ Mất kết nối pub/sub Redis cache, thử lại: {e}")
+                    # Có thể đã bỏ lỡ invalidation trong lúc mất kết nối
+                    self.local.clear()
+                    threading.Event().wait(1)
+                finally:
+                    if pubsub is not None:
+                        try:
+                            pubsub.close()
+                        except Exception:
+                            pass
+
+        self._subscriber = threading.Thread(target=listen, name="shared-cache-subscriber", daemon=True)
+        self._subscriber.start()
+
+    def _apply_invalidation(self, data) -> None:
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get("node") == self.node_id:
+            return
+        if message.get("tags"):
+            self.local.invalidate_tags(*message["tags"])
+        if message.get("keys"):
+            self.local.delete(*message["keys"])
+
+    def _publish(self, tags: Iterable[str] = (), keys: Iterable[str] = ()) -> None:
+        payload = json.dumps({"node": self.node_id, "tags": list(tags), "keys": list(keys)})
+        self._redis_call(lambda: self.redis.publish(self.channel, payload))
+
+    # ---- API sync ----
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.redis is None:
+            return default
+
+        self._ensure_subscriber()
+        raw = self._redis_call(lambda: self.redis.get(self._key(key)))
+        if raw is None:
+            return default
+        try:
+            value, tags = pickle.loads(raw)
+        except Exception:
+            return default
+        if self._pending_tags and not self._pending_tags.keys().isdisjoint(tags):
+            return default
+        self.local.set(key, value, tags=tags)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        ttl = ttl or self.default_ttl
+        tags = list(tags)
+        if self.redis is None:
+            self.local.set(key, value, ttl, tags)
+            return
+
+        self._ensure_subscriber()
+        self.local.set(key, value, min(ttl, self.local.default_ttl), tags)
+
+        def write():
+            pipe = self.redis.pipeline()
+            pipe.set(self._key(key), pickle.dumps((value, tags)), ex=ttl)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), key)
+                # Tập khoá của tag sống lâu hơn khoá dài nhất để không bỏ sót khi xoá theo tag
+                pipe.expire(self._tag_key(tag), max(ttl, self.default_ttl) * 2)
+            pipe.execute()
+        self._redis_call(write)
+
+    def get_or_set(self, key: str, factory: Callable[[], Any], ttl: Optional[int] = None,
+                   tags: Iterable[str] = ()) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl, tags)
+        return value
+
+    def delete(self, *keys: str) -> None:
+        self.local.delete(*keys)
+        if self.redis is not None and keys:
+            self._redis_call(lambda: self.redis.delete(*[self._key(key) for key in keys]))
+            self._publish(keys=keys)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """
+        Xoá mọi khoá gắn một trong các tag, ở Redis và ở mọi worker.
+        Gọi từ event loop (after_commit của AsyncSession) thì phần Redis chạy trên pool I/O để không chặn loop;
+        trong lúc đó giá trị Redis mang các tag này bị coi như cache miss.
+        """
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            return
+        self.local.invalidate_tags(*tags)
+        if self.redis is None:
+            return
+        if not _on_event_loop():
+            self._invalidate_remote(tags)
+            return
+
+        with self._lock:
+            for tag in tags:
+                self._pending_tags[tag] = self._pending_tags.get(tag, 0) + 1
+        self._io_executor().submit(self._invalidate_remote, tags, True)
+
+    def _invalidate_remote(self, tags: List[str], pending: bool = False) -> None:
+        def delete_tagged():
+            pipe = self.redis.pipeline()
+            for tag in tags:
+                pipe.smembers(self._tag_key(tag))
+            members = set()
+            for keys in pipe.execute():
+                members.update(key.decode("utf-8") if isinstance(key, bytes) else key for key in keys)
+            pipe = self.redis.pipeline()
+            if members:
+                pipe.delete(*[self._key(key) for key in members])
+            pipe.delete(*[self._tag_key(tag) for tag in tags])
+            pipe.execute()
+        try:
+            self._redis_call(delete_tagged)
+            self._publish(tags=tags)
+        finally:
+            if pending:
+                with self._lock:
+                    for tag in tags:
+                        if self._pending_tags.get(tag, 0) <= 1:
+                            self._pending_tags.pop(tag, None)
+                        else:
+                            self._pending_tags[tag] -= 1
+
+    def invalidate_events(self, event_ids: Iterable[Optional[int]]) -> None:
+        """
+        Dữ liệu của các sự kiện đổi: xoá cache của từng sự kiện và cache tổng hợp mọi sự kiện
+        """
+        tags = {event_tag(event_id) for event_id in event_ids}
+        tags.add(event_tag(None))
+        self.invalidate_tags(*sorted(tags))
+
+    # ---- API async (route async) ----
+
+    def _io_executor(self) -> ThreadPoolExecutor:
+        # Lệnh Redis (client sync) chạy trên pool riêng, không chiếm threadpool của route sync
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="shared-cache")
+            return self._executor
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING or self.redis is None:
+            return default if value is _MISSING else value
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor(), self.get, key, default)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        if self.redis is None:
+            self.set(key, value, ttl, tags)
+            return
+        await asyncio.get_running_loop().run_in_executor(
+            self._io_executor(), lambda: self.set(key, value, ttl, tags)
+        )
+
+    async def aget_or_set(self, key: str, factory: Callable[[], Awaitable[Any]], ttl: Optional[int] = None,
+                          tags: Iterable[str] = ()) -> Any:
+        value = await self.aget(key, _MISSING)
+        if value is _MISSING:
+            value = await factory()
+            await self.aset(key, value, ttl, tags)
+        return value
+
+
+def _create_shared_cache(url: str = REDIS_URL) -> SharedCache:
+    if not url:
+        return SharedCache()
+    try:
+        import redis
+    except ImportError:
+        print("⚠️ REDIS_URL được đặt nhưng chưa cài thư viện redis, dùng cache trong process")
+        return SharedCache()
+    client = redis.Redis.from_url(
+        url,
+        socket_timeout=SHARED_CACHE_REDIS_TIMEOUT,
+        socket_connect_timeout=SHARED_CACHE_REDIS_TIMEOUT,
+    )
+    subscriber = redis.Redis.from_url(
+        url,
+        socket_timeout=None,
+        socket_connect_timeout=SHARED_CACHE_REDIS_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=SHARED_CACHE_HEALTH_CHECK_SECONDS,
+    )
+    return SharedCache(redis_client=client, subscriber_client=subscriber)
+
+
+shared_cache = _create_shared_cache()
@@ -0,0 +1,136 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+_STOP = object()
+_CONTEXT_KEY = "sqlite_writer_context"
+
+
+def write_context(connection) -> dict:
+    """
+    Dữ liệu dùng chung của transaction ghi hiện tại (ví dụ: các sự kiện cần tăng phiên bản),
+    được truyền cho before_commit/after_commit rồi xoá sau mỗi transaction
+    """
+    return connection.info.setdefault(_CONTEXT_KEY, {})
+
+
+class SQLiteWriter:
+    """
+    Ghi SQLite qua một connection duy nhất: các thao tác ghi được xếp hàng và commit theo lô (group commit).
+    Tránh lỗi "database is locked" khi nhiều request cùng ghi, và chỉ tốn một lần fsync cho cả lô.
+    """
+
+    def __init__(self, engine, max_batch: int = 256, before_commit: Optional[Callable[[Any, dict], None]] = None,
+                 after_commit: Optional[Callable[[dict], None]] = None):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.before_commit = before_commit
+        self.after_commit = after_commit
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Xếp hàng một thao tác ghi fn(connection, *args); kết quả trả về qua Future sau khi lô được commit
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Như submit nhưng chờ kết quả trong event loop
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def close(self, timeout: float = 10) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _loop(self) -> None:
+        connection = self.engine.connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                stop = False
+                # Gom các thao tác đang chờ vào cùng một transaction
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._execute(connection, batch)
+                if stop:
+                    break
+        finally:
+            connection.close()
+
+    def _execute(self, connection, batch: List[Tuple[Future, Callable, tuple]]) -> None:
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self._transaction(connection, [(fn, args) for _, fn, args in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Một thao tác lỗi làm hỏng cả lô: chạy lại từng thao tác để chỉ thao tác đó báo lỗi
+                for future, fn, args in batch:
+                    self._retry_single(connection, future, fn, args)
+                return
+            batch[0][0].set_exception(e)
+            return
+
+        self.batches += 1
+        self.writes += len(batch)
+        for (future, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _retry_single(self, connection, future: Future, fn: Callable, args: tuple) -> None:
+        try:
+            result, = self._transaction(connection, [(fn, args)])
+        except Exception as e:
+            future.set_exception(e)
+            return
+        self.batches += 1
+        self.writes += 1
+        future.set_result(result)
+
+    def _transaction(self, connection, operations: List[Tuple[Callable, tuple]]) -> List[Any]:
+        context = connection.info[_CONTEXT_KEY] = {}
+        try:
+            with connection.begin():
+                results = [fn(connection, *args) for fn, args in operations]
+                if self.before_commit:
+                    self.before_commit(connection, context)
+        finally:
+            connection.info.pop(_CONTEXT_KEY, None)
+        if self.after_commit:
+            # Dữ liệu đã commit: lỗi ở đây (ví dụ xoá cache) không được làm hỏng kết quả ghi
+            try:
+                self.after_commit(context)
+            except Exception as e:
+                print(f"⚠️ Lỗi sau khi commit lô ghi SQLite: {e}")
+        return results
@@ -0,0 +1,58 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import Base, engine
+from app.models import Base as ModelsBase
+import app.models.user  # noqa: F401  (đăng ký bảng users vào Base)
+
+config = context.config
+
+# Khi chạy từ trong app (startup) thì giữ nguyên cấu hình logging của server
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+# users nằm trong Base của database.py, các bảng còn lại trong Base của models
+target_metadata = [Base.metadata, ModelsBase.metadata]
+
+
+def run_migrations_offline() -> None:
+    """
+    Sinh SQL mà không kết nối database (alembic upgrade --sql)
+    """
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=engine.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite không hỗ trợ phần lớn ALTER TABLE: dùng batch mode (tạo lại bảng)
+        render_as_batch=connection.dialect.name == "sqlite",
+        compare_type=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
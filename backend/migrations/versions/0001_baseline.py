@@ -0,0 +1,198 @@
+"""baseline schema
+
+Lược đồ tại thời điểm bắt đầu dùng migration. Database cũ được tạo bằng create_all nên
+migration này idempotent: chỉ tạo bảng/index còn thiếu và bổ sung các cột được thêm sau
+(ví dụ invitation_jobs.options) mà create_all không tự thêm vào bảng đã có.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    return [
+        ("users", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(50), nullable=False),
+            sa.Column("email", sa.String(100), nullable=False),
+            sa.Column("hashed_password", sa.String(100), nullable=False),
+            sa.Column("full_name", sa.String(100), nullable=True),
+            sa.Column("role", sa.String(20), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("is_verified", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("last_login", sa.DateTime(), nullable=True),
+        ], [
+            ("ix_users_id", ["id"], False),
+            ("ix_users_username", ["username"], True),
+            ("ix_users_email", ["email"], True),
+        ]),
+        ("events", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("event_date", sa.DateTime(), nullable=False),
+            sa.Column("location", sa.String(255), nullable=True),
+            sa.Column("max_guests", sa.Integer(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        ], [
+            ("ix_events_id", ["id"], False),
+        ]),
+        ("guests", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(20), nullable=True),
+            sa.Column("name", sa.String(100), nullable=False),
+            sa.Column("role", sa.String(100), nullable=True),
+            sa.Column("organization", sa.String(200), nullable=True),
+            sa.Column("tag", sa.String(50), nullable=True),
+            sa.Column("email", sa.String(100), nullable=True),
+            sa.Column("phone", sa.String(20), nullable=True),
+            sa.Column("qr_code", sa.String(500), nullable=True),
+            sa.Column("qr_image_path", sa.String(200), nullable=True),
+            sa.Column("rsvp_status", sa.String(20), nullable=True),
+            sa.Column("rsvp_response_date", sa.DateTime(), nullable=True),
+            sa.Column("rsvp_notes", sa.Text(), nullable=True),
+            sa.Column("checked_in", sa.Boolean(), nullable=True),
+            sa.Column("check_in_time", sa.DateTime(), nullable=True),
+            sa.Column("check_in_location", sa.String(100), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("event_id", sa.Integer(), sa.ForeignKey("events.id"), nullable=True),
+        ], [
+            ("ix_guests_id", ["id"], False),
+        ]),
+        ("event_versions", [
+            sa.Column("event_id", sa.Integer(), primary_key=True, autoincrement=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        ], []),
+        ("invitation_jobs", [
+            sa.Column("id", sa.String(36), primary_key=True),
+            sa.Column("kind", sa.String(30), nullable=True),
+            sa.Column("event_id", sa.Integer(), nullable=True),
+            sa.Column("template", sa.String(20), nullable=True),
+            sa.Column("force", sa.Boolean(), nullable=True),
+            sa.Column("options", sa.Text(), nullable=True),
+            sa.Column("status", sa.String(20), nullable=True),
+            sa.Column("total", sa.Integer(), nullable=True),
+            sa.Column("processed", sa.Integer(), nullable=True),
+            sa.Column("last_guest_id", sa.Integer(), nullable=True),
+            sa.Column("rendered", sa.Integer(), nullable=True),
+            sa.Column("skipped", sa.Integer(), nullable=True),
+            sa.Column("removed", sa.Integer(), nullable=True),
+            sa.Column("cancel_requested", sa.Boolean(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("owner", sa.String(64), nullable=True),
+            sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("started_at", sa.DateTime(), nullable=True),
+            sa.Column("finished_at", sa.DateTime(), nullable=True),
+        ], [
+            ("ix_invitation_jobs_event_id", ["event_id"], False),
+            ("ix_invitation_jobs_status", ["status"], False),
+        ]),
+        ("invitation_job_items", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("job_id", sa.String(36), nullable=False),
+            sa.Column("guest_id", sa.Integer(), nullable=True),
+            sa.Column("filename", sa.String(100), nullable=True),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        ], [
+            ("ix_invitation_job_items_job_id_id", ["job_id", "id"], False),
+        ]),
+        ("email_deliveries", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("guest_id", sa.Integer(), nullable=False),
+            sa.Column("event_id", sa.Integer(), nullable=True),
+            sa.Column("email", sa.String(100), nullable=False),
+            sa.Column("template", sa.String(20), nullable=True),
+            sa.Column("status", sa.String(20), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=True),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.Column("message_id", sa.String(255), nullable=True),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=True),
+            sa.Column("owner", sa.String(80), nullable=True),
+            sa.Column("claimed_at", sa.DateTime(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("guest_id", "event_id", name="uq_email_deliveries_guest_event"),
+        ], [
+            ("ix_email_deliveries_id", ["id"], False),
+            ("ix_email_deliveries_guest_id", ["guest_id"], False),
+            ("ix_email_deliveries_event_id", ["event_id"], False),
+            ("ix_email_deliveries_owner", ["owner"], False),
+            ("ix_email_deliveries_status_next_attempt", ["status", "next_attempt_at"], False),
+        ]),
+        ("invitations", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("guest_id", sa.Integer(), nullable=False),
+            sa.Column("event_id", sa.Integer(), nullable=True),
+            sa.Column("template", sa.String(20), nullable=True),
+            sa.Column("content_hash", sa.String(64), nullable=False),
+            sa.Column("filename", sa.String(255), nullable=False, unique=True),
+            sa.Column("file_path", sa.String(500), nullable=False),
+            sa.Column("size", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        ], [
+            ("ix_invitations_id", ["id"], False),
+            ("ix_invitations_guest_id", ["guest_id"], False),
+            ("ix_invitations_template", ["template"], False),
+            ("ix_invitations_updated_at", ["updated_at"], False),
+            ("ix_invitations_event_updated", ["event_id", "updated_at"], False),
+        ]),
+        ("invite_links", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("code", sa.String(32), nullable=False),
+            sa.Column("guest_id", sa.Integer(), nullable=False),
+            sa.Column("event_id", sa.Integer(), nullable=True),
+            sa.Column("expires_at", sa.DateTime(), nullable=True),
+            sa.Column("revoked", sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("revoked_at", sa.DateTime(), nullable=True),
+        ], [
+            ("ix_invite_links_id", ["id"], False),
+            ("ix_invite_links_code", ["code"], True),
+            ("ix_invite_links_guest_id", ["guest_id"], False),
+        ]),
+    ]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+
+    for name, columns, indexes in _tables():
+        if name not in existing_tables:
+            op.create_table(name, *columns)
+            existing_indexes = set()
+        else:
+            # Bảng đã có từ create_all: bổ sung cột mới (luôn cho phép NULL hoặc có server_default)
+            existing_columns = {column["name"] for column in inspector.get_columns(name)}
+            for column in columns:
+                if isinstance(column, sa.Column) and column.name not in existing_columns:
+                    op.add_column(name, column)
+            existing_indexes = {index["name"] for index in inspector.get_indexes(name)}
+
+        for index_name, index_columns, unique in indexes:
+            if index_name not in existing_indexes:
+                op.create_index(index_name, name, index_columns, unique=unique)
+
+
+def downgrade() -> None:
+    # Không xoá dữ liệu khi hạ phiên bản về trước baseline
+    pass
@@ -0,0 +1,46 @@
+"""guest query indexes
+
+Index kép cho các truy vấn nóng trên bảng guests (trước đây đều quét toàn bảng):
+- danh sách/export/job theo sự kiện, duyệt theo id:      (event_id, id)
+- lọc danh sách theo RSVP:                              (event_id, rsvp_status)
+- thống kê check-in/RSVP (index-only scan):             (event_id, checked_in, rsvp_status)
+- thống kê theo tổ chức, lọc badge theo đơn vị:         (event_id, organization)
+- lọc badge theo tag:                                   (event_id, tag)
+- badge sắp xếp theo tên:                               (event_id, name)
+- khách mời có email (gửi thiệp mời):                    (event_id, email)
+- check-in gần đây:                                     (event_id, check_in_time)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+GUEST_INDEXES = [
+    ("ix_guests_event_id_id", ["event_id", "id"]),
+    ("ix_guests_event_rsvp", ["event_id", "rsvp_status"]),
+    ("ix_guests_event_checkin_rsvp", ["event_id", "checked_in", "rsvp_status"]),
+    ("ix_guests_event_organization", ["event_id", "organization"]),
+    ("ix_guests_event_tag", ["event_id", "tag"]),
+    ("ix_guests_event_name", ["event_id", "name"]),
+    ("ix_guests_event_email", ["event_id", "email"]),
+    ("ix_guests_event_check_in_time", ["event_id", "check_in_time"]),
+]
+
+
+def upgrade() -> None:
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("guests")}
+    for name, columns in GUEST_INDEXES:
+        if name not in existing:
+            op.create_index(name, "guests", columns)
+
+
+def downgrade() -> None:
+    for name, _ in reversed(GUEST_INDEXES):
+        op.drop_index(name, table_name="guests")
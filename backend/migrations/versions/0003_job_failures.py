@@ -0,0 +1,36 @@
+"""job failures
+
+Xuất PDF đếm riêng thiệp mời render lỗi (invitation_jobs.failed) và lưu lý do lỗi
+theo từng khách mời (invitation_job_items.error), thay vì gộp vào skipped.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = [
+    ("invitation_jobs", sa.Column("failed", sa.Integer(), nullable=True)),
+    ("invitation_job_items", sa.Column("error", sa.Text(), nullable=True)),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, column in NEW_COLUMNS:
+        # Database tạo bằng create_all từ models mới đã có sẵn cột
+        if column.name not in {existing["name"] for existing in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch:
+                batch.add_column(column)
+
+
+def downgrade() -> None:
+    for table, column in reversed(NEW_COLUMNS):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column(column.name)
@@ -0,0 +1,117 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Chạy test trên một database SQLite tạm, tách khỏi guest_management.db và Redis thật.
+# Phải đặt biến môi trường trước khi import app (cấu hình được đọc lúc import).
+_WORK_DIR = tempfile.mkdtemp(prefix="guest-management-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_WORK_DIR}/test.db"
+os.environ["REDIS_URL"] = ""
+os.environ.setdefault("SQLITE_WRITER", "false")
+os.environ.setdefault("EXPORT_CACHE_DIR", os.path.join(_WORK_DIR, "exports"))
+os.environ.setdefault("JINJA_CACHE_DIR", os.path.join(_WORK_DIR, "jinja"))
+# bcrypt cost tối thiểu cho test
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# Các service ghi file theo đường dẫn tương đối (qr_images, templates/invitations, exports)
+os.chdir(_WORK_DIR)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema():
+    from app.database import Base as UserBase, engine
+    from app.models.base import Base
+    import app.models  # noqa: F401  (đăng ký toàn bộ bảng)
+    import app.models.user  # noqa: F401
+
+    UserBase.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    yield
+    from app.database import Base as UserBase, engine
+    from app.models.base import Base
+    from app.auth import invalidate_user_cache
+    from app.utils.shared_cache import shared_cache
+
+    with engine.begin() as connection:
+        for metadata in (Base.metadata, UserBase.metadata):
+            for table in reversed(metadata.sorted_tables):
+                connection.execute(table.delete())
+    shared_cache.local.clear()
+    invalidate_user_cache()
+
+
+@pytest.fixture
+def db():
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_event(db):
+    from datetime import datetime
+    from app.models.event import Event
+
+    def make(name="Sự kiện thử", **fields):
+        event = Event(name=name, event_date=fields.pop("event_date", datetime(2026, 12, 1, 18, 0)), **fields)
+        db.add(event)
+        db.commit()
+        db.refresh(event)
+        return event
+    return make
+
+
+@pytest.fixture
+def make_guest(db):
+    from app.models.guest import Guest
+
+    def make(name="Nguyễn Văn A", **fields):
+        guest = Guest(name=name, **fields)
+        db.add(guest)
+        db.commit()
+        db.refresh(guest)
+        return guest
+    return make
+
+
+@pytest.fixture
+def make_user(db):
+    from app.auth import get_password_hash
+    from app.models.user import User
+
+    def make(email="admin@example.com", password="secret123", **fields):
+        user = User(username=fields.pop("username", email.split("@")[0]), email=email,
+                    hashed_password=get_password_hash(password), **fields)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+    return make
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    TestClient dùng chung một event loop cho cả test (async engine gắn với loop đó).
+    Bỏ qua các tác vụ startup (dữ liệu mẫu, job dang dở); shutdown vẫn đóng async engine.
+    """
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    monkeypatch.setattr(app.router, "on_startup", [])
+    with TestClient(app) as test_client:
+        yield test_client
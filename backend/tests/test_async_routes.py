@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app import database
+from app.models.guest import Guest
+from app.services import stats_service
+
+
+def _with_async_db(fn):
+    """
+    Chạy fn(AsyncSession) trên một event loop riêng; async engine được đóng trước khi loop kết thúc
+    """
+    async def run():
+        try:
+            async for session in database.get_async_db():
+                return await fn(session)
+        finally:
+            await database.dispose_async_engine()
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def event_with_guests(make_event, make_guest):
+    event = make_event()
+    other = make_event(name="Sự kiện khác")
+    make_guest(event_id=event.id, rsvp_status="accepted", checked_in=True, organization="EXP")
+    make_guest(event_id=event.id, rsvp_status="accepted", organization="EXP")
+    make_guest(event_id=event.id, rsvp_status="declined", organization="")
+    make_guest(event_id=event.id, rsvp_status="pending", organization="ABC")
+    make_guest(event_id=other.id, rsvp_status="pending", checked_in=True)
+    return event
+
+
+def test_guest_summary_is_a_single_aggregate(event_with_guests):
+    summary = _with_async_db(lambda db: stats_service.get_guest_summary(db, event_with_guests.id))
+
+    assert summary == {"total_guests": 4, "checked_in": 1, "rsvp_accepted": 2, "rsvp_declined": 1,
+                       "rsvp_pending": 1, "check_in_rate": 25.0}
+    assert _with_async_db(lambda db: stats_service.get_guest_summary(db))["total_guests"] == 5
+
+
+def test_organization_counts_skip_blank(event_with_guests):
+    counts = _with_async_db(lambda db: stats_service.get_organization_counts(db, event_with_guests.id))
+
+    assert sorted(counts, key=lambda row: row["name"]) == [{"name": "ABC", "count": 1}, {"name": "EXP", "count": 2}]
+
+
+def test_empty_event_has_zero_rate(make_event):
+    summary = _with_async_db(lambda db: stats_service.get_guest_summary(db, make_event().id))
+
+    assert summary["total_guests"] == 0 and summary["check_in_rate"] == 0
+
+
+def test_stats_routes(client, event_with_guests):
+    summary = client.get("/api/guests/stats/summary", params={"event_id": event_with_guests.id}).json()
+    assert summary["checked_in"] == 1 and summary["total_guests"] == 4
+
+    stats = client.get(f"/api/events/{event_with_guests.id}/stats").json()
+    assert stats["event"]["id"] == event_with_guests.id
+    assert stats["check_in_rate"] == 25.0
+    assert {row["name"] for row in stats["organizations"]} == {"ABC", "EXP"}
+
+    assert client.get("/api/events/999/stats").status_code == 404
+
+
+def test_checkin_updates_cached_stats(client, db, event_with_guests):
+    guest = db.query(Guest).filter(Guest.event_id == event_with_guests.id, Guest.checked_in.is_(False)).first()
+    client.get("/api/guests/stats/summary", params={"event_id": event_with_guests.id})
+
+    first = client.post(f"/api/guests/{guest.id}/checkin", json={"check_in_location": "Cổng A"}).json()
+    again = client.post(f"/api/guests/{guest.id}/checkin", json={}).json()
+
+    assert first["already_checked_in"] is False
+    assert first["guest"]["check_in_location"] == "Cổng A"
+    assert again["already_checked_in"] is True
+    summary = client.get("/api/guests/stats/summary", params={"event_id": event_with_guests.id}).json()
+    assert summary["checked_in"] == 2
+
+
+def test_checkin_missing_guest_is_404(client):
+    assert client.post("/api/guests/999/checkin", json={}).status_code == 404
+
+
+def test_guest_list_filters_and_sees_new_guests(client, make_guest, event_with_guests):
+    listed = client.get("/api/guests/", params={"event_id": event_with_guests.id, "rsvp_status": "accepted"}).json()
+    assert len(listed) == 2 and all(row["rsvp_status"] == "accepted" for row in listed)
+
+    make_guest(event_id=event_with_guests.id, rsvp_status="accepted")
+    listed = client.get("/api/guests/", params={"event_id": event_with_guests.id, "rsvp_status": "accepted"}).json()
+    assert len(listed) == 3
+    assert [row["organization"] for row in client.get("/api/guests/", params={"organization": "AB"}).json()] == ["ABC"]
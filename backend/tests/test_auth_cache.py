@@ -0,0 +1,66 @@
+import pytest
+
+from app import auth
+from app.auth import create_access_token
+from app.models.user import User
+
+
+@pytest.fixture
+def user_queries(monkeypatch):
+    """Số lần get_current_user phải đọc bảng users"""
+    calls = []
+    session_factory = auth.SessionLocal
+    monkeypatch.setattr(auth, "SessionLocal", lambda: calls.append(1) or session_factory())
+    return calls
+
+
+def _me(client, email="admin@example.com", **claims):
+    token = create_access_token({"sub": email, **claims})
+    return client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_repeated_requests_are_served_from_cache(client, make_user, user_queries):
+    make_user()
+
+    assert _me(client).status_code == 200
+    assert _me(client).json()["email"] == "admin@example.com"
+
+    assert len(user_queries) == 1
+
+
+def test_deactivation_takes_effect_on_next_request(client, db, make_user):
+    user = make_user()
+    assert _me(client).status_code == 200
+
+    user.is_active = False
+    db.commit()
+
+    assert _me(client).status_code == 400
+
+
+def test_email_change_drops_the_old_address(client, db, make_user):
+    user = make_user()
+    assert _me(client).status_code == 200
+
+    user.email = "new@example.com"
+    db.commit()
+
+    assert _me(client).status_code == 401
+    assert _me(client, "new@example.com").status_code == 200
+
+
+def test_invalid_token_is_rejected(client, make_user):
+    make_user()
+    response = client.get("/api/auth/me", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+
+def test_zero_ttl_disables_caching(client, make_user, user_queries, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_CACHE_TTL_SECONDS", 0)
+    make_user()
+
+    _me(client)
+    _me(client)
+
+    assert len(user_queries) == 2
+    assert len(auth._user_cache) == 0
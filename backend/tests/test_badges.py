@@ -0,0 +1,77 @@
+import io
+import re
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image, ImageDraw
+from pypdf import PdfReader
+
+from app.services import badge_service
+from app.services.badge_service import BadgeService, _fit_lines, _load_font, _PdfStreamWriter, render_badge_page
+
+
+def _guest(i):
+    return SimpleNamespace(id=i, event_id=1, title="Ông", name=f"Nguyễn Văn Khách {i}", organization="EXP",
+                           qr_image_path=None, qr_code=f'{{"guest_id": {i}}}')
+
+
+@pytest.fixture(autouse=True)
+def _small_pages(monkeypatch):
+    monkeypatch.setattr(badge_service, "BADGE_DPI", 40)
+    monkeypatch.setattr(badge_service, "BADGE_WORKERS", 1)
+
+
+def test_fit_lines_wraps_and_truncates():
+    draw = ImageDraw.Draw(Image.new("L", (10, 10)))
+    font = _load_font(badge_service.BADGE_FONT_PATH, 20)
+    text = "Nguyễn Văn Anh Tuấn Hoàng Minh Quang"
+
+    lines = _fit_lines(draw, text, font, 120, 2)
+
+    assert len(lines) == 2
+    assert lines[-1].endswith("…")
+    assert all(draw.textlength(line, font=font) <= 120 for line in lines)
+    assert _fit_lines(draw, "Ngắn", font, 120, 2) == ["Ngắn"]
+
+
+def test_badge_page_is_a4_at_the_requested_dpi():
+    page = render_badge_page([badge_service.guest_to_badge(_guest(1))], per_page=12, dpi=40)
+
+    assert page.mode == "L"
+    assert page.size == (int(8.27 * 40), int(11.69 * 40))
+    # Có nội dung (QR, chữ) trên nền trắng
+    assert page.getextrema()[0] < 128
+
+
+def test_pdf_writer_produces_a_valid_document():
+    writer = _PdfStreamWriter()
+    data = b"".join(writer.add_image_page(4, 2, bytes(8)) for _ in range(3)) + writer.finish()
+
+    reader = PdfReader(io.BytesIO(data), strict=True)
+    assert len(reader.pages) == 3
+    assert [float(v) for v in reader.pages[0].mediabox] == pytest.approx([0, 0, 595.28, 841.89])
+
+    # Mỗi offset trong bảng xref trỏ đúng vào đầu object tương ứng
+    xref = data[data.rindex(b"xref\n"):]
+    offsets = re.findall(rb"(\d{10}) 00000 n ", xref)
+    for object_id, offset in enumerate(offsets, start=1):
+        assert data[int(offset):].startswith(f"{object_id} 0 obj".encode())
+
+
+@pytest.mark.parametrize("per_page, pages", [(8, 2), (12, 1)])
+def test_badges_pdf_has_one_page_per_sheet(per_page, pages):
+    data = b"".join(BadgeService().iter_badges_pdf([_guest(i) for i in range(10)], per_page=per_page))
+
+    reader = PdfReader(io.BytesIO(data))
+    assert len(reader.pages) == pages
+    image = next(iter(reader.pages[0].images))
+    assert image.image.size == (int(8.27 * 40), int(11.69 * 40))
+
+
+def test_badges_png_zip_numbers_pages():
+    data = b"".join(BadgeService().iter_badges_png([_guest(i) for i in range(10)], per_page=8))
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.namelist() == ["badges_001.png", "badges_002.png"]
+    assert Image.open(archive.open("badges_002.png")).size == (int(8.27 * 40), int(11.69 * 40))
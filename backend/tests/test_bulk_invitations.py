@@ -0,0 +1,44 @@
+import pytest
+
+
+@pytest.fixture
+def guest_ids(make_event, make_guest):
+    event = make_event()
+    return [make_guest(name=f"Khách {i}", event_id=event.id).id for i in range(5)]
+
+
+def test_bulk_response_is_compact_and_paginated(client, guest_ids, monkeypatch):
+    from app.routes import invitations
+    monkeypatch.setattr(invitations, "RESULTS_PAGE_SIZE", 2)
+
+    response = client.post("/api/invitations/generate-bulk", json={"guest_ids": guest_ids, "template": "classic"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["status"], body["rendered"], body["skipped"]) == ("completed", 5, 0)
+    assert body["results"]["total"] == 5
+    assert len(body["results"]["items"]) == 2
+    assert set(body["results"]["items"][0]) == {"guest_id", "filename", "status"}
+    assert "invitation_data" not in response.text
+
+    page = client.get(f"/api/invitations/jobs/{body['job_id']}/results", params={"skip": 2, "limit": 2}).json()
+    assert [item["guest_id"] for item in page["items"]] == guest_ids[2:4]
+
+
+def test_unchanged_guests_are_reported_as_skipped(client, guest_ids):
+    client.post("/api/invitations/generate-bulk", json={"guest_ids": guest_ids, "template": "classic"})
+
+    body = client.post("/api/invitations/generate-bulk",
+                       json={"guest_ids": guest_ids, "template": "classic"}).json()
+
+    assert (body["rendered"], body["skipped"]) == (0, 5)
+    skipped = client.get(f"/api/invitations/jobs/{body['job_id']}/results", params={"status": "skipped"}).json()
+    assert skipped["total"] == 5
+
+
+def test_results_page_size_is_capped(client, guest_ids):
+    body = client.post("/api/invitations/generate-bulk", json={"guest_ids": guest_ids[:1]}).json()
+
+    response = client.get(f"/api/invitations/jobs/{body['job_id']}/results", params={"limit": 501})
+
+    assert response.status_code == 422
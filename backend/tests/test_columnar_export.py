@@ -0,0 +1,36 @@
+from datetime import datetime
+from io import BytesIO
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.csv_service import CSVService, ARROW_COLUMN_TYPES
+
+GUESTS = [
+    {"id": 1, "name": "A", "checked_in": True, "check_in_time": datetime(2026, 12, 1, 18, 5), "event_id": 1},
+    {"id": 2, "name": "B", "checked_in": False, "check_in_time": None, "event_id": 1},
+    {"id": 3, "name": "C", "checked_in": None, "check_in_time": None, "event_id": None},
+]
+
+
+def test_parquet_is_typed_and_split_into_row_groups():
+    content = b"".join(CSVService().iter_guests_parquet(GUESTS, batch_rows=2))
+
+    parquet = pq.ParquetFile(BytesIO(content))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.column_names == list(ARROW_COLUMN_TYPES)
+    assert table.schema.field("id").type == pa.int64()
+    assert table.schema.field("checked_in").type == pa.bool_()
+    assert table.schema.field("check_in_time").type == pa.timestamp("us")
+    assert table.column("name").to_pylist() == ["A", "B", "C"]
+    assert table.column("check_in_time").to_pylist()[0] == datetime(2026, 12, 1, 18, 5)
+
+
+def test_arrow_stream_round_trips():
+    content = b"".join(CSVService().iter_guests_arrow(GUESTS, batch_rows=2))
+
+    table = pa.ipc.open_stream(content).read_all()
+    assert table.num_rows == 3
+    assert table.column("event_id").to_pylist() == [1, 1, None]
+    assert table.column("checked_in").to_pylist() == [True, False, None]
@@ -0,0 +1,98 @@
+import gzip
+
+import brotli
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.utils.compression import (
+    PrecompressedStaticFiles, accepted_encodings, minify_html, remove_compressed_variants, write_compressed_variants
+)
+
+HTML = b"<html><body><p>" + "Xin chào ".encode("utf-8") * 200 + b"</p></body></html>"
+
+
+def test_minify_collapses_whitespace_and_drops_comments():
+    html = "<div>\n    <!-- ghi chú -->\n    <p>  Xin   chào </p>\n</div>"
+    assert minify_html(html) == "<div> <p> Xin chào </p> </div>"
+
+
+def test_minify_keeps_preserved_blocks_and_conditional_comments():
+    html = ("<pre>  a\n   b</pre>\n<style>\n  p { color: red; }\n</style>"
+            "<!--[if IE]><p>ie</p><![endif]-->")
+    minified = minify_html(html)
+    assert "<pre>  a\n   b</pre>" in minified
+    assert "<style>\n  p { color: red; }\n</style>" in minified
+    assert "<!--[if IE]>" in minified
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", ["br", "gzip"]),
+    ("gzip", ["gzip"]),
+    ("br;q=0, gzip;q=0.5", ["gzip"]),
+    ("*", ["br", "gzip"]),
+    ("*;q=0, gzip", ["gzip"]),
+    ("identity", []),
+    ("", []),
+    ("gzip;q=abc", []),
+])
+def test_accepted_encodings(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+def test_variants_are_written_and_removed(tmp_path):
+    path = tmp_path / "invite.html"
+    path.write_bytes(HTML)
+
+    written = write_compressed_variants(str(path), HTML)
+
+    assert sorted(written) == [str(path) + ".br", str(path) + ".gz"]
+    assert gzip.decompress((tmp_path / "invite.html.gz").read_bytes()) == HTML
+    assert brotli.decompress((tmp_path / "invite.html.br").read_bytes()) == HTML
+
+    remove_compressed_variants(str(path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["invite.html"]
+
+
+@pytest.fixture
+def static_client(tmp_path):
+    (tmp_path / "invite.html").write_bytes(HTML)
+    write_compressed_variants(str(tmp_path / "invite.html"), HTML)
+    (tmp_path / "plain.html").write_bytes(HTML)
+    app = Starlette(routes=[Mount("/files", PrecompressedStaticFiles(directory=str(tmp_path)))])
+    return TestClient(app)
+
+
+def test_static_files_serve_the_preferred_variant(static_client):
+    response = static_client.get("/files/invite.html", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.content == HTML
+
+    gzipped = static_client.get("/files/invite.html", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.content == HTML
+
+
+def test_static_files_fall_back_to_the_original(static_client):
+    response = static_client.get("/files/invite.html", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == HTML
+
+    plain = static_client.get("/files/plain.html", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in plain.headers
+    assert "vary" not in plain.headers
+
+
+def test_static_files_revalidate_compressed_variant(static_client):
+    first = static_client.get("/files/invite.html", headers={"Accept-Encoding": "br"})
+
+    second = static_client.get("/files/invite.html",
+                               headers={"Accept-Encoding": "br", "If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 304
+    assert second.headers["vary"] == "Accept-Encoding"
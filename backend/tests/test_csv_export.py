@@ -0,0 +1,44 @@
+from app.services.csv_service import CSVService
+
+
+def _decode(chunks):
+    return b"".join(chunks).decode("utf-8")
+
+
+def test_csv_starts_with_bom_and_uses_pipe_without_header():
+    guests = [{"id": 1, "name": "Nguyễn Văn A", "organization": "EXP"}]
+
+    content = _decode(CSVService().iter_guests_csv(guests))
+
+    assert content == "\ufeff1|Nguyễn Văn A|EXP\n"
+
+
+def test_csv_header_and_empty_values():
+    guests = [{"id": 2, "name": "B", "organization": None}]
+
+    content = _decode(CSVService().iter_guests_csv(guests, columns=["id", "name", "organization"], header=True))
+
+    assert content.splitlines() == ["\ufeffID|Họ tên|Tổ chức", "2|B|"]
+
+
+def test_csv_is_yielded_in_chunks_of_rows():
+    guests = ({"id": i, "name": f"Khách {i}", "organization": "X"} for i in range(5))
+
+    chunks = list(CSVService().iter_guests_csv(guests, chunk_rows=2))
+
+    # BOM + 2 + 2 + 1 dòng
+    assert [chunk.count(b"\n") for chunk in chunks] == [0, 2, 2, 1]
+
+
+def test_csv_route_streams_guests_of_event(make_event, make_guest):
+    from app.routes.guests import _stream_guests
+
+    event = make_event()
+    other = make_event(name="Khác")
+    make_guest(name="B", event_id=event.id)
+    make_guest(name="A", event_id=event.id)
+    make_guest(name="C", event_id=other.id)
+
+    content = _decode(CSVService().iter_guests_csv(_stream_guests(event.id), columns=["name"]))
+
+    assert content == "\ufeffB\nA\n"
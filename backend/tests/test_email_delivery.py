@@ -0,0 +1,158 @@
+import smtplib
+import socket
+import time
+from email.message import EmailMessage
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.models.email_delivery import EmailDelivery
+from app.services import email_service
+from app.services.email_service import EmailDeliveryService, RateLimiter, SMTPConnectionPool
+
+
+class RecordingHandler:
+    """SMTP stub: ghi nhận email theo kết nối, trả lỗi theo hàng đợi `replies` nếu có"""
+
+    def __init__(self):
+        self.sessions = []
+        self.messages = []
+        self.replies = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if id(session) not in self.sessions:
+            self.sessions.append(id(session))
+        if self.replies:
+            return self.replies.pop(0)
+        self.messages.append(envelope.rcpt_tos)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    monkeypatch.setattr(email_service, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(email_service, "SMTP_PORT", port)
+    monkeypatch.setattr(email_service, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(email_service, "SMTP_USE_SSL", False)
+    monkeypatch.setattr(email_service, "SMTP_USERNAME", "")
+    yield handler
+    controller.stop()
+
+
+def _message(to="khach@example.com"):
+    message = EmailMessage()
+    message["From"] = "no-reply@example.com"
+    message["To"] = to
+    message["Subject"] = "Thiệp mời"
+    message.set_content("Xin chào")
+    return message
+
+
+def test_pool_reuses_connections(smtp_server):
+    pool = SMTPConnectionPool(size=1)
+    for _ in range(5):
+        with pool.connection() as smtp:
+            smtp.send_message(_message())
+    pool.close_all()
+
+    assert len(smtp_server.messages) == 5
+    assert len(smtp_server.sessions) == 1
+
+
+def test_pool_rotates_connections_after_message_limit(smtp_server, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_MESSAGES_PER_CONNECTION", 2)
+    pool = SMTPConnectionPool(size=1)
+    for _ in range(5):
+        with pool.connection() as smtp:
+            smtp.send_message(_message())
+    pool.close_all()
+
+    assert len(smtp_server.sessions) == 3
+
+
+def test_pool_keeps_connection_after_transient_error(smtp_server):
+    smtp_server.replies.append("451 Try again later")
+    pool = SMTPConnectionPool(size=1)
+
+    with pytest.raises(smtplib.SMTPDataError):
+        with pool.connection() as smtp:
+            smtp.send_message(_message())
+    with pool.connection() as smtp:
+        smtp.send_message(_message())
+    pool.close_all()
+
+    assert len(smtp_server.messages) == 1
+    assert len(smtp_server.sessions) == 1
+
+
+def test_rate_limiter_spaces_sends():
+    limiter = RateLimiter(per_minute=600)
+
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+
+    assert time.monotonic() - started >= 0.4 - 0.01
+
+
+def test_rate_limit_is_divided_between_sender_processes(monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_RATE_PER_MINUTE", 600)
+    monkeypatch.setattr(email_service, "EMAIL_SENDER_PROCESSES", 4)
+
+    assert EmailDeliveryService().rate_limiter.interval == pytest.approx(0.4)
+
+
+def _wait_for(predicate, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def delivery_service(smtp_server, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_RETRY_BASE_SECONDS", 0.1)
+    service = EmailDeliveryService()
+    yield service
+    assert _wait_for(lambda: service._dispatcher is None)
+
+
+def _delivery(db):
+    db.expire_all()
+    return db.query(EmailDelivery).one()
+
+
+def test_transient_failure_is_retried_with_backoff(db, make_event, make_guest, smtp_server, delivery_service):
+    event = make_event()
+    guest = make_guest(email="khach@example.com", event_id=event.id)
+    smtp_server.replies.append("451 Mailbox busy")
+
+    assert delivery_service.enqueue(db, [guest], template="classic")["queued"] == 1
+
+    assert _wait_for(lambda: _delivery(db).status == "sent")
+    delivery = _delivery(db)
+    assert delivery.attempts == 2
+    assert delivery.last_error is None
+    assert smtp_server.messages == [["khach@example.com"]]
+
+
+def test_permanent_failure_is_not_retried(db, make_event, make_guest, smtp_server, delivery_service):
+    event = make_event()
+    guest = make_guest(email="khach@example.com", event_id=event.id)
+    smtp_server.replies.append("550 No such user")
+
+    delivery_service.enqueue(db, [guest], template="classic")
+
+    assert _wait_for(lambda: _delivery(db).status == "failed")
+    delivery = _delivery(db)
+    assert delivery.attempts == 1
+    assert "No such user" in delivery.last_error
+    assert smtp_server.messages == []
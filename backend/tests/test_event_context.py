@@ -0,0 +1,52 @@
+import pytest
+
+from app.services import invitation_service
+from app.services.invitation_service import InvitationService
+
+EVENT = {"id": 1, "name": "Lễ kỷ niệm", "event_date": "2026-12-01T18:00:00", "location": "Hà Nội",
+         "address": "", "agenda": "18:00 - Đón khách\n18:30 - Khai mạc", "description": ""}
+
+
+def _guest(guest_id):
+    return {"id": guest_id, "title": None, "name": f"Khách {guest_id}", "role": None, "organization": None,
+            "tag": None, "email": None, "phone": None}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    invitation_service._event_contexts.clear()
+    builds = []
+    service = InvitationService(str(tmp_path))
+    build = service._build_event_context
+    monkeypatch.setattr(service, "_build_event_context", lambda event: builds.append(event['id']) or build(event))
+    service.builds = builds
+    return service
+
+
+def test_context_is_built_once_per_event_content(service):
+    first = service.generate_invitation_data(_guest(1), EVENT)
+    second = service.generate_invitation_data(_guest(2), dict(EVENT))
+
+    assert service.builds == [1]
+    assert first['event'] is second['event']
+    assert first['event']['program_outline'] == second['event']['program_outline']
+
+    service.generate_invitation_data(_guest(1), {**EVENT, "agenda": "19:00 - Gala"})
+    assert service.builds == [1, 1]
+
+
+def test_guest_branding_is_a_copy(service):
+    first = service.generate_invitation_data(_guest(1), EVENT)
+    first['branding']['primary_color'] = "#000000"
+
+    second = service.generate_invitation_data(_guest(2), EVENT)
+
+    assert second['branding']['primary_color'] != "#000000"
+
+
+def test_cached_context_matches_a_fresh_build(service):
+    cached = service.get_event_context(EVENT)
+
+    assert cached == service._build_event_context(EVENT)
+    assert cached['event']['venue']['name'] == "Hà Nội"
+    assert [item['time'] for item in cached['event']['program_outline']] == ["18:00", "18:30"]
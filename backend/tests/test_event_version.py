@@ -0,0 +1,57 @@
+from sqlalchemy import delete, update
+
+from app.models.event_version import UNSCOPED_EVENT_ID, EventVersion, get_data_version
+from app.models.guest import Guest
+
+
+def test_guest_change_bumps_its_event_version(db, make_event, make_guest):
+    event = make_event()
+    guest = make_guest(event_id=event.id)
+    before = get_data_version(db, event.id)
+
+    guest.name = "Đổi tên"
+    db.commit()
+
+    assert get_data_version(db, event.id) == before + 1
+
+
+def test_guest_without_event_changes_total_version(db, make_guest):
+    before = get_data_version(db)
+
+    make_guest(event_id=None)
+
+    assert get_data_version(db) > before
+    assert db.get(EventVersion, UNSCOPED_EVENT_ID).version >= 1
+
+
+def test_bulk_update_bumps_old_and_new_events(db, make_event, make_guest):
+    first, second = make_event(), make_event(name="Khác")
+    make_guest(event_id=first.id)
+    versions = {first.id: get_data_version(db, first.id), second.id: get_data_version(db, second.id)}
+
+    db.query(Guest).filter(Guest.event_id == first.id).update({"event_id": second.id}, synchronize_session=False)
+    db.commit()
+
+    assert get_data_version(db, first.id) == versions[first.id] + 1
+    assert get_data_version(db, second.id) == versions[second.id] + 1
+
+
+def test_bulk_delete_bumps_event_version(db, make_event, make_guest):
+    event = make_event()
+    make_guest(event_id=event.id)
+    before = get_data_version(db, event.id)
+
+    db.execute(delete(Guest).where(Guest.event_id == event.id))
+    db.commit()
+
+    assert get_data_version(db, event.id) == before + 1
+
+
+def test_bulk_update_matching_nothing_bumps_nothing(db, make_event):
+    event = make_event()
+    before = get_data_version(db)
+
+    db.execute(update(Guest).where(Guest.id == -1).values(name="x"))
+    db.commit()
+
+    assert get_data_version(db) == before
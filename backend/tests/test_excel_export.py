@@ -0,0 +1,30 @@
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+from app.services.csv_service import CSVService, DEFAULT_EXPORT_COLUMNS
+
+
+def test_parse_export_columns_defaults_and_selection():
+    service = CSVService()
+
+    assert service.parse_export_columns(None) == DEFAULT_EXPORT_COLUMNS
+    assert service.parse_export_columns(" name, email ,") == ["name", "email"]
+
+
+def test_parse_export_columns_rejects_unknown_column():
+    with pytest.raises(ValueError, match="hashed_password"):
+        CSVService().parse_export_columns("name,hashed_password")
+
+
+def test_excel_contains_only_selected_columns():
+    guests = [
+        {"id": 1, "name": "A", "email": "a@example.com", "organization": "EXP"},
+        {"id": 2, "name": "B", "email": None, "organization": "EXP"},
+    ]
+
+    content = b"".join(CSVService().iter_guests_excel(guests, columns=["name", "email"], header=True, chunk_size=512))
+
+    rows = list(load_workbook(BytesIO(content)).active.values)
+    assert rows == [("Họ tên", "Email"), ("A", "a@example.com"), ("B", None)]
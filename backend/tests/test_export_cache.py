@@ -0,0 +1,98 @@
+import os
+import threading
+
+import pytest
+
+from app.services.export_cache import ExportCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExportCache(cache_dir=str(tmp_path), max_bytes=10 ** 6, max_files=3)
+
+
+def test_make_key_is_stable_and_depends_on_every_parameter(cache):
+    key = cache.make_key(1, "csv", ["id", "name"], 3, header=True)
+
+    assert key == cache.make_key(1, "csv", ["id", "name"], 3, header=True)
+    assert key != cache.make_key(1, "csv", ["id", "name"], 4, header=True)
+    assert key != cache.make_key(1, "csv", ["name", "id"], 3, header=True)
+    assert key != cache.make_key(1, "csv", ["id", "name"], 3, header=False)
+    assert key != cache.make_key(2, "csv", ["id", "name"], 3, header=True)
+    assert cache.make_key(None, "csv", None, 0).startswith("csv_all_v0_")
+
+
+def test_content_is_produced_once_then_served_from_disk(cache):
+    calls = []
+
+    def produce():
+        calls.append(1)
+        yield b"a"
+        yield b"b"
+
+    assert b"".join(cache.iter_cached("k", "csv", produce)) == b"ab"
+    assert b"".join(cache.iter_cached("k", "csv", produce)) == b"ab"
+    assert len(calls) == 1
+    assert cache.get("k", "csv") is not None
+
+
+def test_first_chunk_is_streamed_before_the_export_finishes(cache, tmp_path):
+    release = threading.Event()
+
+    def produce():
+        yield b"header\n"
+        release.wait(5)
+        yield b"row\n"
+
+    stream = cache.iter_cached("k", "csv", produce)
+    assert next(stream) == b"header\n"
+    assert cache.get("k", "csv") is None
+
+    release.set()
+    assert b"".join(stream) == b"row\n"
+    assert (tmp_path / "k.csv").read_bytes() == b"header\nrow\n"
+
+
+def test_slow_reader_does_not_block_other_requests_for_same_key(cache):
+    slow = cache.iter_cached("k", "csv", lambda: iter([b"x" * 100, b"y"]))
+    next(slow)  # client tải chậm: mới nhận một khối
+
+    result = []
+    other = threading.Thread(target=lambda: result.append(b"".join(cache.iter_cached("k", "csv", lambda: iter([b"?"])))))
+    other.start()
+    other.join(timeout=5)
+
+    # Request trùng khoá stream nội dung của chính nó, không chờ và không ghi cache
+    assert not other.is_alive()
+    assert result == [b"?"]
+    assert b"".join(slow) == b"y"
+    assert b"".join(cache.iter_cached("k", "csv", lambda: iter([b"!"]))) == b"x" * 100 + b"y"
+
+
+def test_abandoned_stream_is_not_cached(cache, tmp_path):
+    stream = cache.iter_cached("k", "csv", lambda: iter([b"a", b"b"]))
+    next(stream)
+    stream.close()
+
+    assert os.listdir(tmp_path) == []
+    assert b"".join(cache.iter_cached("k", "csv", lambda: iter([b"c"]))) == b"c"
+
+
+def test_failed_export_leaves_no_files(cache, tmp_path):
+    def produce():
+        yield b"partial"
+        raise RuntimeError("db lỗi")
+
+    with pytest.raises(RuntimeError):
+        b"".join(cache.iter_cached("k", "csv", produce))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_files_are_evicted(cache, tmp_path):
+    for index in range(4):
+        b"".join(cache.iter_cached(f"k{index}", "csv", lambda: iter([b"data"])))
+        os.utime(tmp_path / f"k{index}.csv", (index, index))
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path)) == ["k1.csv", "k2.csv", "k3.csv"]
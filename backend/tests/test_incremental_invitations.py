@@ -0,0 +1,60 @@
+import os
+
+from app.services.invitation_service import DEFAULT_TEMPLATE, InvitationService, compute_invitation_hash
+
+EVENT = {"id": 1, "name": "Lễ kỷ niệm", "event_date": "2026-12-01T18:00:00", "location": "Hà Nội",
+         "address": "", "agenda": "", "description": ""}
+
+
+def _guest(guest_id, **fields):
+    guest = {"id": guest_id, "title": None, "name": f"Khách {guest_id}", "role": None, "organization": "EXP",
+             "tag": None, "email": None, "phone": None}
+    guest.update(fields)
+    return guest
+
+
+def test_hash_is_stable_and_tracks_every_input():
+    guest = _guest(1)
+    base = compute_invitation_hash(guest, EVENT, "classic")
+
+    assert base == compute_invitation_hash(dict(guest), dict(EVENT), "classic")
+    assert base != compute_invitation_hash(_guest(1, name="Tên mới"), EVENT, "classic")
+    assert base != compute_invitation_hash(guest, {**EVENT, "location": "Huế"}, "classic")
+    assert base != compute_invitation_hash(guest, EVENT, "modern")
+    assert base != compute_invitation_hash(guest, EVENT, "classic", {"logo": "other.png"})
+
+
+def test_unknown_template_hashes_like_the_default():
+    guest = _guest(1)
+    assert compute_invitation_hash(guest, EVENT, "nope") == compute_invitation_hash(guest, EVENT, DEFAULT_TEMPLATE)
+
+
+def test_regenerate_only_renders_changed_guests(tmp_path):
+    service = InvitationService(str(tmp_path))
+    guests = [_guest(1), _guest(2), _guest(3)]
+
+    first = service.regenerate_invitations(guests, EVENT, "classic")
+    assert sorted(r['guest_id'] for r in first["rendered"]) == [1, 2, 3]
+    assert first["skipped"] == []
+
+    guests[1] = _guest(2, name="Đổi tên")
+    os.remove(tmp_path / "invite_INV000003.html")
+    second = service.regenerate_invitations(guests, EVENT, "classic")
+    # Khách 2 đổi dữ liệu, khách 3 mất file; khách 1 giữ nguyên
+    assert sorted(r['guest_id'] for r in second["rendered"]) == [2, 3]
+    assert second["skipped"] == [1]
+
+    forced = service.regenerate_invitations(guests, EVENT, "classic", force=True)
+    assert sorted(r['guest_id'] for r in forced["rendered"]) == [1, 2, 3]
+    assert forced["skipped"] == []
+
+
+def test_prune_removes_invitations_of_deleted_guests(tmp_path):
+    service = InvitationService(str(tmp_path))
+    service.regenerate_invitations([_guest(1), _guest(2)], EVENT, "classic")
+
+    removed = service.prune_invitations([1], event_id=EVENT["id"])
+
+    assert removed == [{"filename": "invite_INV000002.html", "guest_id": 2}]
+    assert not (tmp_path / "invite_INV000002.html").exists()
+    assert (tmp_path / "invite_INV000001.html").exists()
@@ -0,0 +1,42 @@
+from app.services.invitation_service import INVITATION_ASSET_PATH, get_template_stylesheet, invitation_asset_url
+
+
+def test_current_fingerprint_is_cached_as_immutable(client):
+    url = invitation_asset_url("classic")
+    assert url == f"{INVITATION_ASSET_PATH}/classic.{get_template_stylesheet('classic')[1]}.css"
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    revalidated = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_outdated_fingerprint_is_served_without_long_cache(client):
+    response = client.get(f"{INVITATION_ASSET_PATH}/classic.0000000000.css")
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_unknown_assets_are_404(client):
+    for name in ("nope.abc.css", "classic.css", "classic.abc.js", "..%2Fmain.py"):
+        assert client.get(f"{INVITATION_ASSET_PATH}/{name}").status_code == 404
+
+
+def test_rendered_invitation_links_the_fingerprinted_stylesheet(tmp_path):
+    from app.services.invitation_service import InvitationService
+
+    service = InvitationService(str(tmp_path))
+    event = {"id": 1, "name": "Lễ kỷ niệm", "event_date": "2026-12-01T18:00:00", "location": "Hà Nội",
+             "address": "", "agenda": "", "description": ""}
+    guest = {"id": 1, "title": None, "name": "Khách", "role": None, "organization": None,
+             "tag": None, "email": None, "phone": None}
+
+    result = service.render_and_save(guest, event, "classic")
+
+    html = (tmp_path / result["filename"]).read_text(encoding="utf-8")
+    assert invitation_asset_url("classic") in html
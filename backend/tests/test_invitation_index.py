@@ -0,0 +1,71 @@
+import json
+
+from app.models.invitation import Invitation
+from app.services.invitation_service import MANIFEST_FILENAME, InvitationIndex
+
+
+def _result(guest_id, event_id=1, content_hash="h1", **fields):
+    result = {"guest_id": guest_id, "event_id": event_id, "template": "classic", "content_hash": content_hash,
+              "filename": f"invite_INV{guest_id:06d}.html", "file_path": f"x/invite_INV{guest_id:06d}.html",
+              "size": 10}
+    result.update(fields)
+    return result
+
+
+def test_upsert_inserts_then_updates_by_filename(db):
+    index = InvitationIndex()
+    index.upsert([_result(1), _result(2)])
+    index.upsert([_result(1, content_hash="h2", size=20)])
+
+    assert db.query(Invitation).count() == 2
+    assert index.get_hashes([1, 2, 3]) == {
+        1: ("invite_INV000001.html", "h2"),
+        2: ("invite_INV000002.html", "h1"),
+    }
+
+
+def test_find_orphans_and_remove_are_scoped_by_event(db):
+    index = InvitationIndex()
+    index.upsert([_result(1), _result(2), _result(3, event_id=2)])
+
+    orphans = index.find_orphans([1], event_id=1)
+    assert orphans == [("invite_INV000002.html", 2)]
+
+    index.remove([filename for filename, _ in orphans])
+    assert sorted(guest_id for (guest_id,) in db.query(Invitation.guest_id)) == [1, 3]
+
+
+def test_import_manifest_moves_entries_into_the_table(tmp_path):
+    (tmp_path / "invite_INV000001.html").write_text("<html></html>", encoding="utf-8")
+    manifest = {
+        "invite_INV000001.html": {"guest_id": 1, "event_id": 1, "template": "classic", "content_hash": "h1"},
+        # File không còn trên đĩa thì bỏ qua
+        "invite_INV000002.html": {"guest_id": 2, "event_id": 1, "template": "classic", "content_hash": "h2"},
+    }
+    (tmp_path / MANIFEST_FILENAME).write_text(json.dumps(manifest), encoding="utf-8")
+    index = InvitationIndex()
+
+    assert index.import_manifest(str(tmp_path)) == 1
+    assert index.get_hashes([1, 2]) == {1: ("invite_INV000001.html", "h1")}
+    assert not (tmp_path / MANIFEST_FILENAME).exists()
+    assert (tmp_path / (MANIFEST_FILENAME + ".imported")).exists()
+    assert index.import_manifest(str(tmp_path)) == 0
+
+
+def test_list_route_pages_and_filters(client):
+    InvitationIndex().upsert([_result(i, event_id=1 if i <= 3 else 2) for i in range(1, 6)])
+
+    body = client.get("/api/invitations/list", params={"event_id": 1, "limit": 2}).json()
+
+    assert body["total"] == 3
+    assert len(body["invitations"]) == 2
+    assert {item["event_id"] for item in body["invitations"]} == {1}
+    assert body["invitations"][0]["download_url"].startswith("/invitations/invite_INV")
+
+
+def test_delete_route_only_accepts_indexed_files(client, db):
+    InvitationIndex().upsert([_result(1)])
+
+    assert client.delete("/api/invitations/delete/..%2F..%2Fapp.db").status_code == 404
+    assert client.delete("/api/invitations/delete/invite_INV000001.html").status_code == 200
+    assert db.query(Invitation).count() == 0
@@ -0,0 +1,234 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import SessionLocal
+from app.models.invitation_job import InvitationJob, InvitationJobItem
+from app.services import invitation_job_service
+from app.services.invitation_job_service import InvitationJobRunner, JobOwnershipLost
+
+
+class FakeInvitationService:
+    """Render giả: ghi nhận khách mời, có thể chờ để mô phỏng lô chạy lâu"""
+
+    templates_dir = "templates/invitations"
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls = []
+
+    def regenerate_invitations(self, guests, event, template, force=False):
+        self.calls.append([guest['id'] for guest in guests])
+        time.sleep(self.delay)
+        return {
+            "rendered": [{"guest_id": g['id'], "filename": f"invite_INV{g['id']:06d}.html"} for g in guests],
+            "skipped": [],
+        }
+
+    def prune_invitations(self, guest_ids, event_id=None):
+        return []
+
+
+def _add_job(db, **fields):
+    values = dict(id="job-1", kind="generate_all", template="classic", status="running", total=0,
+                  processed=0, last_guest_id=0, rendered=0, skipped=0, removed=0, cancel_requested=False)
+    values.update(fields)
+    job = InvitationJob(**values)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def _wait(runner, job_id, timeout=10):
+    thread = runner._threads.get(job_id)
+    if thread is not None:
+        thread.join(timeout)
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    runner = InvitationJobRunner(invitation_service=FakeInvitationService())
+    started = []
+    monkeypatch.setattr(runner, "_start_thread", started.append)
+    runner.started = started
+    return runner
+
+
+def test_resume_refuses_job_held_by_another_live_process(db, runner):
+    _add_job(db, owner="other-host:1:abcd", heartbeat_at=datetime.utcnow())
+
+    assert runner.resume(db, db.get(InvitationJob, "job-1")) is False
+
+    db.expire_all()
+    job = db.get(InvitationJob, "job-1")
+    assert job.owner == "other-host:1:abcd"
+    assert job.status == "running"
+    assert runner.started == []
+
+
+def test_resume_route_returns_409_for_running_job(db, client):
+    from app.routes import invitations
+
+    _add_job(db, owner="other-host:1:abcd", heartbeat_at=datetime.utcnow())
+
+    response = client.post("/api/invitations/jobs/job-1/resume")
+
+    assert response.status_code == 409
+    assert invitations.job_runner.owner != "other-host:1:abcd"
+
+
+def test_resume_takes_over_stale_job_and_resets_it(db, runner):
+    _add_job(db, status="failed", error="boom", cancel_requested=True, owner="other-host:1:abcd",
+             heartbeat_at=datetime.utcnow() - timedelta(seconds=invitation_job_service.JOB_STALE_SECONDS + 5))
+
+    assert runner.resume(db, db.get(InvitationJob, "job-1")) is True
+
+    db.expire_all()
+    job = db.get(InvitationJob, "job-1")
+    assert (job.owner, job.status, job.error, job.cancel_requested) == (runner.owner, "queued", None, False)
+    assert runner.started == ["job-1"]
+
+
+def test_second_resume_in_same_process_is_refused(db, runner):
+    _add_job(db, status="cancelled")
+
+    assert runner.resume(db, db.get(InvitationJob, "job-1")) is True
+    assert runner.resume(db, db.get(InvitationJob, "job-1")) is False
+    assert runner.started == ["job-1"]
+
+
+def test_checkpoint_aborts_without_writing_when_ownership_is_lost(db, runner, make_guest):
+    guest = make_guest()
+    _add_job(db, owner="other-host:1:abcd", heartbeat_at=datetime.utcnow())
+    job = db.get(InvitationJob, "job-1")
+
+    items = runner._item_rows(job.id, [{"guest_id": guest.id, "filename": "invite.html"}])
+    with pytest.raises(JobOwnershipLost):
+        runner._checkpoint(db, job, [guest], rendered=1, items=items)
+
+    db.expire_all()
+    assert db.get(InvitationJob, "job-1").processed == 0
+    assert db.query(InvitationJobItem).count() == 0
+
+
+def test_job_stops_quietly_after_takeover(db, make_event, make_guest, monkeypatch):
+    event = make_event()
+    for i in range(3):
+        make_guest(name=f"Khách {i}", event_id=event.id)
+    monkeypatch.setattr(invitation_job_service, "JOB_BATCH_SIZE", 1)
+    runner = InvitationJobRunner(invitation_service=FakeInvitationService(delay=0.2))
+
+    job = runner.create_job(db, event.id, "classic")
+    time.sleep(0.1)
+    # Process khác nhận job khi lô đầu đang chạy
+    with SessionLocal() as other:
+        other.query(InvitationJob).filter(InvitationJob.id == job.id).update({"owner": "other-host:1:abcd"})
+        other.commit()
+    _wait(runner, job.id)
+
+    db.expire_all()
+    job = db.get(InvitationJob, job.id)
+    assert job.owner == "other-host:1:abcd"
+    assert job.status == "running"
+    assert job.processed == 0
+    assert job.error is None
+
+
+def test_job_completes_and_releases_ownership(db, make_event, make_guest, monkeypatch):
+    event = make_event()
+    for i in range(3):
+        make_guest(name=f"Khách {i}", event_id=event.id)
+    monkeypatch.setattr(invitation_job_service, "JOB_BATCH_SIZE", 2)
+    service = FakeInvitationService()
+    runner = InvitationJobRunner(invitation_service=service)
+
+    job = runner.create_job(db, event.id, "classic")
+    _wait(runner, job.id)
+
+    db.expire_all()
+    job = db.get(InvitationJob, job.id)
+    assert (job.status, job.owner, job.processed, job.rendered) == ("completed", None, 3, 3)
+    assert [len(batch) for batch in service.calls] == [2, 1]
+
+
+def test_heartbeat_is_refreshed_during_a_long_batch(db, make_event, make_guest, monkeypatch):
+    event = make_event()
+    make_guest(event_id=event.id)
+    monkeypatch.setattr(invitation_job_service, "JOB_HEARTBEAT_SECONDS", 0.05)
+    runner = InvitationJobRunner(invitation_service=FakeInvitationService(delay=0.5))
+    beats = set()
+    stop = threading.Event()
+
+    def watch():
+        while not stop.wait(0.02):
+            with SessionLocal() as session:
+                job = session.get(InvitationJob, "job-watch")
+                if job is not None and job.status == "running" and job.processed == 0:
+                    beats.add(job.heartbeat_at)
+
+    job = _add_job(db, id="job-watch", event_id=event.id, status="queued", total=1)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    try:
+        assert runner.resume(db, job) is True
+        _wait(runner, "job-watch")
+    finally:
+        stop.set()
+        watcher.join()
+
+    # Nhiều heartbeat khác nhau trước checkpoint đầu tiên
+    assert len(beats) >= 3
+
+
+class FakePdfService:
+    """Render PDF giả: khách mời trong failing báo lỗi"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def render_pdfs(self, job_id, items):
+        for guest_id, _ in items:
+            result = {"guest_id": guest_id, "filename": f"invite_INV{guest_id:06d}.pdf"}
+            if guest_id in self.failing:
+                result["error"] = "font thiếu"
+            else:
+                result["size"] = 100
+            yield result
+
+
+def test_pdf_render_errors_are_failures_not_skips(db, make_event, make_guest, client, monkeypatch):
+    from app.routes import invitations
+
+    event = make_event()
+    guests = [make_guest(name=f"Khách {i}", event_id=event.id) for i in range(3)]
+    runner = InvitationJobRunner(invitation_service=FakeInvitationService(),
+                                 pdf_service=FakePdfService(failing=[guests[1].id]))
+    monkeypatch.setattr(invitations, "job_runner", runner)
+
+    job = runner.create_job(db, event.id, "classic", kind="pdf_export", options={"per_sheet": 1})
+    _wait(runner, job.id)
+
+    db.expire_all()
+    job = db.get(InvitationJob, job.id)
+    assert (job.status, job.rendered, job.failed, job.skipped) == ("partial", 2, 1, 0)
+
+    failed = client.get(f"/api/invitations/jobs/{job.id}/results", params={"status": "failed"}).json()
+    assert failed["items"] == [{"guest_id": guests[1].id, "filename": f"invite_INV{guests[1].id:06d}.pdf",
+                                "status": "failed", "error": "font thiếu"}]
+    assert client.get(f"/api/invitations/jobs/{job.id}").json()["failed"] == 1
+    assert client.post(f"/api/invitations/jobs/{job.id}/resume").status_code == 400
+
+
+def test_pdf_export_without_errors_completes(db, make_event, make_guest):
+    event = make_event()
+    make_guest(event_id=event.id)
+    runner = InvitationJobRunner(invitation_service=FakeInvitationService(), pdf_service=FakePdfService())
+
+    job = runner.create_job(db, event.id, "classic", kind="pdf_export")
+    _wait(runner, job.id)
+
+    db.expire_all()
+    job = db.get(InvitationJob, job.id)
+    assert (job.status, job.rendered, job.failed) == ("completed", 1, 0)
@@ -0,0 +1,60 @@
+import pytest
+
+from app.routes import invitations
+
+
+@pytest.fixture(autouse=True)
+def _empty_preview_cache():
+    invitations._preview_cache.clear()
+    yield
+    invitations._preview_cache.clear()
+
+
+def _preview(client, event_id, **customization):
+    return client.post("/api/invitations/preview",
+                       json={"template": "classic", "event_id": event_id, "customization": customization})
+
+
+def test_sample_preview_revalidates_with_etag(client):
+    first = client.get("/api/invitations/preview")
+
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    assert "html_content" in first.json()
+
+    second = client.get("/api/invitations/preview", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_preview_is_rendered_once_per_normalized_customization(client, make_event, monkeypatch):
+    event = make_event()
+    calls = []
+    render = invitations._render_preview
+    monkeypatch.setattr(invitations, "_render_preview", lambda *args: calls.append(args) or render(*args))
+
+    first = _preview(client, event.id, primaryColor="#AA0000", unused="x")
+    second = _preview(client, event.id, primaryColor=" #aa0000 ")
+
+    assert len(calls) == 1
+    assert second.headers["etag"] == first.headers["etag"]
+    assert first.json()["invitation_data"]["branding"]["primary_color"] == "#aa0000"
+
+    _preview(client, event.id, primaryColor="#00aa00")
+    assert len(calls) == 2
+
+
+def test_event_change_invalidates_preview(client, db, make_event):
+    event = make_event()
+    first = _preview(client, event.id)
+
+    event.location = "Nhà hát lớn"
+    db.commit()
+    second = _preview(client, event.id)
+
+    assert second.headers["etag"] != first.headers["etag"]
+    assert "Nhà hát lớn" in second.json()["html_content"]
+
+
+def test_preview_for_missing_event_is_404(client):
+    assert _preview(client, 999).status_code == 404
@@ -0,0 +1,28 @@
+from app.services.invitation_service import (
+    DEFAULT_TEMPLATE, TEMPLATE_TYPES, InvitationService, get_invitation_template, template_env
+)
+
+
+def test_templates_are_compiled_once_and_reused():
+    for template_type in TEMPLATE_TYPES:
+        assert get_invitation_template(template_type) is get_invitation_template(template_type)
+
+
+def test_unknown_template_falls_back_to_default():
+    assert get_invitation_template("../../etc/passwd") is get_invitation_template(DEFAULT_TEMPLATE)
+
+
+def test_render_uses_shared_environment_filters():
+    assert "format_date" in template_env.filters
+    service = InvitationService()
+    data = service.generate_invitation_data(
+        {"id": 1, "title": "Ông", "name": "Nguyễn Văn A", "role": None, "organization": "EXP",
+         "tag": None, "email": None, "phone": None},
+        {"id": 1, "name": "Lễ kỷ niệm", "event_date": "2026-12-01T18:00:00", "location": "Hà Nội",
+         "address": "", "agenda": "", "description": ""},
+    )
+
+    html = service.generate_html_invitation(data, "modern")
+
+    assert "Nguyễn Văn A" in html
+    assert "01/12/2026" in html
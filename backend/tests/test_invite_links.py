@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.invite_link import InviteLink
+from app.services import invite_service
+from app.services.invite_service import (
+    create_invite_token, get_or_create_invite_link, is_invite_code, resolve_invite_code, revoke_invite_links
+)
+
+
+@pytest.fixture(autouse=True)
+def _empty_code_cache():
+    invite_service._code_cache.clear()
+    yield
+    invite_service._code_cache.clear()
+
+
+@pytest.fixture
+def guest(make_event, make_guest):
+    return make_guest(event_id=make_event().id)
+
+
+def test_link_is_reused_until_revoked(db, guest):
+    link = get_or_create_invite_link(db, guest.id, guest.event_id)
+
+    assert len(link.code) == 11 and is_invite_code(link.code)
+    assert not is_invite_code(create_invite_token(guest.id, guest.event_id))
+    assert get_or_create_invite_link(db, guest.id, guest.event_id).code == link.code
+
+    assert revoke_invite_links(db, guest.id) == 1
+    assert get_or_create_invite_link(db, guest.id, guest.event_id).code != link.code
+
+
+def test_resolve_hits_the_database_once(db, guest, monkeypatch):
+    code = get_or_create_invite_link(db, guest.id, guest.event_id).code
+    queries = []
+    query = db.query
+    monkeypatch.setattr(db, "query", lambda *args: queries.append(args) or query(*args))
+
+    assert resolve_invite_code(db, code) == (guest.id, guest.event_id)
+    assert resolve_invite_code(db, code) == (guest.id, guest.event_id)
+    assert len(queries) == 1
+    assert resolve_invite_code(db, "khongtontai") is None
+
+
+def test_revoke_evicts_the_cached_code(db, guest):
+    code = get_or_create_invite_link(db, guest.id, guest.event_id).code
+    resolve_invite_code(db, code)
+
+    revoke_invite_links(db, guest.id)
+
+    assert resolve_invite_code(db, code) is None
+
+
+def test_expired_code_does_not_resolve(db, guest):
+    link = get_or_create_invite_link(db, guest.id, guest.event_id)
+    resolve_invite_code(db, link.code)
+
+    link.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    invite_service._code_cache.clear()
+    assert resolve_invite_code(db, link.code) is None
+
+
+def test_invite_link_routes(client, db, guest):
+    created = client.post(f"/api/guests/{guest.id}/invite_link").json()
+
+    assert created["url"] == f"/i/{created['token']}"
+    assert 0 < created["expires_in"] <= invite_service.INVITE_EXPIRES_IN_SECONDS
+    assert client.post(f"/api/guests/{guest.id}/invite_link").json()["token"] == created["token"]
+
+    public = client.get(f"/api/guests/invite/{created['token']}")
+    assert public.status_code == 200
+    assert public.json()["id"] == guest.id
+
+    assert client.delete(f"/api/guests/{guest.id}/invite_link").json()["revoked"] == 1
+    assert client.get(f"/api/guests/invite/{created['token']}").status_code == 404
+    assert client.get(f"/public/invitations/{created['token']}").status_code == 404
+    assert db.query(InviteLink).filter(InviteLink.revoked.is_(True)).count() == 1
+
+
+def test_legacy_jwt_links_still_resolve(client, guest):
+    token = create_invite_token(guest.id, guest.event_id)
+
+    assert client.get(f"/api/guests/invite/{token}").json()["id"] == guest.id
+
+
+def test_invite_link_for_missing_guest_is_404(client):
+    assert client.post("/api/guests/999/invite_link").status_code == 404
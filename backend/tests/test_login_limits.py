@@ -0,0 +1,120 @@
+import ipaddress
+from types import SimpleNamespace
+
+import pytest
+
+from app import auth
+from app.auth import AttemptLimiter, get_client_ip
+
+
+@pytest.fixture(autouse=True)
+def _fresh_limiters(monkeypatch):
+    monkeypatch.setattr(auth, "ip_limiter", AttemptLimiter(100, 300))
+    monkeypatch.setattr(auth, "account_limiter", AttemptLimiter(3, 300))
+
+
+def test_limiter_blocks_after_limit_until_window_ends(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+    limiter = AttemptLimiter(2, 60)
+
+    limiter.hit("k")
+    assert limiter.retry_after("k") == 0
+    limiter.hit("k")
+    assert limiter.retry_after("k") == 61
+
+    now[0] += 30
+    assert limiter.retry_after("k") == 31
+    assert limiter.retry_after("other") == 0
+
+
+def test_limiter_reset_and_disabled():
+    limiter = AttemptLimiter(1, 60)
+    limiter.hit("k")
+    limiter.reset("k")
+    assert limiter.retry_after("k") == 0
+
+    disabled = AttemptLimiter(0, 60)
+    for _ in range(5):
+        disabled.hit("k")
+    assert disabled.retry_after("k") == 0
+
+
+def _request(peer, real_ip=None, forwarded_for=None):
+    headers = {"x-real-ip": real_ip} if real_ip else {}
+    if forwarded_for:
+        headers["x-forwarded-for"] = forwarded_for
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+def test_real_ip_header_is_ignored_unless_peer_is_a_trusted_proxy(monkeypatch):
+    assert get_client_ip(_request("203.0.113.5", "10.0.0.1")) == "203.0.113.5"
+
+    monkeypatch.setattr(auth, "TRUSTED_PROXIES", [ipaddress.ip_network("172.16.0.0/12")])
+    assert get_client_ip(_request("172.18.0.4", "198.51.100.7")) == "198.51.100.7"
+    assert get_client_ip(_request("203.0.113.5", "10.0.0.1")) == "203.0.113.5"
+    assert get_client_ip(_request("testclient", "10.0.0.1")) == "testclient"
+
+
+def test_forwarded_for_is_read_from_the_right_past_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(auth, "TRUSTED_PROXIES", [ipaddress.ip_network("172.28.0.10"),
+                                                  ipaddress.ip_network("172.28.0.11")])
+
+    # Phần bên trái do client tự gửi: chỉ lấy địa chỉ do proxy tin cậy thêm vào
+    assert get_client_ip(_request("172.28.0.10", forwarded_for="1.2.3.4, 198.51.100.7")) == "198.51.100.7"
+    assert get_client_ip(_request("172.28.0.10", forwarded_for="198.51.100.7, 172.28.0.11")) == "198.51.100.7"
+    assert get_client_ip(_request("172.28.0.10", "198.51.100.9")) == "198.51.100.9"
+    assert get_client_ip(_request("172.28.0.1", forwarded_for="1.2.3.4")) == "172.28.0.1"
+
+
+def _login(client, email, password, real_ip="198.51.100.7", forwarded_for=None):
+    headers = {"X-Real-IP": real_ip}
+    if forwarded_for:
+        headers["X-Forwarded-For"] = forwarded_for
+    return client.post("/api/auth/login", json={"email": email, "password": password}, headers=headers)
+
+
+def test_failed_logins_lock_the_account(client, make_user):
+    make_user()
+    for _ in range(3):
+        assert _login(client, "admin@example.com", "wrong").status_code == 401
+
+    response = _login(client, "admin@example.com", "secret123")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+
+
+def test_spoofed_real_ip_does_not_escape_the_ip_limit(client, monkeypatch):
+    monkeypatch.setattr(auth, "ip_limiter", AttemptLimiter(2, 300))
+
+    statuses = [_login(client, f"u{i}@example.com", "x", real_ip=f"10.0.0.{i}").status_code for i in range(3)]
+
+    assert statuses == [401, 401, 429]
+
+
+def test_unknown_account_still_runs_bcrypt(client, monkeypatch):
+    checked = []
+    verify = auth.verify_password
+    monkeypatch.setattr(auth, "verify_password", lambda plain, hashed: checked.append(hashed) or verify(plain, hashed))
+
+    assert _login(client, "nobody@example.com", "whatever").status_code == 401
+    assert checked == [auth._DUMMY_PASSWORD_HASH]
+
+
+def test_successful_logins_do_not_use_up_the_ip_limit(client, make_user, monkeypatch):
+    monkeypatch.setattr(auth, "ip_limiter", AttemptLimiter(2, 300))
+    make_user()
+
+    statuses = [_login(client, "admin@example.com", "secret123").status_code for _ in range(5)]
+
+    assert statuses == [200] * 5
+
+
+def test_clients_behind_a_trusted_proxy_get_separate_buckets(client, monkeypatch):
+    monkeypatch.setattr(auth, "ip_limiter", AttemptLimiter(1, 300))
+    # TestClient kết nối từ "testclient": coi như đó là nginx
+    monkeypatch.setattr(auth, "_is_trusted_proxy", lambda host: host == "testclient")
+
+    assert _login(client, "a@example.com", "x", forwarded_for="198.51.100.1").status_code == 401
+    assert _login(client, "b@example.com", "x", forwarded_for="198.51.100.1").status_code == 429
+    assert _login(client, "c@example.com", "x", forwarded_for="198.51.100.2").status_code == 401
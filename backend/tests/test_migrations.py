@@ -0,0 +1,68 @@
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect
+
+from app.database import Base as UserBase
+from app.migrate import get_config
+from app.models.base import Base
+
+
+@pytest.fixture
+def empty_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/migrate.db")
+    yield engine
+    engine.dispose()
+
+
+def _run(engine, action, *args):
+    config = get_config(configure_logger=False)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        action(config, *args)
+
+
+def _drift(engine):
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"compare_type": True})
+        return compare_metadata(context, [UserBase.metadata, Base.metadata])
+
+
+def _head():
+    return ScriptDirectory.from_config(get_config(configure_logger=False)).get_current_head()
+
+
+def _current(engine):
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def test_upgrade_empty_database_matches_models(empty_engine):
+    _run(empty_engine, command.upgrade, "head")
+
+    assert _current(empty_engine) == _head()
+    assert _drift(empty_engine) == []
+    indexes = {index["name"] for index in inspect(empty_engine).get_indexes("guests")}
+    assert {"ix_guests_event_id_id", "ix_guests_event_checkin_rsvp"} <= indexes
+
+
+def test_index_migration_round_trips(empty_engine):
+    _run(empty_engine, command.upgrade, "head")
+    _run(empty_engine, command.downgrade, "0001")
+
+    assert "ix_guests_event_id_id" not in {index["name"] for index in inspect(empty_engine).get_indexes("guests")}
+
+    _run(empty_engine, command.upgrade, "head")
+    assert _drift(empty_engine) == []
+
+
+def test_database_created_with_create_all_is_adopted(empty_engine):
+    UserBase.metadata.create_all(empty_engine)
+    Base.metadata.create_all(empty_engine)
+
+    _run(empty_engine, command.upgrade, "head")
+
+    assert _current(empty_engine) == _head()
+    assert _drift(empty_engine) == []
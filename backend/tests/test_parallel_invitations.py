@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from app.services import invitation_service
+from app.utils.helpers import process_pool_context
+
+EVENT = {"id": 1, "name": "Lễ kỷ niệm", "event_date": "2026-12-01T18:00:00", "location": "Hà Nội",
+         "address": "", "agenda": "", "description": ""}
+
+
+def _guests(count):
+    return [
+        {"id": i, "title": None, "name": f"Khách {i}", "role": None, "organization": "EXP",
+         "tag": None, "email": None, "phone": None}
+        for i in range(1, count + 1)
+    ]
+
+
+def test_process_pools_use_spawn_by_default():
+    assert process_pool_context().get_start_method() == "spawn"
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(invitation_service, "INVITATION_WORKERS", 2)
+    monkeypatch.setattr(invitation_service, "INVITATION_CHUNK_SIZE", 2)
+    yield
+    pool = invitation_service._process_pool
+    invitation_service._process_pool = None
+    if pool is not None:
+        pool.shutdown()
+
+
+def test_generate_invitations_renders_every_guest_on_the_pool(small_chunks, tmp_path):
+    service = invitation_service.InvitationService(str(tmp_path))
+
+    results = list(service.generate_invitations(_guests(5), EVENT, "classic"))
+
+    assert invitation_service._process_pool is not None
+    assert sorted(result["guest_id"] for result in results) == [1, 2, 3, 4, 5]
+    assert all("invitation_data" not in result for result in results)
+    for result in results:
+        assert os.path.getsize(tmp_path / result["filename"]) == result["size"]
@@ -0,0 +1,81 @@
+import io
+import zipfile
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from app.services.pdf_service import (
+    A4_HEIGHT, A4_WIDTH, NUP_LAYOUTS, PDFExportService, nup_placement, nup_sheet_size
+)
+
+
+def test_two_up_sheet_is_landscape_and_others_portrait():
+    assert nup_sheet_size(2) == (A4_HEIGHT, A4_WIDTH)
+    for per_sheet in (1, 4, 8):
+        assert nup_sheet_size(per_sheet) == (A4_WIDTH, A4_HEIGHT)
+
+
+@pytest.mark.parametrize("per_sheet", sorted(NUP_LAYOUTS))
+def test_every_a4_page_fits_inside_its_cell(per_sheet):
+    cols, rows, _ = NUP_LAYOUTS[per_sheet]
+    sheet_width, sheet_height = nup_sheet_size(per_sheet)
+    cell_width, cell_height = sheet_width / cols, sheet_height / rows
+
+    for slot in range(per_sheet):
+        scale, x, y = nup_placement(per_sheet, slot, A4_WIDTH, A4_HEIGHT)
+        col, row = slot % cols, slot // cols
+        cell_left, cell_bottom = col * cell_width, sheet_height - (row + 1) * cell_height
+        assert cell_left - 1e-6 <= x and x + A4_WIDTH * scale <= cell_left + cell_width + 1e-6
+        assert cell_bottom - 1e-6 <= y and y + A4_HEIGHT * scale <= cell_bottom + cell_height + 1e-6
+
+
+def test_four_up_fills_rows_from_the_top_left():
+    scale, x, y = nup_placement(4, 0, A4_WIDTH, A4_HEIGHT)
+    assert scale == pytest.approx(0.5)
+    assert (x, y) == pytest.approx((0, A4_HEIGHT / 2))
+
+    assert nup_placement(4, 1, A4_WIDTH, A4_HEIGHT)[1:] == pytest.approx((A4_WIDTH / 2, A4_HEIGHT / 2))
+    assert nup_placement(4, 2, A4_WIDTH, A4_HEIGHT)[1:] == pytest.approx((0, 0))
+
+
+def test_wide_page_is_centred_vertically_in_its_cell():
+    scale, x, y = nup_placement(1, 0, A4_WIDTH, A4_WIDTH / 2)
+    assert scale == pytest.approx(1)
+    assert x == pytest.approx(0)
+    assert y == pytest.approx((A4_HEIGHT - A4_WIDTH / 2) / 2)
+
+
+@pytest.fixture
+def pdf_service(tmp_path):
+    service = PDFExportService(str(tmp_path))
+    job_dir = service.job_dir("job")
+    filenames = []
+    for i in range(5):
+        writer = PdfWriter()
+        writer.add_blank_page(width=A4_WIDTH, height=A4_HEIGHT)
+        filename = f"invite_INV{i:06d}.pdf"
+        with open(f"{job_dir}/{filename}", "wb") as f:
+            writer.write(f)
+        filenames.append(filename)
+    service.filenames = filenames
+    return service
+
+
+@pytest.mark.parametrize("per_sheet, sheets", [(1, 5), (2, 3), (4, 2), (8, 1)])
+def test_print_file_has_one_sheet_per_group(pdf_service, per_sheet, sheets):
+    path = pdf_service.build_print_file("job", pdf_service.filenames, per_sheet)
+
+    pages = PdfReader(path).pages
+    assert len(pages) == sheets
+    width, height = nup_sheet_size(per_sheet)
+    assert float(pages[0].mediabox.width) == pytest.approx(width)
+    assert float(pages[0].mediabox.height) == pytest.approx(height)
+
+
+def test_zip_contains_every_pdf_uncompressed(pdf_service):
+    pdf_service.build_print_file("job", pdf_service.filenames, 4)
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(pdf_service.iter_zip("job"))))
+
+    assert sorted(archive.namelist()) == sorted(pdf_service.filenames + ["print_4up.pdf"])
+    assert {info.compress_type for info in archive.infolist()} == {zipfile.ZIP_STORED}
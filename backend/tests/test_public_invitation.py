@@ -0,0 +1,61 @@
+import pytest
+
+from app.services.invitation_service import DEFAULT_TEMPLATE
+from app.services.invite_service import create_invite_token
+from app.utils.shared_cache import shared_cache
+
+
+@pytest.fixture
+def token(make_event, make_guest):
+    event = make_event()
+    guest = make_guest(event_id=event.id)
+    return create_invite_token(guest.id, event.id)
+
+
+def _page_keys():
+    return [key for key in shared_cache.local._data._data if key.startswith("invitation:")]
+
+
+def test_page_is_rendered_with_etag_and_revalidates(client, token):
+    response = client.get(f"/public/invitations/{token}")
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert "<html" in response.text.lower()
+
+    etag = response.headers["etag"]
+    revalidated = client.get(f"/public/invitations/{token}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+
+def test_unknown_template_shares_the_default_cache_entry(client, token):
+    default = client.get(f"/public/invitations/{token}", params={"template": DEFAULT_TEMPLATE})
+    for name in ("nope", "x" * 200, "../../etc"):
+        response = client.get(f"/public/invitations/{token}", params={"template": name})
+        assert response.headers["etag"] == default.headers["etag"]
+
+    assert len(_page_keys()) == 1
+
+
+def test_guest_change_invalidates_the_page(client, token, db):
+    from app.models.guest import Guest
+
+    first = client.get(f"/public/invitations/{token}")
+    guest = db.query(Guest).one()
+    guest.name = "Tên mới"
+    db.commit()
+
+    second = client.get(f"/public/invitations/{token}")
+    assert second.headers["etag"] != first.headers["etag"]
+    assert "Tên mới" in second.text
+
+
+def test_invalid_token_is_404(client):
+    assert client.get("/public/invitations/not.a.token").status_code == 404
+    assert client.get("/public/invitations/unknowncode").status_code == 404
+
+
+def test_spa_invite_path_is_left_to_the_frontend(client, token):
+    # /i/{token} là trang React (RSVP, QR check-in); backend không được chiếm đường dẫn này
+    assert client.get(f"/i/{token}").status_code == 404
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from app.utils import shared_cache as shared_cache_module
+from app.utils.shared_cache import SharedCache, event_tag
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _cache(server, **options):
+    return SharedCache(redis_client=fakeredis.FakeRedis(server=server), **options)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_subscriber_starts_on_first_use(server):
+    cache = _cache(server)
+    assert cache._subscriber is None
+
+    cache.get("missing")
+
+    assert cache._subscriber.is_alive()
+
+
+def test_values_are_shared_through_redis(server):
+    writer, reader = _cache(server), _cache(server)
+
+    writer.set("stats", {"total": 3}, tags=[event_tag(1)])
+
+    assert reader.get("stats") == {"total": 3}
+    assert reader.local.get("stats") == {"total": 3}
+
+
+def test_invalidate_events_removes_tagged_keys_only(server):
+    cache = _cache(server)
+    cache.set("event-1", 1, tags=[event_tag(1)])
+    cache.set("event-2", 2, tags=[event_tag(2)])
+    cache.set("summary", 0, tags=[event_tag(None)])
+
+    cache.invalidate_events([1])
+    cache.local.clear()
+
+    assert cache.get("event-1") is None
+    assert cache.get("summary") is None
+    assert cache.get("event-2") == 2
+
+
+def test_other_workers_evict_their_local_copy(server):
+    first, second = _cache(server), _cache(server)
+    first.set("stats", "old", tags=[event_tag(1)])
+    assert second.get("stats") == "old"
+    time.sleep(0.2)  # chờ thread lắng nghe đăng ký kênh
+
+    first.invalidate_tags(event_tag(1))
+
+    assert _wait_for(lambda: second.local.get("stats") is None)
+    assert second.get("stats") is None
+
+
+def test_invalidation_from_the_event_loop_runs_in_the_background(server, monkeypatch):
+    cache = _cache(server)
+    cache.set("stats", "old", tags=[event_tag(1)])
+    loop_thread = threading.get_ident()
+    release = threading.Event()
+    redis_threads = []
+    pipeline = cache.redis.pipeline
+
+    def slow_pipeline():
+        redis_threads.append(threading.get_ident())
+        release.wait(5)
+        return pipeline()
+    monkeypatch.setattr(cache.redis, "pipeline", slow_pipeline)
+
+    async def commit():
+        cache.invalidate_events([1])
+    asyncio.run(commit())
+
+    # Redis chưa xoá xong: giá trị cũ trên Redis không được nạp lại vào cache trong process
+    assert cache.local.get("stats") is None
+    assert cache.get("stats") is None
+    release.set()
+    assert _wait_for(lambda: not cache._pending_tags)
+    assert loop_thread not in redis_threads
+    assert cache.redis.get(cache._key("stats")) is None
+
+
+def test_redis_down_falls_back_to_local(server, monkeypatch):
+    monkeypatch.setattr(shared_cache_module, "SHARED_CACHE_RETRY_SECONDS", 60)
+    cache = _cache(server)
+    server.connected = False
+
+    cache.set("stats", 1, tags=[event_tag(1)])
+    assert cache.get("stats") == 1
+    assert cache.get_or_set("other", lambda: 2) == 2
+    assert cache._redis_down_until > time.monotonic()
+
+    cache.invalidate_events([1])
+    assert cache.get("stats") is None
+
+
+def test_without_redis_everything_stays_local():
+    cache = SharedCache()
+    cache.set("stats", 1, tags=[event_tag(1)])
+
+    assert cache.get("stats") == 1
+    cache.invalidate_events([2])
+    assert cache.get("stats") == 1
+    cache.invalidate_events([1])
+    assert cache.get("stats") is None
+    assert cache._subscriber is None
+
+
+@pytest.fixture
+def redis_url():
+    """
+    Redis giả qua TCP: client redis-py thật, có socket timeout như khi chạy thật
+    """
+    import socket
+    from fakeredis import TcpFakeServer
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    tcp_server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    thread = threading.Thread(target=tcp_server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{port}/0"
+    tcp_server.shutdown()
+    tcp_server.server_close()
+
+
+def test_idle_subscriber_keeps_local_entries(redis_url, monkeypatch, capsys):
+    monkeypatch.setattr(shared_cache_module, "SHARED_CACHE_REDIS_TIMEOUT", 0.2)
+    first = shared_cache_module._create_shared_cache(redis_url)
+    second = shared_cache_module._create_shared_cache(redis_url)
+    first.set("stats", "old", tags=[event_tag(1)])
+    assert second.get("stats") == "old"
+
+    # Kênh im lặng lâu hơn nhiều lần socket timeout của client chính
+    time.sleep(1.5)
+
+    assert first.local.get("stats") == "old"
+    assert second.local.get("stats") == "old"
+    assert "Timeout" not in capsys.readouterr().out
+
+    first.invalidate_tags(event_tag(1))
+    assert _wait_for(lambda: second.local.get("stats") is None)
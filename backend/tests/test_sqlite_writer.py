@@ -0,0 +1,173 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import database
+from app.utils.sqlite_writer import SQLiteWriter, write_context
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/writer.db")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT UNIQUE)"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def writer(engine):
+    contexts = []
+    writer = SQLiteWriter(engine, max_batch=50, after_commit=contexts.append)
+    writer.contexts = contexts
+    yield writer
+    writer.close()
+
+
+def _insert(connection, value):
+    write_context(connection).setdefault("values", []).append(value)
+    return connection.execute(text("INSERT INTO items (value) VALUES (:v)"), {"v": value}).lastrowid
+
+
+def _values(engine):
+    with engine.connect() as connection:
+        return sorted(row[0] for row in connection.execute(text("SELECT value FROM items")))
+
+
+def _hold(writer):
+    """
+    Giữ writer bận với một thao tác chờ, để các thao tác gửi sau đó dồn thành một lô
+    """
+    started, release = threading.Event(), threading.Event()
+    future = writer.submit(lambda connection: started.set() or release.wait(5))
+    assert started.wait(5)
+    return future, release
+
+
+def test_queued_writes_are_committed_as_one_batch(engine, writer):
+    blocker, release = _hold(writer)
+    futures = [writer.submit(_insert, f"v{i}") for i in range(20)]
+    release.set()
+
+    ids = [future.result(5) for future in futures]
+
+    assert blocker.result(5) is True
+    assert len(set(ids)) == 20
+    assert _values(engine) == sorted(f"v{i}" for i in range(20))
+    assert (writer.batches, writer.writes) == (2, 21)
+    assert sorted(writer.contexts[-1]["values"]) == sorted(f"v{i}" for i in range(20))
+
+
+def test_batch_respects_max_batch(engine):
+    writer = SQLiteWriter(engine, max_batch=8)
+    try:
+        _, release = _hold(writer)
+        futures = [writer.submit(_insert, f"v{i}") for i in range(20)]
+        release.set()
+        for future in futures:
+            future.result(5)
+    finally:
+        writer.close()
+
+    assert writer.batches == 1 + 3
+    assert len(_values(engine)) == 20
+
+
+def test_failing_write_is_retried_alone(engine, writer):
+    _, release = _hold(writer)
+    good = [writer.submit(_insert, "a"), writer.submit(_insert, "b")]
+    bad = writer.submit(_insert, "a")
+    release.set()
+
+    assert all(future.result(5) for future in good)
+    with pytest.raises(Exception, match="UNIQUE"):
+        bad.result(5)
+    assert _values(engine) == ["a", "b"]
+    # Lô gộp bị rollback rồi chạy lại từng thao tác: context của lô lỗi không được gửi đi
+    assert [context["values"] for context in writer.contexts[1:]] == [["a"], ["b"]]
+
+
+def test_after_commit_error_does_not_fail_the_write(engine):
+    writer = SQLiteWriter(engine, after_commit=lambda context: 1 / 0)
+    try:
+        assert writer.submit(_insert, "x").result(5)
+    finally:
+        writer.close()
+    assert _values(engine) == ["x"]
+
+
+def test_close_flushes_and_restarts_on_demand(engine, writer):
+    future = writer.submit(_insert, "x")
+    writer.close()
+
+    assert future.done() and _values(engine) == ["x"]
+    assert writer.submit(_insert, "y").result(5)
+
+
+@pytest.fixture
+def checkin_writer(monkeypatch):
+    monkeypatch.setattr(database, "SQLITE_WRITER", True)
+    monkeypatch.setattr(database, "_sqlite_writer", None)
+    yield
+    database.close_sqlite_writer()
+
+
+def test_checkin_through_the_writer(client, db, make_event, make_guest, checkin_writer):
+    event = make_event()
+    guest = make_guest(event_id=event.id)
+    client.get("/api/guests/stats/summary", params={"event_id": event.id})
+
+    first = client.post(f"/api/guests/{guest.id}/checkin", json={"check_in_location": "Cổng B"}).json()
+    again = client.post(f"/api/guests/{guest.id}/checkin", json={}).json()
+
+    assert database.get_sqlite_writer().writes >= 1
+    assert first["already_checked_in"] is False and again["already_checked_in"] is True
+    db.refresh(guest)
+    assert guest.checked_in and guest.check_in_location == "Cổng B"
+    assert client.get("/api/guests/stats/summary", params={"event_id": event.id}).json()["checked_in"] == 1
+    assert client.post("/api/guests/999/checkin", json={}).status_code == 404
+
+
+def test_rsvp_through_the_writer(client, db, make_event, make_guest, checkin_writer):
+    event = make_event()
+    guest = make_guest(event_id=event.id)
+    client.get("/api/guests/stats/summary", params={"event_id": event.id})
+
+    response = client.post(f"/api/guests/{guest.id}/rsvp", json={"rsvp_status": "accepted", "rsvp_notes": "2 người"})
+
+    assert response.status_code == 200
+    assert (response.json()["rsvp_status"], response.json()["rsvp_notes"]) == ("accepted", "2 người")
+    assert database.get_sqlite_writer().writes == 1
+    assert client.get("/api/guests/stats/summary", params={"event_id": event.id}).json()["rsvp_accepted"] == 1
+    assert client.post("/api/guests/999/rsvp", json={"rsvp_status": "declined"}).status_code == 404
+
+
+def test_job_progress_goes_through_the_writer(db, make_event, make_guest, checkin_writer, monkeypatch):
+    from app.models.invitation_job import InvitationJob, InvitationJobItem
+    from app.services import invitation_job_service
+    from app.services.invitation_job_service import InvitationJobRunner, JobOwnershipLost
+    from tests.test_invitation_jobs import FakeInvitationService, _wait
+
+    event = make_event()
+    for i in range(3):
+        make_guest(name=f"Khách {i}", event_id=event.id)
+    monkeypatch.setattr(invitation_job_service, "JOB_BATCH_SIZE", 2)
+    runner = InvitationJobRunner(invitation_service=FakeInvitationService())
+
+    job = runner.create_job(db, event.id, "classic")
+    _wait(runner, job.id)
+
+    db.expire_all()
+    job = db.get(InvitationJob, job.id)
+    assert (job.status, job.processed, job.rendered, job.owner) == ("completed", 3, 3, None)
+    assert db.query(InvitationJobItem).filter(InvitationJobItem.job_id == job.id).count() == 3
+    # running, 2 checkpoint, removed, completed
+    assert database.get_sqlite_writer().writes >= 5
+
+    # Mất quyền giữ job: cả kết quả của lô lẫn checkpoint đều không được ghi
+    with pytest.raises(JobOwnershipLost):
+        runner._update_owned(db, job, items=runner._item_rows(job.id, skipped=[1]), processed=99)
+    db.expire_all()
+    assert db.get(InvitationJob, job.id).processed == 3
+    assert db.query(InvitationJobItem).filter(InvitationJobItem.job_id == job.id).count() == 3
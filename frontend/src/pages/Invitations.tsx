@@ -140,11 +140,26 @@ const Invitations: React.FC = () => {
         })
       });
       const data = await response.json();
-      
-      if (response.ok) {
-        toast.success(`Đã tạo ${data.invitations.length} thiệp mời! 🎉`);
-      } else {
+
+      if (!response.ok) {
         toast.error('Lỗi tạo thiệp mời!');
+        return;
+      }
+
+      // Job chạy nền: theo dõi tiến độ cho tới khi kết thúc
+      toast(`Đang tạo ${data.total} thiệp mời...`, { icon: '⏳' });
+      let job = data;
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const jobResponse = await fetch(`/api/invitations/jobs/${data.job_id}`);
+        if (!jobResponse.ok) break;
+        job = await jobResponse.json();
+      }
+
+      if (job.status === 'completed') {
+        toast.success(`Đã tạo ${job.processed} thiệp mời! 🎉`);
+      } else {
+        toast.error(`Tạo thiệp mời dừng ở ${job.processed}/${job.total} (${job.status})`);
       }
     } catch (error) {
       toast.error('Lỗi tạo thiệp mời!');
@@ -175,7 +190,7 @@ const Invitations: React.FC = () => {
       const data = await response.json();
       
       if (response.ok) {
-        toast.success(`Đã tạo ${data.invitations.length} thiệp mời! 🚀`);
+        toast.success(`Đã tạo ${data.rendered} thiệp mời (${data.skipped} không thay đổi)! 🚀`);
         setBulkSelectedGuests([]);
       } else {
         toast.error('Lỗi tạo thiệp mời!');